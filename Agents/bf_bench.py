@@ -0,0 +1,199 @@
+#!/usr/bin/env python3
+"""
+bf-db command benchmarks
+Agent commands run against a seeded local table: wall time, calls, bytes read, peak RSS
+"""
+
+import contextlib
+import multiprocessing
+import os
+import resource
+import sys
+import tempfile
+import time
+from typing import Any, Callable, Dict, Iterator, List, Optional
+
+from bf_local import TABLE_NAME, LocalDynamoDB, SimulatedClient, seed_table
+from bf_progress import silenced
+
+DEFAULT_SIZES = [60000]
+
+# Command name -> callable(agent, workdir). All are read-only or dry runs
+# except WRITE_COMMANDS, which always run last; index builders write into
+# `workdir` rather than the real cache.
+COMMANDS: Dict[str, Callable[[Any, str], Any]] = {
+    'content-stats': lambda agent, workdir: agent.content_stats(),
+    'analyze-source': lambda agent, workdir: agent.analyze_source('tmdb-to-imdb'),
+    'analyze-category': lambda agent, workdir: agent.analyze_category_sources('movies'),
+    'analyze-bf-categories': lambda agent, workdir: agent.analyze_bf_category_population(),
+    'get-api-categories': lambda agent, workdir: (agent.get_all_categories_for_api(),
+                                                  agent.get_categories_with_counts_for_api()),
+    'optimize-gsi-queries': lambda agent, workdir: agent.optimize_gsi_queries(),
+    'populate-bf-categories': lambda agent, workdir: agent.bulk_populate_bf_categories(dry_run=True),
+    'populate-bf-subcategories': lambda agent, workdir: agent.populate_bf_subcategories(dry_run=True),
+    'sync-work-markers': lambda agent, workdir: agent.sync_work_markers(dry_run=True),
+    'backfill-quality-sort': lambda agent, workdir: agent.backfill_quality_sort(dry_run=True),
+    'validate-quality-index': lambda agent, workdir: agent.validate_quality_index(),
+    'top-items': lambda agent, workdir: agent.top_items('movies'),
+    'query-sharded': lambda agent, workdir: agent.query_category_sharded('books'),
+    'build-feed-snapshot': lambda agent, workdir: agent.build_feed_snapshot(
+        os.path.join(workdir, 'feed_snapshot.json.gz')),
+    'build-bitmap-index': lambda agent, workdir: agent.build_bitmap_index(
+        os.path.join(workdir, 'bitmap_index.bin.gz')),
+    'build-search-index': lambda agent, workdir: agent.build_search_index(os.path.join(workdir, 'search_index')),
+    'build-autocomplete': lambda agent, workdir: agent.build_autocomplete_index(
+        os.path.join(workdir, 'autocomplete.bin')),
+    'build-related-index': lambda agent, workdir: agent.build_related_index(os.path.join(workdir, 'related.bin')),
+    'mark-source-inactive': lambda agent, workdir: agent.mark_source_inactive('reddit-webgames'),
+}
+WRITE_COMMANDS = {'mark-source-inactive'}
+
+
+def rss_mb() -> float:
+    """Current resident set size (falls back to the peak where /proc is missing)"""
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE') / 1024 ** 2
+    except (OSError, ValueError):
+        return peak_rss_mb()
+
+
+def peak_rss_mb() -> float:
+    """Peak resident set size of this process (ru_maxrss is bytes on macOS, KB elsewhere)"""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / 1024 ** 2 if sys.platform == 'darwin' else peak / 1024
+
+
+def measure(command: str, run: Callable[[], Any], client: SimulatedClient, metrics=None) -> Dict[str, Any]:
+    """Run one command with its output silenced and collect its costs
+
+    `metrics` (the agent's InstrumentedClient) adds consumed capacity and
+    call latency percentiles.
+    """
+    client.reset_stats()
+    if metrics is not None:
+        metrics.stats.clear()
+    rss_start = rss_mb()
+    error = None
+    start = time.perf_counter()
+    try:
+        with silenced():
+            run()
+    except Exception as e:
+        error = f'{type(e).__name__}: {e}'[:200]
+    elapsed = time.perf_counter() - start
+    peak = peak_rss_mb()
+    result = {
+        'command': command,
+        'seconds': round(elapsed, 3),
+        **client.stats(),
+        'mb_returned': round(client.bytes_returned / 1024 ** 2, 2),
+        'peak_rss_mb': round(peak, 1),
+        'rss_growth_mb': round(max(0.0, peak - rss_start), 1),
+        'error': error
+    }
+    if metrics is not None:
+        total = metrics.summary()['total']
+        result.update({field: total[field] for field in ('read_units', 'write_units', 'p50_ms', 'p95_ms', 'p99_ms')})
+    return result
+
+
+def run_isolated(command: str, run: Callable[[], Any], client: SimulatedClient, metrics=None) -> Dict[str, Any]:
+    """
+    `measure` in a forked child where fork is available
+
+    The child shares the seeded table copy-on-write, so writes by one
+    command never leak into the next and the child's peak RSS is the
+    command's own. Without fork the command runs in this process.
+    """
+    if 'fork' not in multiprocessing.get_all_start_methods():
+        return measure(command, run, client, metrics)
+
+    context = multiprocessing.get_context('fork')
+    receiver, sender = context.Pipe(duplex=False)
+
+    def child():
+        sender.send(measure(command, run, client, metrics))
+        sender.close()
+
+    process = context.Process(target=child)
+    process.start()
+    sender.close()
+    try:
+        result = receiver.recv()
+    except EOFError:
+        result = None
+    process.join()
+    if result is None:
+        reason = 'killed, likely out of memory' if process.exitcode == -9 else f'exit code {process.exitcode}'
+        result = {'command': command, 'error': f'child process died ({reason})'}
+    return result
+
+
+@contextlib.contextmanager
+def backend_client(backend: str, endpoint_url: str = None, region: str = 'us-east-1') -> Iterator[Any]:
+    """A raw client for 'memory' (LocalDynamoDB), 'moto' or 'dynamodb-local' (endpoint_url)"""
+    if backend == 'memory':
+        yield LocalDynamoDB()
+        return
+
+    import boto3
+    credentials = {'region_name': region, 'aws_access_key_id': 'bench', 'aws_secret_access_key': 'bench'}
+    if backend == 'dynamodb-local':
+        yield boto3.client('dynamodb', endpoint_url=endpoint_url or 'http://localhost:8000', **credentials)
+    elif backend == 'moto':
+        try:
+            from moto import mock_aws
+        except ImportError:
+            raise RuntimeError("moto is not installed (pip install 'moto[dynamodb]')")
+        with mock_aws():
+            yield boto3.client('dynamodb', **credentials)
+    else:
+        raise ValueError(f'Unknown backend {backend!r}')
+
+
+def run_benchmarks(make_agent: Callable[[Any], Any], sizes: List[int] = None, commands: List[str] = None,
+                   latency_ms: float = 0.0, throttle_rate: float = 0.0, seed: int = 0,
+                   backend: str = 'memory', endpoint_url: str = None, profile=None,
+                   on_result: Optional[Callable[[Dict[str, Any]], None]] = None) -> List[Dict[str, Any]]:
+    """
+    Seed a synthetic table per size and time every command against it
+
+    Args:
+        make_agent: Builds an agent around a client (e.g. BrowseForwardDB)
+        sizes: Table sizes (default: 60k)
+        commands: Names from COMMANDS (default: all)
+        latency_ms: Mean injected latency per call
+        throttle_rate: Share of calls failed with ProvisionedThroughputExceededException
+        seed: Seed for the synthetic data and the injected faults
+        backend: 'memory', 'moto' or 'dynamodb-local'
+        profile: CorpusProfile shaping the seeded tables (default: production mix)
+        on_result: Called with each result as it completes
+    """
+    names = commands or list(COMMANDS)
+    unknown = [name for name in names if name not in COMMANDS]
+    if unknown:
+        raise ValueError(f"Unknown commands: {', '.join(unknown)}")
+    # Writers last: on a shared backend (or without fork) their changes persist
+    names = sorted(names, key=lambda name: name in WRITE_COMMANDS)
+
+    results = []
+    for size in sizes or DEFAULT_SIZES:
+        table_name = f'{TABLE_NAME}-bench-{size}' if backend != 'memory' else TABLE_NAME
+        with backend_client(backend, endpoint_url) as raw, tempfile.TemporaryDirectory() as workdir:
+            seeded = seed_table(raw, size, table_name=table_name, seed=seed, profile=profile)
+            client = SimulatedClient(raw, latency_ms=latency_ms, throttle_rate=throttle_rate, seed=seed)
+            agent = make_agent(client)
+            agent.table_name = table_name
+            for name in names:
+                client.reseed(f'{seed}:{name}')
+                result = run_isolated(name, lambda: COMMANDS[name](agent, workdir), client,
+                                      getattr(agent, 'metrics', None))
+                result.update({'items': size, 'seed_seconds': seeded['elapsed_seconds'], 'backend': backend,
+                               'latency_ms': latency_ms, 'throttle_rate': throttle_rate})
+                results.append(result)
+                if on_result:
+                    on_result(result)
+            if backend != 'memory':
+                raw.delete_table(TableName=table_name)
+    return results
@@ -0,0 +1,403 @@
+#!/usr/bin/env python3
+"""
+bf-db bitmap index
+Per-value bitsets over dense item ids for fast multi-attribute filtering
+"""
+
+import gzip
+import json
+import math
+import os
+import re
+import struct
+import time
+from array import array
+from bisect import bisect_right
+from collections import defaultdict
+from datetime import datetime
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from bf_cache import cache_path
+
+# Low-cardinality attributes indexed with one bitmap per value
+CATEGORICAL_FIELDS = ['bfCategory', 'bfSubcategory', 'status', 'contentType', 'mobileFriendly', 'source']
+
+# Numeric attributes: one "value >= threshold" bitmap per bucket boundary;
+# comparisons between boundaries only check the items of one bucket
+NUMERIC_BUCKETS = {
+    'readingTime': list(range(1, 31)) + [45, 60, 90, 120],
+    'qualityScore': list(range(5, 101, 5)),
+    'wordCount': [100, 250, 500, 1000, 2000, 3000, 5000, 10000],
+    'upvotes': [1, 5, 10, 25, 50, 100, 250, 500, 1000, 5000]
+}
+
+INDEX_FIELDS = ['url'] + CATEGORICAL_FIELDS + list(NUMERIC_BUCKETS)
+
+MAGIC = b'BFBM'
+VERSION = 1
+
+# Set-bit positions of every byte value, for decoding bitmaps to ids
+BYTE_BITS = [tuple(bit for bit in range(8) if byte >> bit & 1) for byte in range(256)]
+
+try:
+    popcount = int.bit_count
+except AttributeError:  # Python < 3.10
+    def popcount(bitmap: int) -> int:
+        return bin(bitmap).count('1')
+
+
+def default_bitmap_path() -> str:
+    """Default location of the bitmap index file"""
+    return cache_path('bitmap_index.bin.gz')
+
+
+def value_key(value: Any) -> str:
+    """Bitmap key of a categorical value ('true'/'false' for booleans)"""
+    if isinstance(value, bool):
+        return 'true' if value else 'false'
+    return str(value)
+
+
+def bitmap_from_ids(ids: Iterable[int], size: int) -> int:
+    """Pack item ids into an int bitset"""
+    buffer = bytearray((size + 7) // 8)
+    for i in ids:
+        buffer[i >> 3] |= 1 << (i & 7)
+    return int.from_bytes(buffer, 'little')
+
+
+def bitmap_ids(bitmap: int) -> List[int]:
+    """Item ids of the set bits, ascending"""
+    ids = []
+    data = bitmap.to_bytes((bitmap.bit_length() + 7) // 8, 'little')
+    for offset, byte in enumerate(data):
+        if byte:
+            base = offset << 3
+            ids.extend(base + bit for bit in BYTE_BITS[byte])
+    return ids
+
+
+class BitmapIndex:
+    """Immutable bitmap index over a list of items (item id = list position)"""
+
+    def __init__(self, urls: List[str], values: Dict[str, Dict[str, int]],
+                 ranges: Dict[str, Dict[float, int]], numbers: Dict[str, array],
+                 present: Dict[str, int], integral: Dict[str, bool] = None, built_at: str = ''):
+        self.urls = urls
+        self.size = len(urls)
+        self.universe = (1 << self.size) - 1
+        self.values = values
+        self.ranges = ranges
+        self.numbers = numbers
+        self.present = present
+        # Fields holding only whole numbers, where > 10 can become >= 11
+        self.integral = integral or {}
+        self.built_at = built_at
+
+    @classmethod
+    def from_items(cls, items: List[Dict[str, Any]]) -> 'BitmapIndex':
+        """Index plain items; missing attributes are simply absent from every bitmap"""
+        size = len(items)
+        value_ids: Dict[str, Dict[str, List[int]]] = {field: defaultdict(list) for field in CATEGORICAL_FIELDS}
+        numbers = {field: array('d', [math.nan]) * size for field in NUMERIC_BUCKETS}
+
+        for i, item in enumerate(items):
+            for field in CATEGORICAL_FIELDS:
+                value = item.get(field)
+                if value is not None and value != '':
+                    value_ids[field][value_key(value)].append(i)
+            for field in NUMERIC_BUCKETS:
+                value = item.get(field)
+                if isinstance(value, (int, float)) and not isinstance(value, bool):
+                    numbers[field][i] = value
+
+        values = {field: {key: bitmap_from_ids(ids, size) for key, ids in keyed.items()}
+                  for field, keyed in value_ids.items()}
+        present = {field: bitmap_from_ids((i for keyed in value_ids[field].values() for i in keyed), size)
+                   for field in CATEGORICAL_FIELDS}
+
+        ranges = {}
+        for field, thresholds in NUMERIC_BUCKETS.items():
+            # Bucket every item once, then OR bucket bitmaps from the top down
+            column = numbers[field]
+            buckets: Dict[int, List[int]] = defaultdict(list)
+            for i, value in enumerate(column):
+                if value == value:
+                    buckets[bisect_right(thresholds, value)].append(i)
+            present[field] = bitmap_from_ids((i for ids in buckets.values() for i in ids), size)
+
+            ranges[field], at_least = {}, 0
+            for position in range(len(thresholds), 0, -1):
+                at_least |= bitmap_from_ids(buckets.get(position, ()), size)
+                ranges[field][thresholds[position - 1]] = at_least
+
+        integral = {field: all(v.is_integer() for v in column if v == v) for field, column in numbers.items()}
+        return cls([item['url'] for item in items], values, ranges, numbers, present,
+                   integral=integral, built_at=datetime.now().isoformat())
+
+    # ---------- persistence ----------
+
+    def save(self, path: str = None) -> str:
+        """Write the index as one gzip file: JSON header, then raw bitmaps and columns"""
+        path = path or default_bitmap_path()
+        blobs: List[bytes] = []
+        layout: Dict[str, Any] = {'values': {}, 'ranges': {}, 'present': {}, 'numbers': {}}
+        length = (self.size + 7) // 8
+
+        def add(blob: bytes) -> int:
+            blobs.append(blob)
+            return len(blobs) - 1
+
+        for field, keyed in self.values.items():
+            layout['values'][field] = {key: add(bitmap.to_bytes(length, 'little')) for key, bitmap in keyed.items()}
+        for field, keyed in self.ranges.items():
+            layout['ranges'][field] = [[t, add(bitmap.to_bytes(length, 'little'))] for t, bitmap in keyed.items()]
+        for field, bitmap in self.present.items():
+            layout['present'][field] = add(bitmap.to_bytes(length, 'little'))
+        for field, column in self.numbers.items():
+            layout['numbers'][field] = add(column.tobytes())
+
+        header = json.dumps({
+            'version': VERSION,
+            'builtAt': self.built_at,
+            'urls': self.urls,
+            'layout': layout,
+            'integral': self.integral,
+            'lengths': [len(blob) for blob in blobs]
+        }, separators=(',', ':')).encode('utf-8')
+
+        tmp_path = path + '.tmp'
+        with gzip.open(tmp_path, 'wb', compresslevel=6) as f:
+            f.write(MAGIC + struct.pack('<Q', len(header)))
+            f.write(header)
+            for blob in blobs:
+                f.write(blob)
+        os.replace(tmp_path, path)
+        return path
+
+    @classmethod
+    def load(cls, path: str = None) -> 'BitmapIndex':
+        """Read an index written by save()"""
+        path = path or default_bitmap_path()
+        with gzip.open(path, 'rb') as f:
+            data = f.read()
+        if data[:4] != MAGIC:
+            raise ValueError(f'{path} is not a bitmap index')
+        header_length = struct.unpack_from('<Q', data, 4)[0]
+        header = json.loads(data[12:12 + header_length])
+        if header['version'] != VERSION:
+            raise ValueError(f'{path} is bitmap index version {header["version"]}, expected {VERSION}')
+
+        offsets, position = [], 12 + header_length
+        for blob_length in header['lengths']:
+            offsets.append(position)
+            position += blob_length
+
+        def blob(i: int) -> bytes:
+            return data[offsets[i]:offsets[i] + header['lengths'][i]]
+
+        def bitmap(i: int) -> int:
+            return int.from_bytes(blob(i), 'little')
+
+        layout = header['layout']
+        numbers = {}
+        for field, i in layout['numbers'].items():
+            numbers[field] = array('d')
+            numbers[field].frombytes(blob(i))
+
+        return cls(
+            header['urls'],
+            {field: {key: bitmap(i) for key, i in keyed.items()} for field, keyed in layout['values'].items()},
+            {field: {t: bitmap(i) for t, i in pairs} for field, pairs in layout['ranges'].items()},
+            numbers,
+            {field: bitmap(i) for field, i in layout['present'].items()},
+            integral=header.get('integral', {}),
+            built_at=header.get('builtAt', '')
+        )
+
+    # ---------- predicates ----------
+
+    def equals(self, field: str, value: Any) -> int:
+        """Items whose attribute equals `value`"""
+        if field in NUMERIC_BUCKETS:
+            return self.compare(field, '=', value)
+        if field not in self.values:
+            raise ValueError(f"Unknown field '{field}' (indexed: {', '.join(INDEX_FIELDS[1:])})")
+        return self.values[field].get(value_key(value), 0)
+
+    def _at_least(self, field: str, value: float, strict: bool) -> int:
+        """Items with attribute >= value (> value when strict)"""
+        if self.integral.get(field):
+            value, strict = (math.floor(value) + 1 if strict else math.ceil(value)), False
+        ranges = self.ranges[field]
+        thresholds = sorted(ranges)
+        below = bisect_right(thresholds, value) - 1
+        base = ranges[thresholds[below]] if below >= 0 else self.present[field]
+        if below >= 0 and thresholds[below] == value and not strict:
+            return base
+
+        # Everything from the next boundary up qualifies outright; only the
+        # bucket containing `value` needs its raw values checked
+        above = ranges[thresholds[below + 1]] if below + 1 < len(thresholds) else 0
+        column = self.numbers[field]
+        if strict:
+            matches = (i for i in bitmap_ids(base & ~above) if column[i] > value)
+        else:
+            matches = (i for i in bitmap_ids(base & ~above) if column[i] >= value)
+        return above | bitmap_from_ids(matches, self.size)
+
+    def compare(self, field: str, op: str, value: Any) -> int:
+        """Items matching `field op value`; numeric fields support < <= > >= = !="""
+        if field not in NUMERIC_BUCKETS:
+            if op == '=':
+                return self.equals(field, value)
+            if op == '!=':
+                return self.present.get(field, 0) & ~self.equals(field, value)
+            raise ValueError(f"Operator '{op}' needs a numeric field, not '{field}'")
+
+        try:
+            value = float(value)
+        except (TypeError, ValueError):
+            raise ValueError(f"'{field}' compares against numbers, got '{value}'")
+
+        present = self.present[field]
+        if op == '>=':
+            return self._at_least(field, value, strict=False)
+        if op == '>':
+            return self._at_least(field, value, strict=True)
+        if op == '<':
+            return present & ~self._at_least(field, value, strict=False)
+        if op == '<=':
+            return present & ~self._at_least(field, value, strict=True)
+        equal = self._at_least(field, value, strict=False) & ~self._at_least(field, value, strict=True)
+        if op == '=':
+            return equal
+        if op == '!=':
+            return present & ~equal
+        raise ValueError(f"Unknown operator '{op}'")
+
+    # ---------- queries ----------
+
+    def query(self, expression: str) -> int:
+        """Bitmap of items matching a boolean filter expression
+
+        Example: "bfCategory=games AND mobileFriendly=true AND NOT status=inactive"
+        """
+        return FilterParser(expression, self).parse()
+
+    def count(self, expression: str) -> int:
+        return popcount(self.query(expression))
+
+    def ids(self, bitmap: int) -> List[int]:
+        return bitmap_ids(bitmap)
+
+    def urls_for(self, bitmap: int, limit: int = None) -> List[str]:
+        ids = bitmap_ids(bitmap)
+        return [self.urls[i] for i in (ids[:limit] if limit else ids)]
+
+    def distribution(self, field: str, within: int = None) -> Dict[str, int]:
+        """Item count per value of a categorical field (optionally inside a bitmap)"""
+        keyed = self.values.get(field, {})
+        if within is None:
+            return {key: popcount(bitmap) for key, bitmap in keyed.items()}
+        counts = {key: popcount(bitmap & within) for key, bitmap in keyed.items()}
+        return {key: count for key, count in counts.items() if count}
+
+
+# Filter expressions: predicates joined with AND / OR / NOT and parentheses
+TOKEN_RE = re.compile(r"""
+    \s*(?:
+        (?P<paren>[()])
+      | (?P<keyword>AND|OR|NOT)(?![\w-])
+      | (?P<field>[A-Za-z_]\w*)\s*(?P<op>>=|<=|!=|=|>|<)\s*(?P<value>"[^"]*"|'[^']*'|[^\s()]+)
+    )""", re.VERBOSE | re.IGNORECASE)
+
+
+class FilterParser:
+    """Recursive-descent evaluator: OR binds looser than AND, NOT binds tightest"""
+
+    def __init__(self, expression: str, index: BitmapIndex):
+        self.index = index
+        self.tokens: List[Tuple[str, Any]] = []
+        position = 0
+        expression = expression.strip()
+        while position < len(expression):
+            match = TOKEN_RE.match(expression, position)
+            if not match or match.end() == position:
+                raise ValueError(f"Can't parse filter near: {expression[position:]!r}")
+            if match.group('paren'):
+                self.tokens.append((match.group('paren'), None))
+            elif match.group('keyword'):
+                self.tokens.append((match.group('keyword').upper(), None))
+            else:
+                value = match.group('value')
+                if value[:1] in ('"', "'"):
+                    value = value[1:-1]
+                self.tokens.append(('PRED', (match.group('field'), match.group('op'), value)))
+            position = match.end()
+            while position < len(expression) and expression[position].isspace():
+                position += 1
+        self.position = 0
+
+    def _peek(self) -> Optional[str]:
+        return self.tokens[self.position][0] if self.position < len(self.tokens) else None
+
+    def _take(self) -> Tuple[str, Any]:
+        token = self.tokens[self.position]
+        self.position += 1
+        return token
+
+    def parse(self) -> int:
+        if not self.tokens:
+            return self.index.universe
+        result = self._or()
+        if self.position != len(self.tokens):
+            raise ValueError(f"Unexpected '{self._peek()}' in filter")
+        return result
+
+    def _or(self) -> int:
+        result = self._and()
+        while self._peek() == 'OR':
+            self._take()
+            result |= self._and()
+        return result
+
+    def _and(self) -> int:
+        result = self._not()
+        while self._peek() == 'AND':
+            self._take()
+            result &= self._not()
+        return result
+
+    def _not(self) -> int:
+        if self._peek() == 'NOT':
+            self._take()
+            return self.index.universe & ~self._not()
+        return self._atom()
+
+    def _atom(self) -> int:
+        kind = self._peek()
+        if kind == '(':
+            self._take()
+            result = self._or()
+            if self._peek() != ')':
+                raise ValueError("Missing ')' in filter")
+            self._take()
+            return result
+        if kind == 'PRED':
+            field, op, value = self._take()[1]
+            return self.index.compare(field, op, value)
+        raise ValueError(f"Expected a condition, got '{kind or 'end of filter'}'")
+
+
+def build_bitmap_index(items: Iterable[Dict[str, Any]], path: str = None) -> Dict[str, Any]:
+    """Index items and save the result"""
+    start_time = time.time()
+    index = BitmapIndex.from_items(list(items))
+    path = index.save(path)
+    return {
+        'path': path,
+        'items': index.size,
+        'bitmaps': sum(len(keyed) for keyed in index.values.values()) + sum(len(r) for r in index.ranges.values()),
+        'elapsed_seconds': round(time.time() - start_time, 2)
+    }
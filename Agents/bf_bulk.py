@@ -0,0 +1,291 @@
+#!/usr/bin/env python3
+"""
+bf-db bulk write engines
+Batched, concurrent and retried write paths for large maintenance jobs
+"""
+
+import copy
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import datetime
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+from bf_dynamo import (
+    TRANSACT_BYTES_LIMIT, TRANSACT_ITEMS_LIMIT, batch_get_items, build_update,
+    call_with_retries, cancellation_reasons, chunked, error_code, item_size, url_key
+)
+from bf_markers import marker_changes
+from bf_progress import finish, note, progress
+
+
+class BulkUpdater:
+    """Apply many per-item attribute updates concurrently with retries
+
+    BatchWriteItem cannot express partial updates, so this is the bulk path
+    for UpdateItem: a bounded window of updates runs on a thread pool, each
+    one conditional on the item still existing so deleted urls are never
+    resurrected as stubs.
+    """
+
+    def __init__(self, client, table_name: str, max_workers: int = 16,
+                 max_retries: int = 5, window: int = 1000):
+        self.dynamodb = client
+        self.table_name = table_name
+        self.max_workers = max_workers
+        self.max_retries = max_retries
+        self.window = window
+
+    def update_items(self, updates: Iterable[Tuple[str, Dict[str, Any]]],
+                     dry_run: bool = False) -> Dict[str, Any]:
+        """Apply `(url, {attr: value})` updates; a None value removes the attribute
+
+        Returns:
+            Dictionary with update statistics
+        """
+        stats = defaultdict(int)
+        failures = []
+
+        if dry_run:
+            stats['planned'] = sum(1 for _ in updates)
+            return {'mode': 'dry_run', **dict(stats), 'failures': failures}
+
+        with ThreadPoolExecutor(max_workers=self.max_workers) as pool:
+            for window in chunked(updates, self.window):
+                futures = {pool.submit(self._update_one, url, attributes): url
+                           for url, attributes in window if attributes}
+                for future in as_completed(futures):
+                    outcome = future.result()
+                    stats[outcome] += 1
+                    if outcome != 'updated':
+                        failures.append({'url': futures[future], 'reason': outcome})
+
+        return {'mode': 'live_update', **dict(stats), 'failures': failures}
+
+    def _update_one(self, url: str, attributes: Dict[str, Any]) -> str:
+        """Apply one update; returns the outcome name"""
+        update = build_update(attributes)
+        update['ExpressionAttributeNames']['#url'] = 'url'
+        try:
+            call_with_retries(
+                self.dynamodb.update_item,
+                TableName=self.table_name,
+                Key=url_key(url),
+                ConditionExpression='attribute_exists(#url)',
+                max_retries=self.max_retries,
+                **update
+            )
+            return 'updated'
+        except Exception as e:
+            if error_code(e) == 'ConditionalCheckFailedException':
+                return 'missing'
+            note(f"   ⚠️  Error updating {url}: {e}", 'error', url=url, error=str(e))
+            return 'failed'
+
+
+class RekeyEngine:
+    """Move items to new primary keys (url rewrites) atomically and in bulk
+
+    Each move is a Delete of the old key plus a Put of the new key inside the
+    same TransactWriteItems call, so a crash can never lose an item. Moves are
+    grouped into transactions and transactions run concurrently with retries.
+    """
+
+    def __init__(self, client, table_name: str, moves_per_transaction: int = 25,
+                 max_workers: int = 8, max_retries: int = 5):
+        self.dynamodb = client
+        self.table_name = table_name
+        # Every move uses two transaction actions
+        self.moves_per_transaction = max(1, min(moves_per_transaction, TRANSACT_ITEMS_LIMIT // 2))
+        self.max_workers = max_workers
+        self.max_retries = max_retries
+
+    def rekey(self, mapping: Dict[str, str],
+              transform: Optional[Callable[[Dict[str, Any]], Dict[str, Any]]] = None,
+              dry_run: bool = True) -> Dict[str, Any]:
+        """Move every `old_url -> new_url` in mapping
+
+        Args:
+            mapping: Old url to new url
+            transform: Optional hook applied to each re-keyed item copy
+                (e.g. to rewrite `source`); must not change `url`
+            dry_run: If True, only resolve the plan without writing
+
+        Returns:
+            Dictionary with move statistics
+        """
+        stats = defaultdict(int)
+        stats['requested'] = len(mapping)
+        failures = []
+
+        # Drop no-op moves, moves whose target is claimed twice and chained
+        # moves (a transaction cannot touch the same key twice)
+        plan = {}
+        claimed = set()
+        for old_url, new_url in mapping.items():
+            if not new_url or old_url == new_url:
+                stats['skipped'] += 1
+            elif new_url in mapping:
+                stats['chained'] += 1
+                failures.append({'old_url': old_url, 'new_url': new_url, 'reason': 'ChainedMove'})
+            elif new_url in claimed:
+                stats['duplicate_targets'] += 1
+                failures.append({'old_url': old_url, 'new_url': new_url, 'reason': 'DuplicateTarget'})
+            else:
+                claimed.add(new_url)
+                plan[old_url] = new_url
+
+        print(f"🔑 Rekey plan: {len(plan):,} moves ({stats['skipped']} skipped, "
+              f"{stats['duplicate_targets']} duplicate targets)")
+
+        # Resolve current items with BatchGetItem (100 keys per call)
+        current = batch_get_items(self.dynamodb, self.table_name, list(plan.keys()),
+                                  max_retries=self.max_retries)
+
+        moves = []
+        for old_url, new_url in plan.items():
+            item = current.get(old_url)
+            if item is None:
+                stats['missing'] += 1
+                failures.append({'old_url': old_url, 'new_url': new_url, 'reason': 'Missing'})
+                continue
+            moves.append((old_url, self._build_new_item(item, new_url, transform)))
+
+        print(f"   Found {len(moves):,} items to move, {stats['missing']:,} missing")
+
+        if dry_run:
+            print("\n✅ DRY RUN COMPLETE - No changes made")
+            return {
+                'mode': 'dry_run',
+                **dict(stats),
+                'planned_moves': len(moves),
+                'failures': failures
+            }
+
+        batches = self._group_into_transactions(moves)
+        print(f"🚀 Moving {len(moves):,} items in {len(batches):,} transactions "
+              f"({self.max_workers} workers)...")
+
+        with ThreadPoolExecutor(max_workers=self.max_workers) as pool:
+            futures = [pool.submit(self._execute_batch, batch) for batch in batches]
+            for future in as_completed(futures):
+                batch_stats, batch_failures = future.result()
+                for key, count in batch_stats.items():
+                    stats[key] += count
+                failures.extend(batch_failures)
+                progress('rekey', stats['moved'], len(moves), failed=stats['failed'])
+        finish()
+
+        print(f"\n✅ REKEY COMPLETE: {stats['moved']:,} moved, {stats['target_exists']:,} "
+              f"target exists, {stats['failed']:,} failed")
+
+        return {
+            'mode': 'live_update',
+            **dict(stats),
+            'failures': failures
+        }
+
+    # ========== INTERNALS ==========
+
+    def _build_new_item(self, item: Dict[str, Any], new_url: str,
+                        transform: Optional[Callable]) -> Dict[str, Any]:
+        """Copy an item under its new key, with work markers matching the copy (e.g. its new source)"""
+        new_item = copy.deepcopy(item)
+        new_item['url'] = {'S': new_url}
+        if transform:
+            new_item = transform(new_item)
+            new_item['url'] = {'S': new_url}
+        for attribute, value in marker_changes(new_item).items():
+            if value is None:
+                new_item.pop(attribute, None)
+            else:
+                new_item[attribute] = value
+        new_item['updatedAt'] = {'S': datetime.now().isoformat()}
+        return new_item
+
+    def _group_into_transactions(self, moves: List[Tuple[str, Dict]]) -> List[List[Tuple[str, Dict]]]:
+        """Split moves into transactions within the action and 4 MB size limits"""
+        batches = []
+        batch, batch_bytes = [], 0
+        # Leave headroom for request envelope and condition expressions
+        byte_budget = int(TRANSACT_BYTES_LIMIT * 0.9)
+
+        for move in moves:
+            size = item_size(move[1]) + len(move[0]) + 64
+            if batch and (len(batch) >= self.moves_per_transaction or batch_bytes + size > byte_budget):
+                batches.append(batch)
+                batch, batch_bytes = [], 0
+            batch.append(move)
+            batch_bytes += size
+
+        if batch:
+            batches.append(batch)
+        return batches
+
+    def _transact_items(self, batch: List[Tuple[str, Dict]]) -> List[Dict[str, Any]]:
+        """Delete old + conditional Put new for each move in a batch"""
+        actions = []
+        for old_url, new_item in batch:
+            actions.append({'Delete': {
+                'TableName': self.table_name,
+                'Key': url_key(old_url),
+                'ConditionExpression': 'attribute_exists(#url)',
+                'ExpressionAttributeNames': {'#url': 'url'}
+            }})
+            actions.append({'Put': {
+                'TableName': self.table_name,
+                'Item': new_item,
+                'ConditionExpression': 'attribute_not_exists(#url)',
+                'ExpressionAttributeNames': {'#url': 'url'}
+            }})
+        return actions
+
+    def _execute_batch(self, batch: List[Tuple[str, Dict]]) -> Tuple[Dict[str, int], List[Dict]]:
+        """Run one transaction; on a condition failure, isolate the offending moves"""
+        stats = defaultdict(int)
+        failures = []
+
+        try:
+            call_with_retries(self.dynamodb.transact_write_items,
+                              TransactItems=self._transact_items(batch),
+                              max_retries=self.max_retries)
+            stats['moved'] += len(batch)
+            return stats, failures
+        except Exception as e:
+            if error_code(e) != 'TransactionCanceledException' or len(batch) == 1:
+                return self._record_failure(batch, e)
+
+        # One move failed its condition and cancelled the whole transaction:
+        # retry each move on its own so the others still go through
+        for move in batch:
+            move_stats, move_failures = self._execute_batch([move])
+            for key, count in move_stats.items():
+                stats[key] += count
+            failures.extend(move_failures)
+
+        return stats, failures
+
+    def _record_failure(self, batch: List[Tuple[str, Dict]], error: Exception) -> Tuple[Dict[str, int], List[Dict]]:
+        """Classify a failed transaction"""
+        stats = defaultdict(int)
+        failures = []
+        reasons = cancellation_reasons(error)
+
+        for old_url, new_item in batch:
+            new_url = new_item['url']['S']
+            # Single-move transaction: [Delete reason, Put reason]
+            if len(batch) == 1 and reasons[1:2] == ['ConditionalCheckFailed']:
+                stats['target_exists'] += 1
+                reason = 'TargetExists'
+            elif len(batch) == 1 and reasons[:1] == ['ConditionalCheckFailed']:
+                stats['missing'] += 1
+                reason = 'Missing'
+            else:
+                stats['failed'] += 1
+                reason = error_code(error) or str(error)
+            failures.append({'old_url': old_url, 'new_url': new_url, 'reason': reason})
+
+        if stats['failed']:
+            note(f"   ⚠️  Transaction error ({len(batch)} moves): {error}", 'error', moves=len(batch),
+                 error=str(error))
+
+        return stats, failures
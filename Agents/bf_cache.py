@@ -0,0 +1,144 @@
+#!/usr/bin/env python3
+"""
+bf-db local caches
+File-backed caches shared by the crawler, enrichment and index jobs
+"""
+
+import json
+import os
+import tempfile
+import threading
+import time
+from typing import Any, Callable, Dict, Optional, Tuple
+
+# Local cache directory (override with BF_DB_CACHE_DIR)
+CACHE_DIR = os.environ.get(
+    'BF_DB_CACHE_DIR',
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), '.bf-cache')
+)
+
+
+def cache_path(*parts: str) -> str:
+    """Path inside the cache directory, creating parent directories"""
+    path = os.path.join(CACHE_DIR, *parts)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    return path
+
+
+def atomic_write_json(path: str, data: Any) -> None:
+    """Write JSON via a temp file + rename so readers never see a partial file"""
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(path)), suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'w') as f:
+            json.dump(data, f, separators=(',', ':'))
+        os.replace(tmp_path, path)
+    except Exception:
+        os.unlink(tmp_path)
+        raise
+
+
+class TTLCache:
+    """JSON-file cache of per-key records that expire after `ttl_seconds`"""
+
+    def __init__(self, name: str, ttl_seconds: float, path: str = None):
+        self.path = path or cache_path(f'{name}.json')
+        self.ttl_seconds = ttl_seconds
+        self._lock = threading.Lock()
+        self._records: Dict[str, Dict[str, Any]] = {}
+        self._dirty = 0
+
+        if os.path.exists(self.path):
+            try:
+                with open(self.path) as f:
+                    self._records = json.load(f)
+            except (OSError, ValueError) as e:
+                print(f"   ⚠️  Ignoring unreadable cache {self.path}: {e}")
+
+    def __len__(self) -> int:
+        return len(self._records)
+
+    def is_fresh(self, key: str, now: float = None) -> bool:
+        """Whether a record exists and is younger than the TTL"""
+        record = self._records.get(key)
+        if not record:
+            return False
+        return (now or time.time()) - record.get('cachedAt', 0) < self.ttl_seconds
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        """Return a record regardless of age"""
+        return self._records.get(key)
+
+    def put(self, key: str, record: Dict[str, Any], autosave_every: int = 500) -> None:
+        """Store a record stamped with the current time"""
+        with self._lock:
+            self._records[key] = {**record, 'cachedAt': time.time()}
+            self._dirty += 1
+            if autosave_every and self._dirty >= autosave_every:
+                self._save_locked()
+
+    def discard(self, key: str) -> None:
+        """Drop a record if present"""
+        with self._lock:
+            if self._records.pop(key, None) is not None:
+                self._dirty += 1
+
+    def save(self) -> None:
+        """Persist the cache if it changed"""
+        with self._lock:
+            if self._dirty:
+                self._save_locked()
+
+    def _save_locked(self) -> None:
+        atomic_write_json(self.path, self._records)
+        self._dirty = 0
+
+
+def _signature(path: str) -> Tuple[float, int]:
+    """Newest modification time and total size of a file or directory tree"""
+    if os.path.isfile(path):
+        stat = os.stat(path)
+        return stat.st_mtime, stat.st_size
+    newest, size = 0.0, 0
+    for root, _, files in os.walk(path):
+        for name in files:
+            stat = os.stat(os.path.join(root, name))
+            newest, size = max(newest, stat.st_mtime), size + stat.st_size
+    return newest, size
+
+
+class IndexCache:
+    """Local indexes kept loaded while their files are unchanged (a shell session reuses them)"""
+
+    def __init__(self):
+        self._loaded: Dict[Tuple[str, str], Tuple[Tuple[float, int], Any]] = {}
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._loaded)
+
+    def get(self, load: Callable[[str], Any], path: str) -> Any:
+        """`load(path)`, or the object it returned before if the file(s) at `path` have not changed"""
+        key = (getattr(load, '__qualname__', repr(load)), os.path.abspath(path))
+        signature = _signature(path) if os.path.exists(path) else None
+        with self._lock:
+            entry = self._loaded.get(key)
+            if entry and signature is not None and entry[0] == signature:
+                return entry[1]
+            if entry:
+                self._close(entry[1])
+            loaded = load(path)
+            if signature is not None:
+                self._loaded[key] = (signature, loaded)
+            return loaded
+
+    def clear(self) -> None:
+        with self._lock:
+            for _, loaded in self._loaded.values():
+                self._close(loaded)
+            self._loaded.clear()
+
+    @staticmethod
+    def _close(loaded: Any) -> None:
+        if hasattr(loaded, 'close'):
+            loaded.close()
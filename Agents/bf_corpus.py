@@ -0,0 +1,296 @@
+#!/usr/bin/env python3
+"""
+bf-db synthetic corpus
+Skewed, deterministic webpages corpora for scale testing: NDJSON or parallel batch loads
+"""
+
+import gzip
+import json
+import random
+import sys
+import threading
+import time
+from collections import Counter, defaultdict
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Any, Dict, Iterable, Iterator, List, Tuple
+
+from bf_dynamo import BATCH_WRITE_LIMIT, backoff_delay, call_with_retries, chunked, item_size
+from bf_local import SOURCE_DISTRIBUTION, VOCABULARY, production_plan
+from bf_progress import finish, progress
+
+# DynamoDB items are capped at 400 KB; textContent stays well under it
+MAX_TEXT_BYTES = 350 * 1024
+
+# Paragraphs pre-built per category; bodies are assembled from them
+PARAGRAPHS_PER_CATEGORY = 64
+
+SOURCES = {source: category for category, source, _, _ in SOURCE_DISTRIBUTION}
+CATEGORIES = sorted({category for category in SOURCES.values() if category})
+
+
+def parse_skew(specs: Iterable[str]) -> Dict[str, Dict[str, float]]:
+    """
+    `source:NAME=WEIGHT` / `category:NAME=WEIGHT` specs as weight maps
+
+    Weights multiply the production share (2 doubles it, 0 drops it).
+    """
+    weights: Dict[str, Dict[str, float]] = {'source': {}, 'category': {}}
+    for spec in specs or []:
+        kind, _, rest = spec.partition(':')
+        name, _, weight = rest.rpartition('=')
+        if kind not in weights or not name or not weight:
+            raise ValueError(f'Bad skew {spec!r} (expected source:NAME=WEIGHT or category:NAME=WEIGHT)')
+        known = SOURCES if kind == 'source' else CATEGORIES
+        if name not in known:
+            raise ValueError(f"Unknown {kind} {name!r} (known: {', '.join(sorted(known))})")
+        weights[kind][name] = float(weight)
+    return weights
+
+
+class CorpusProfile:
+    """
+    Shape of a synthetic corpus: source/category skew, text bodies and engagement
+
+    Sources start from their production shares. `source_weights` and
+    `category_weights` multiply them (0 drops a source), and `zipf` > 0
+    further weights sources by production rank as 1 / rank ** zipf, piling
+    the table into a few large sources. `text_share` of items carry a
+    textContent body of lognormal size around `text_bytes` (spread
+    `text_sigma`); `engagement` adds viewCount/likeCount/saveCount/
+    commentCount with the heavy tails real feeds have.
+    """
+
+    def __init__(self, source_weights: Dict[str, float] = None, category_weights: Dict[str, float] = None,
+                 zipf: float = 0.0, text_share: float = 0.6, text_bytes: int = 4000, text_sigma: float = 1.0,
+                 engagement: bool = True):
+        self.source_weights = dict(source_weights or {})
+        self.category_weights = dict(category_weights or {})
+        self.zipf = zipf
+        self.text_share = text_share
+        self.text_bytes = text_bytes
+        self.text_sigma = text_sigma
+        self.engagement = engagement
+        self._paragraphs: Dict[str, List[str]] = {}
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> 'CorpusProfile':
+        known = {'source_weights', 'category_weights', 'zipf', 'text_share', 'text_bytes', 'text_sigma',
+                 'engagement'}
+        unknown = set(data) - known
+        if unknown:
+            raise ValueError(f"Unknown corpus profile fields: {', '.join(sorted(unknown))}")
+        return cls(**data)
+
+    @classmethod
+    def load(cls, path: str) -> 'CorpusProfile':
+        with open(path) as f:
+            return cls.from_dict(json.load(f))
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            'source_weights': self.source_weights,
+            'category_weights': self.category_weights,
+            'zipf': self.zipf,
+            'text_share': self.text_share,
+            'text_bytes': self.text_bytes,
+            'text_sigma': self.text_sigma,
+            'engagement': self.engagement
+        }
+
+    def plan(self, count: int) -> List[Tuple[str, str, float, int]]:
+        """(bfCategory, source, active share, items) summing to `count`"""
+        if not self.source_weights and not self.category_weights and not self.zipf:
+            return production_plan(count)
+        weighted = []
+        for rank, (category, source, share, active) in enumerate(
+                sorted(SOURCE_DISTRIBUTION, key=lambda row: -row[2]), 1):
+            weight = share * self.source_weights.get(source, 1.0) * self.category_weights.get(category, 1.0)
+            if self.zipf:
+                weight /= rank ** self.zipf
+            if weight > 0:
+                weighted.append((category, source, active, weight))
+        if not weighted:
+            raise ValueError('Every source has weight 0')
+        total = sum(weight for *_, weight in weighted)
+        plan = [(category, source, active, round(count * weight / total))
+                for category, source, active, weight in weighted]
+        # Rounding drift goes to the largest source
+        largest = max(range(len(plan)), key=lambda index: plan[index][3])
+        plan[largest] = plan[largest][:3] + (plan[largest][3] + count - sum(n for *_, n in plan),)
+        return [row for row in plan if row[3] > 0]
+
+    def _category_paragraphs(self, category: str) -> List[str]:
+        paragraphs = self._paragraphs.get(category)
+        if paragraphs is None:
+            # Own stream per category, so bodies do not depend on generation order
+            rng = random.Random(f'paragraphs:{category}')
+            words = VOCABULARY[category].split() + VOCABULARY[''].split()
+            weights = [1.0 / (rank + 1) for rank in range(len(words))]
+            paragraphs = []
+            for _ in range(PARAGRAPHS_PER_CATEGORY):
+                sentences = []
+                for _ in range(rng.randint(4, 9)):
+                    sentence = rng.choices(words, weights=weights, k=rng.randint(8, 20))
+                    sentences.append(' '.join(sentence).capitalize() + '.')
+                paragraphs.append(' '.join(sentences))
+            self._paragraphs[category] = paragraphs
+        return paragraphs
+
+    def text(self, category: str, rng) -> str:
+        """A textContent body of lognormal size, assembled from the category's paragraphs"""
+        paragraphs = self._category_paragraphs(category)
+        target = min(MAX_TEXT_BYTES, max(200, int(rng.lognormvariate(0, self.text_sigma) * self.text_bytes)))
+        parts, size = [], 0
+        while size < target:
+            paragraph = paragraphs[rng.randrange(len(paragraphs))]
+            parts.append(paragraph)
+            size += len(paragraph) + 2
+        return '\n\n'.join(parts)[:target]
+
+    def decorate(self, item: Dict[str, Any], rng, category: str) -> None:
+        """Add textContent and engagement to a synthetic item"""
+        if self.text_share and rng.random() < self.text_share:
+            item['textContent'] = {'S': self.text(category, rng)}
+        if self.engagement:
+            views = int(rng.lognormvariate(4.5, 1.6))
+            likes = int(views * rng.betavariate(1.2, 40))
+            item['viewCount'] = {'N': str(views)}
+            item['likeCount'] = {'N': str(likes)}
+            item['saveCount'] = {'N': str(int(likes * rng.betavariate(1.5, 6)))}
+            item['commentCount'] = {'N': str(int(rng.paretovariate(1.6)) - 1 if rng.random() < 0.3 else 0)}
+
+
+# ---------- NDJSON ----------
+
+def _open(path: str, mode: str):
+    if path == '-':
+        # The real stdout: --quiet/--json redirect sys.stdout
+        return sys.__stdout__ if 'w' in mode else sys.stdin
+    if path.endswith('.gz'):
+        return gzip.open(path, mode + 't', compresslevel=3)
+    return open(path, mode)
+
+
+def write_ndjson(items: Iterable[Dict[str, Any]], path: str, total: int = None) -> Dict[str, Any]:
+    """
+    Stream items as NDJSON, one `{"Item": {...}}` per line ('-' for stdout, .gz to compress)
+
+    The line format is that of DynamoDB's S3 export, so files can go through
+    DynamoDB's import-from-S3 as well as `read_ndjson`.
+    """
+    stats = CorpusStats('write corpus', total)
+    f = _open(path, 'w')
+    try:
+        for item in items:
+            f.write(json.dumps({'Item': item}, separators=(',', ':')) + '\n')
+            stats.add(item)
+    finally:
+        finish()
+        if f is not sys.__stdout__:
+            f.close()
+    return stats.summary()
+
+
+def read_ndjson(path: str) -> Iterator[Dict[str, Any]]:
+    """Items of an NDJSON corpus (`{"Item": ...}` lines or bare items)"""
+    f = _open(path, 'r')
+    try:
+        for line in f:
+            if line.strip():
+                record = json.loads(line)
+                yield record.get('Item', record)
+    finally:
+        if f is not sys.stdin:
+            f.close()
+
+
+# ---------- loading ----------
+
+class CorpusStats:
+    """Running counts of generated or loaded items: sources, categories, sizes (and progress of `task`)"""
+
+    def __init__(self, task: str = None, total: int = None):
+        self.task = task
+        self.total = total
+        self.items = 0
+        self.bytes = 0
+        self.max_bytes = 0
+        self.text_items = 0
+        self.sources: Counter = Counter()
+        self.categories: Counter = Counter()
+        self.active = 0
+        self.started = time.perf_counter()
+
+    def add(self, item: Dict[str, Any]) -> None:
+        size = item_size(item)
+        self.items += 1
+        self.bytes += size
+        self.max_bytes = max(self.max_bytes, size)
+        self.text_items += 'textContent' in item
+        self.sources[item['source']['S']] += 1
+        self.categories[item.get('bfCategory', {}).get('S', '')] += 1
+        self.active += item.get('status', {}).get('S') == 'active'
+        if self.task:
+            progress(self.task, self.items, self.total)
+
+    def summary(self) -> Dict[str, Any]:
+        seconds = time.perf_counter() - self.started
+        return {
+            'items': self.items,
+            'active': self.active,
+            'mb': round(self.bytes / 1024 ** 2, 2),
+            'avg_item_bytes': round(self.bytes / self.items) if self.items else 0,
+            'max_item_bytes': self.max_bytes,
+            'text_items': self.text_items,
+            'sources': dict(self.sources.most_common()),
+            'categories': dict(self.categories.most_common()),
+            'seconds': round(seconds, 2),
+            'items_per_second': round(self.items / seconds) if seconds else 0
+        }
+
+
+def parallel_load(client, table_name: str, items: Iterable[Dict[str, Any]], max_workers: int = 8,
+                  max_retries: int = 8, total: int = None) -> Dict[str, Any]:
+    """
+    Load items with concurrent BatchWriteItem calls
+
+    At most 2 x `max_workers` batches are in flight, so a corpus of any size
+    streams through in constant memory. Unprocessed items are retried with
+    backoff, and throttling errors through call_with_retries.
+    """
+    stats = CorpusStats('load corpus', total)
+    counters = defaultdict(int)
+    lock = threading.Lock()
+
+    def write(batch: List[Dict[str, Any]]) -> None:
+        request = {table_name: [{'PutRequest': {'Item': item}} for item in batch]}
+        attempt = 0
+        while request:
+            response = call_with_retries(client.batch_write_item, RequestItems=request, max_retries=max_retries)
+            request = response.get('UnprocessedItems') or {}
+            with lock:
+                counters['calls'] += 1
+                if request:
+                    counters['unprocessed'] += sum(len(requests) for requests in request.values())
+            if request:
+                if attempt >= max_retries:
+                    raise RuntimeError(f'{len(request[table_name])} items still unprocessed after '
+                                       f'{max_retries} retries')
+                time.sleep(backoff_delay(attempt))
+                attempt += 1
+
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        pending = set()
+        for batch in chunked(items, BATCH_WRITE_LIMIT):
+            for item in batch:
+                stats.add(item)
+            pending.add(pool.submit(write, batch))
+            if len(pending) >= 2 * max_workers:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    future.result()
+        for future in pending:
+            future.result()
+    finish()
+
+    return {**stats.summary(), 'calls': counters['calls'], 'unprocessed_retried': counters['unprocessed']}
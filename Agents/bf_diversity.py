@@ -0,0 +1,135 @@
+#!/usr/bin/env python3
+"""
+bf-db feed diversity
+Source-interleaving k-way merge with domain spreading for feed ordering
+"""
+
+import heapq
+import random
+import time
+from collections import OrderedDict, deque
+from typing import Any, Dict, Iterable, Iterator, List, Sequence
+from urllib.parse import urlparse
+
+from bf_sampler import DEFAULT_QUALITY
+
+
+def item_domain(item: Dict[str, Any]) -> str:
+    return item.get('domain') or urlparse(item['url']).netloc.lower()
+
+
+def source_quality(items: Iterable[Dict[str, Any]]) -> Dict[str, float]:
+    """Mean qualityScore per source"""
+    totals: Dict[str, List[float]] = {}
+    for item in items:
+        score = item.get('qualityScore')
+        entry = totals.setdefault(item.get('source') or 'unknown', [0.0, 0])
+        entry[0] += DEFAULT_QUALITY if score is None else score
+        entry[1] += 1
+    return {source: max(total / count, 1.0) for source, (total, count) in totals.items()}
+
+
+def interleave(queues: Dict[str, Sequence[Dict[str, Any]]], quality: Dict[str, float] = None,
+               domain_gap: int = 3, lookahead: int = 4) -> Iterator[Dict[str, Any]]:
+    """
+    Merge per-source queues into one diversified stream (streaming k-way merge)
+
+    The j-th of a source's n items is due at ((j + 0.5) / n) ** (q / q_mean):
+    every source is spread across the whole stream in proportion to its
+    size (no long runs, and no tail left to the biggest source), while
+    sources with above-average quality are pulled towards the front. The
+    next item is passed over (kept at the head of its queue) when its domain
+    appeared in the last `domain_gap` positions and one of the next
+    `lookahead` queues, due within about `lookahead` positions, offers
+    another domain. Each item costs O(log k) for k sources, so the merge is
+    linear in the number of items.
+    """
+    quality = quality or {}
+    sizes = {source: len(queue) for source, queue in queues.items() if len(queue)}
+    total = sum(sizes.values())
+    if not total:
+        return
+    mean_quality = sum(quality.get(s, DEFAULT_QUALITY) * n for s, n in sizes.items()) / total
+    exponents = {s: quality.get(s, DEFAULT_QUALITY) / mean_quality for s in sizes}
+
+    def due(source: str, j: int) -> float:
+        return ((j + 0.5) / sizes[source]) ** exponents[source]
+
+    heap = [(due(source, 0), order, source, 0) for order, source in enumerate(sizes)]
+    heapq.heapify(heap)
+    recent = deque(maxlen=max(domain_gap, 1))
+    # One output position is about 1/total of the due-time range
+    window = lookahead / total
+
+    while heap:
+        entry = heapq.heappop(heap)
+        if domain_gap and item_domain(queues[entry[2]][entry[3]]) in recent:
+            held = []
+            while heap and len(held) < lookahead and heap[0][0] - entry[0] <= window:
+                candidate = heapq.heappop(heap)
+                if item_domain(queues[candidate[2]][candidate[3]]) not in recent:
+                    held.append(entry)
+                    entry = candidate
+                    break
+                held.append(candidate)
+            for skipped in held:
+                heapq.heappush(heap, skipped)
+
+        _, order, source, j = entry
+        item = queues[source][j]
+        recent.append(item_domain(item))
+        yield item
+
+        if j + 1 < sizes[source]:
+            heapq.heappush(heap, (due(source, j + 1), order, source, j + 1))
+
+
+def group_by_source(items: Iterable[Dict[str, Any]]) -> 'OrderedDict[str, List[Dict[str, Any]]]':
+    """Per-source lists, keeping each source's relative order"""
+    groups: 'OrderedDict[str, List[Dict[str, Any]]]' = OrderedDict()
+    for item in items:
+        groups.setdefault(item.get('source') or 'unknown', []).append(item)
+    return groups
+
+
+def diversify(items: List[Dict[str, Any]], domain_gap: int = 3) -> List[Dict[str, Any]]:
+    """Reorder a list so sources alternate and domains are spread apart"""
+    return list(interleave(group_by_source(items), source_quality(items), domain_gap))
+
+
+def benchmark(sizes: List[int] = None, sources: int = 40, domains_per_source: int = 3,
+              seed: int = 7, runs: int = 3) -> List[Dict[str, Any]]:
+    """Time diversify() on synthetic skewed categories of increasing size"""
+    rng = random.Random(seed)
+    sizes = sizes or [10000, 25000, 50000, 100000]
+    results = []
+    for size in sizes:
+        # Zipf-like source skew, like one big importer dominating a category
+        source_ids = [min(int(rng.paretovariate(1.2)) - 1, sources - 1) for _ in range(size)]
+        items = [{
+            'url': f'https://d{s}-{i % domains_per_source}.example/{i}',
+            'domain': f'd{s}-{i % domains_per_source}.example',
+            'source': f'source-{s}',
+            'qualityScore': rng.randint(1, 100)
+        } for i, s in enumerate(source_ids)]
+
+        best = None
+        for _ in range(runs):
+            start = time.perf_counter()
+            ordered = diversify(items)
+            elapsed = time.perf_counter() - start
+            best = elapsed if best is None else min(best, elapsed)
+
+        longest_run = run = 1
+        for previous, current in zip(ordered, ordered[1:]):
+            run = run + 1 if previous['source'] == current['source'] else 1
+            longest_run = max(longest_run, run)
+
+        results.append({
+            'items': size,
+            'sources': len(set(source_ids)),
+            'seconds': round(best, 4),
+            'us_per_item': round(best / size * 1e6, 2),
+            'longest_source_run': longest_run
+        })
+    return results
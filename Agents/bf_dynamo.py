@@ -0,0 +1,306 @@
+#!/usr/bin/env python3
+"""
+bf-db shared DynamoDB helpers
+Pagination, batching and retry primitives used by the bulk engines
+"""
+
+import random
+import time
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional
+
+# DynamoDB hard limits
+BATCH_GET_LIMIT = 100
+BATCH_WRITE_LIMIT = 25
+TRANSACT_ITEMS_LIMIT = 100
+TRANSACT_BYTES_LIMIT = 4 * 1024 * 1024
+
+# Error codes that are safe to retry with backoff
+RETRYABLE_ERROR_CODES = {
+    'ProvisionedThroughputExceededException',
+    'ThrottlingException',
+    'RequestLimitExceeded',
+    'InternalServerError',
+    'ServiceUnavailable',
+    'TransactionConflictException',
+    'TransactionInProgressException',
+}
+
+
+def chunked(iterable: Iterable, size: int) -> Iterator[List]:
+    """Yield lists of at most `size` elements from an iterable"""
+    chunk = []
+    for element in iterable:
+        chunk.append(element)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def error_code(error: Exception) -> str:
+    """Return the AWS error code of a botocore ClientError (or '' if none)"""
+    response = getattr(error, 'response', None) or {}
+    return response.get('Error', {}).get('Code', '')
+
+
+def cancellation_reasons(error: Exception) -> List[str]:
+    """Return per-action cancellation codes of a TransactionCanceledException"""
+    response = getattr(error, 'response', None) or {}
+    return [reason.get('Code', 'None') for reason in response.get('CancellationReasons', [])]
+
+
+def is_retryable(error: Exception) -> bool:
+    """Whether an error is transient (throttling, conflicts, 5xx)"""
+    code = error_code(error)
+    if code in RETRYABLE_ERROR_CODES:
+        return True
+    if code == 'TransactionCanceledException':
+        # Retry only if every failing action was cancelled for a transient reason
+        reasons = [r for r in cancellation_reasons(error) if r != 'None']
+        return bool(reasons) and all(
+            r in ('TransactionConflict', 'ThrottlingError', 'ProvisionedThroughputExceeded')
+            for r in reasons
+        )
+    return False
+
+
+def backoff_delay(attempt: int, base_delay: float = 0.1, max_delay: float = 5.0) -> float:
+    """Full-jitter exponential backoff delay for a retry attempt"""
+    return random.uniform(0, min(max_delay, base_delay * (2 ** attempt)))
+
+
+def call_with_retries(fn: Callable, *args, max_retries: int = 5,
+                      base_delay: float = 0.1, on_retry: Optional[Callable] = None,
+                      **kwargs) -> Any:
+    """Call a DynamoDB client method, retrying transient errors with jittered backoff"""
+    attempt = 0
+    while True:
+        try:
+            return fn(*args, **kwargs)
+        except Exception as e:
+            if attempt >= max_retries or not is_retryable(e):
+                raise
+            if on_retry:
+                on_retry(e, attempt)
+            time.sleep(backoff_delay(attempt, base_delay))
+            attempt += 1
+
+
+def url_key(url: str) -> Dict[str, Dict[str, str]]:
+    """Primary key for the webpages table"""
+    return {'url': {'S': url}}
+
+
+def item_size(item: Dict[str, Any]) -> int:
+    """Rough serialized size of a DynamoDB-JSON item in bytes"""
+    size = 0
+    for name, value in item.items():
+        size += len(name.encode('utf-8'))
+        for type_key, raw in value.items():
+            if type_key in ('S', 'N', 'B'):
+                size += len(raw.encode('utf-8')) if isinstance(raw, str) else len(raw)
+            elif type_key in ('SS', 'NS'):
+                size += sum(len(v.encode('utf-8')) for v in raw)
+            elif type_key in ('M',):
+                size += item_size(raw)
+            elif type_key in ('L',):
+                size += sum(item_size({'': v}) for v in raw)
+            else:
+                size += 1
+    return size
+
+
+def response_bytes(response: Dict[str, Any], items: List[Dict[str, Any]]) -> int:
+    """Payload size of a response from its content-length header (measuring the items without one)"""
+    length = response.get('ResponseMetadata', {}).get('HTTPHeaders', {}).get('content-length')
+    return int(length) if length is not None else sum(item_size(item) for item in items)
+
+
+def batch_get_items(client, table_name: str, urls: List[str], max_retries: int = 5,
+                    consistent_read: bool = True) -> Dict[str, Dict[str, Any]]:
+    """Fetch items by url with BatchGetItem, following UnprocessedKeys
+
+    Returns:
+        Dictionary mapping url to the stored item (missing urls are absent)
+    """
+    found = {}
+    for chunk in chunked(dict.fromkeys(urls), BATCH_GET_LIMIT):
+        request = {table_name: {
+            'Keys': [url_key(url) for url in chunk],
+            'ConsistentRead': consistent_read
+        }}
+        attempt = 0
+        while request:
+            response = call_with_retries(client.batch_get_item, RequestItems=request,
+                                         max_retries=max_retries)
+            for item in response.get('Responses', {}).get(table_name, []):
+                found[item['url']['S']] = item
+
+            request = response.get('UnprocessedKeys') or {}
+            if request:
+                if attempt >= max_retries:
+                    raise RuntimeError(f"BatchGetItem left {len(request[table_name]['Keys'])} keys unprocessed")
+                time.sleep(backoff_delay(attempt))
+                attempt += 1
+    return found
+
+
+def iter_pages(method: Callable, **kwargs) -> Iterator[Dict[str, Any]]:
+    """Yield every page of a scan/query call, following LastEvaluatedKey"""
+    while True:
+        response = call_with_retries(method, **kwargs)
+        yield response
+        if 'LastEvaluatedKey' not in response:
+            break
+        kwargs['ExclusiveStartKey'] = response['LastEvaluatedKey']
+
+
+class MethodPaginator:
+    """`client.get_paginator()` stand-in that pages through a given (wrapped) client method
+
+    boto3 paginators call the service directly, bypassing client wrappers;
+    this one calls `method`, so wrappers see every page.
+    """
+
+    def __init__(self, method: Callable):
+        self.method = method
+
+    def paginate(self, **kwargs) -> Iterator[Dict[str, Any]]:
+        while True:
+            page = self.method(**kwargs)
+            yield page
+            if 'LastEvaluatedKey' not in page:
+                return
+            kwargs = {**kwargs, 'ExclusiveStartKey': page['LastEvaluatedKey']}
+
+
+def iter_items(method: Callable, **kwargs) -> Iterator[Dict[str, Any]]:
+    """Stream items of a paginated scan/query without holding them all in memory"""
+    for page in iter_pages(method, **kwargs):
+        yield from page.get('Items', [])
+
+
+def build_update(attributes: Dict[str, Any]) -> Dict[str, Any]:
+    """Build UpdateItem expression arguments from `{attr: value}`
+
+    A value of None removes the attribute; every other value must already be
+    a DynamoDB attribute value (e.g. {'S': 'x'}).
+    """
+    set_parts, remove_parts = [], []
+    names, values = {}, {}
+
+    for i, (name, value) in enumerate(sorted(attributes.items())):
+        names[f'#a{i}'] = name
+        if value is None:
+            remove_parts.append(f'#a{i}')
+        else:
+            set_parts.append(f'#a{i} = :v{i}')
+            values[f':v{i}'] = value
+
+    expression = []
+    if set_parts:
+        expression.append('SET ' + ', '.join(set_parts))
+    if remove_parts:
+        expression.append('REMOVE ' + ', '.join(remove_parts))
+
+    update = {
+        'UpdateExpression': ' '.join(expression),
+        'ExpressionAttributeNames': names
+    }
+    if values:
+        update['ExpressionAttributeValues'] = values
+    return update
+
+
+def index_definition(client, table_name: str, index_name: str, hash_key: str,
+                     range_key: str = None) -> Optional[Dict[str, Any]]:
+    """UpdateTable arguments creating a string-keyed ALL-projection GSI, or None if it exists"""
+    table = call_with_retries(client.describe_table, TableName=table_name)['Table']
+    if any(index['IndexName'] == index_name for index in table.get('GlobalSecondaryIndexes', [])):
+        return None
+
+    keys = [(hash_key, 'HASH')] + ([(range_key, 'RANGE')] if range_key else [])
+    create = {
+        'IndexName': index_name,
+        'KeySchema': [{'AttributeName': name, 'KeyType': key_type} for name, key_type in keys],
+        'Projection': {'ProjectionType': 'ALL'}
+    }
+    if table.get('BillingModeSummary', {}).get('BillingMode') != 'PAY_PER_REQUEST':
+        throughput = table.get('ProvisionedThroughput', {})
+        create['ProvisionedThroughput'] = {
+            'ReadCapacityUnits': throughput.get('ReadCapacityUnits', 5),
+            'WriteCapacityUnits': throughput.get('WriteCapacityUnits', 5)
+        }
+    return {
+        'TableName': table_name,
+        'AttributeDefinitions': [{'AttributeName': name, 'AttributeType': 'S'} for name, _ in keys],
+        'GlobalSecondaryIndexUpdates': [{'Create': create}]
+    }
+
+
+def index_status(client, table_name: str, index_name: str) -> Dict[str, Any]:
+    """IndexStatus/Backfilling of a GSI ('MISSING' when it does not exist)"""
+    table = call_with_retries(client.describe_table, TableName=table_name)['Table']
+    for index in table.get('GlobalSecondaryIndexes', []):
+        if index['IndexName'] == index_name:
+            return {
+                'status': index.get('IndexStatus', 'UNKNOWN'),
+                'backfilling': index.get('Backfilling', False),
+                'items': index.get('ItemCount')
+            }
+    return {'status': 'MISSING', 'backfilling': False, 'items': None}
+
+
+def from_attribute(value: Dict[str, Any]) -> Any:
+    """Convert one DynamoDB attribute value to a plain Python value"""
+    (type_key, raw), = value.items()
+    if type_key == 'S':
+        return raw
+    if type_key == 'N':
+        number = float(raw)
+        return int(number) if number.is_integer() and 'e' not in raw.lower() else number
+    if type_key == 'BOOL':
+        return raw
+    if type_key == 'NULL':
+        return None
+    if type_key == 'SS':
+        return list(raw)
+    if type_key == 'NS':
+        return [from_attribute({'N': n}) for n in raw]
+    if type_key == 'L':
+        return [from_attribute(v) for v in raw]
+    if type_key == 'M':
+        return plain_item(raw)
+    return raw
+
+
+def plain_item(item: Dict[str, Any], fields: Iterable[str] = None) -> Dict[str, Any]:
+    """Convert a DynamoDB-JSON item (optionally only some fields) to plain values"""
+    names = fields if fields is not None else item.keys()
+    return {name: from_attribute(item[name]) for name in names if name in item}
+
+
+def iter_plain_items(client, table_name: str, fields: Iterable[str],
+                     query: Dict[str, Any] = None) -> Iterator[Dict[str, Any]]:
+    """Plain items with `fields`, from status-index active items by default
+
+    `query` replaces the key condition (e.g. a category-status-index or
+    source-status-index query); a query without a key condition (such as
+    `{}`) scans the table.
+    """
+    fields = sorted(set(fields) | {'url'})
+    names = {f'#f{i}': field for i, field in enumerate(fields)}
+    kwargs = query if query is not None else {
+        'IndexName': 'status-index',
+        'KeyConditionExpression': '#status = :status',
+        'ExpressionAttributeNames': {'#status': 'status'},
+        'ExpressionAttributeValues': {':status': {'S': 'active'}}
+    }
+    kwargs = {**kwargs, 'TableName': table_name, 'ProjectionExpression': ', '.join(names)}
+    kwargs['ExpressionAttributeNames'] = {**names, **kwargs.get('ExpressionAttributeNames', {})}
+    method = client.query if 'KeyConditionExpression' in kwargs else client.scan
+    for raw in iter_items(method, **kwargs):
+        item = plain_item(raw, fields)
+        if item.get('url'):
+            yield item
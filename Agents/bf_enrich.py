@@ -0,0 +1,192 @@
+#!/usr/bin/env python3
+"""
+bf-db Open Graph enrichment
+Streaming <head> metadata extraction with a content-hash cache
+"""
+
+import codecs
+import hashlib
+import re
+import time
+from html.parser import HTMLParser
+from typing import Any, Dict
+from urllib.parse import urljoin
+
+import requests
+
+from bf_cache import TTLCache
+from bf_links import HttpWorker
+from bf_profile import span
+
+# Meta keys worth keeping, in priority order per output field
+IMAGE_KEYS = ['og:image', 'og:image:url', 'og:image:secure_url', 'twitter:image', 'twitter:image:src']
+DESCRIPTION_KEYS = ['og:description', 'twitter:description', 'description']
+
+# Tags whose text is not article content
+NON_CONTENT_TAGS = {'script', 'style', 'noscript', 'template', 'svg', 'nav', 'footer'}
+
+WHITESPACE_RE = re.compile(r'\s+')
+
+
+class PageMetaParser(HTMLParser):
+    """Incremental HTML parser for head metadata and (optionally) body word count
+
+    Feed it decoded chunks as they arrive; `done` flips as soon as everything
+    needed has been seen, which is right after </head> (or <body>) unless
+    word counting was requested.
+    """
+
+    def __init__(self, count_words: bool = False):
+        super().__init__(convert_charrefs=True)
+        self.count_words = count_words
+        self.meta: Dict[str, str] = {}
+        self.title = ''
+        self.word_count = 0
+        self.head_done = False
+        self.done = False
+        self._in_title = False
+        self._skip_depth = 0
+
+    def _finish_head(self):
+        self.head_done = True
+        if not self.count_words:
+            self.done = True
+
+    def handle_starttag(self, tag, attrs):
+        if tag == 'meta' and not self.head_done:
+            attrs = dict(attrs)
+            key = (attrs.get('property') or attrs.get('name') or '').strip().lower()
+            content = attrs.get('content')
+            if key and content and key not in self.meta:
+                self.meta[key] = content.strip()
+        elif tag == 'title' and not self.head_done:
+            self._in_title = True
+        elif tag == 'body':
+            if not self.head_done:
+                self._finish_head()
+        elif tag in NON_CONTENT_TAGS:
+            self._skip_depth += 1
+
+    def handle_endtag(self, tag):
+        if tag == 'head':
+            self._finish_head()
+        elif tag == 'title':
+            self._in_title = False
+        elif tag in NON_CONTENT_TAGS and self._skip_depth:
+            self._skip_depth -= 1
+
+    def handle_data(self, data):
+        if self._in_title:
+            self.title += data
+        elif self.head_done and self.count_words and not self._skip_depth:
+            self.word_count += len(data.split())
+
+    def first(self, keys) -> str:
+        """First non-empty meta value among keys"""
+        for key in keys:
+            if self.meta.get(key):
+                return self.meta[key]
+        return ''
+
+
+def clean_text(text: str, max_length: int = 300) -> str:
+    """Collapse whitespace and truncate on a word boundary"""
+    text = WHITESPACE_RE.sub(' ', text).strip()
+    if len(text) <= max_length:
+        return text
+    return text[:max_length].rsplit(' ', 1)[0] + '…'
+
+
+class PageEnricher(HttpWorker):
+    """Fetch pages concurrently and extract og:image, description and length
+
+    Results are kept in a url-keyed cache together with the page's ETag,
+    Last-Modified and a SHA-256 of the bytes read: fresh entries are served
+    without a request, stale ones are revalidated with a conditional GET, and
+    `changed` tells callers whether the page content actually differs.
+    """
+
+    def __init__(self, cache: TTLCache, head_bytes: int = 512 * 1024,
+                 max_bytes: int = 2 * 1024 * 1024, **kwargs):
+        super().__init__(**kwargs)
+        self.cache = cache
+        self.head_bytes = head_bytes
+        self.max_bytes = max_bytes
+
+    def enrich_url(self, url: str, count_words: bool = False) -> Dict[str, Any]:
+        """Extract metadata for one url (served from cache when possible)"""
+        cached = self.cache.get(url)
+        usable = cached and cached.get('httpStatus') == 200 and (not count_words or 'wordCount' in cached)
+
+        if usable and self.cache.is_fresh(url):
+            return {**cached, 'changed': False, 'fromCache': True}
+
+        headers = {}
+        if usable:
+            if cached.get('etag'):
+                headers['If-None-Match'] = cached['etag']
+            if cached.get('lastModified'):
+                headers['If-Modified-Since'] = cached['lastModified']
+
+        start = time.perf_counter()
+        try:
+            with span('fetch'), self._session().get(url, headers=headers, timeout=self.timeout,
+                                                    allow_redirects=True, stream=True) as response:
+                if response.status_code == 304 and usable:
+                    self.cache.put(url, cached)
+                    return {**cached, 'changed': False, 'fromCache': True}
+
+                result = {'url': url, 'httpStatus': response.status_code, 'finalUrl': response.url}
+                content_type = response.headers.get('Content-Type', '')
+                if response.status_code != 200 or 'html' not in content_type.lower():
+                    result['error'] = f'HTTP {response.status_code} {content_type}'.strip()
+                    self.cache.put(url, result)
+                    return {**result, 'changed': True, 'fromCache': False}
+
+                parser, digest, bytes_read = self._parse_stream(response, count_words)
+        except requests.RequestException as e:
+            return {'url': url, 'httpStatus': 0, 'error': type(e).__name__,
+                    'changed': True, 'fromCache': False}
+
+        image = parser.first(IMAGE_KEYS)
+        result.update({
+            'etag': response.headers.get('ETag', ''),
+            'lastModified': response.headers.get('Last-Modified', ''),
+            'contentHash': digest,
+            'bytesRead': bytes_read,
+            'title': clean_text(parser.title, 200),
+            'thumbnailUrl': urljoin(result['finalUrl'], image) if image else '',
+            'description': clean_text(parser.first(DESCRIPTION_KEYS)),
+            'elapsedMs': round((time.perf_counter() - start) * 1000, 1)
+        })
+        if count_words:
+            result['wordCount'] = parser.word_count
+
+        changed = not cached or cached.get('contentHash') != digest
+        self.cache.put(url, result)
+        return {**result, 'changed': changed, 'fromCache': False}
+
+    def _parse_stream(self, response, count_words: bool):
+        """Feed the body to the parser chunk by chunk, stopping as early as possible"""
+        parser = PageMetaParser(count_words=count_words)
+        digest = hashlib.sha256()
+
+        # requests assumes ISO-8859-1 for text/* without a charset; HTML is
+        # overwhelmingly UTF-8 in practice
+        encoding = response.encoding if 'charset' in response.headers.get('Content-Type', '').lower() else 'utf-8'
+        try:
+            decoder = codecs.getincrementaldecoder(encoding or 'utf-8')(errors='replace')
+        except LookupError:
+            decoder = codecs.getincrementaldecoder('utf-8')(errors='replace')
+
+        limit = self.max_bytes if count_words else self.head_bytes
+        bytes_read = 0
+        for chunk in response.iter_content(chunk_size=16384):
+            digest.update(chunk)
+            bytes_read += len(chunk)
+            with span('parse'):
+                parser.feed(decoder.decode(chunk))
+            if parser.done or bytes_read >= limit:
+                break
+
+        return parser, digest.hexdigest(), bytes_read
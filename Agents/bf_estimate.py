@@ -0,0 +1,300 @@
+#!/usr/bin/env python3
+"""
+bf-db pre-flight estimates
+RCU, WCU, API calls and run time of a command, from a replay on a sample of the table
+"""
+
+import argparse
+import os
+import random
+import tempfile
+import time
+from collections import defaultdict
+from typing import Any, Callable, Dict, List, Tuple
+
+from bf_cache import TTLCache
+from bf_local import LocalDynamoDB
+from bf_metrics import READ_OPERATIONS, WRITE_OPERATIONS, InstrumentedClient, load_history
+from bf_progress import silenced
+
+DEFAULT_SAMPLE_SIZE = 1000
+SAMPLE_TTL_HOURS = 24
+SCAN_SEGMENTS = 64
+
+# Read units of a full 1 MB page read with eventual consistency
+PAGE_READ_UNITS = 128
+
+# CLI commands that read or write a large part of the table
+ESTIMATED_COMMANDS = [
+    'content-stats', 'analyze-source', 'analyze-category', 'analyze-bf-categories', 'get-api-categories',
+    'mark-source-inactive', 'delete-source-completely', 'cleanup-reddit', 'cleanup-webgames', 'cleanup-archive',
+    'generate-metadata', 'populate-bf-categories', 'populate-bf-subcategories', 'update-webgames-category',
+    'optimize-gsi-queries', 'backfill-category-shards', 'backfill-quality-sort', 'validate-quality-index',
+    'sync-work-markers', 'build-feed-snapshot', 'build-feed-shards', 'build-bitmap-index', 'build-search-index',
+    'build-autocomplete', 'build-related-index'
+]
+
+# Commands limited to one key: argument -> (attribute, GSI serving it)
+SCOPES = {'source': ('source', 'source-status-index'), 'category': ('bfCategory', 'category-status-index')}
+ESTIMATE_SCOPES = {
+    'analyze-source': 'source',
+    'analyze-category': 'category',
+    'mark-source-inactive': 'source',
+    'delete-source-completely': 'source',
+    'cleanup-reddit': 'source'
+}
+
+# Mean call latency used before any run has been recorded
+DEFAULT_LATENCY_MS = {
+    'scan': 150.0, 'query': 40.0, 'get_item': 8.0, 'batch_get_item': 30.0, 'put_item': 10.0,
+    'update_item': 10.0, 'delete_item': 10.0, 'batch_write_item': 40.0, 'transact_write_items': 25.0
+}
+
+# Arguments naming files a command writes; a replay writes them into a scratch directory
+OUTPUT_ARGUMENTS = ('output', 'index', 'snapshot', 'search_index', 'autocomplete', 'related')
+
+
+def replay_arguments(args: argparse.Namespace, workdir: str) -> argparse.Namespace:
+    """A copy of CLI arguments whose output paths point into `workdir`"""
+    replay = argparse.Namespace(**vars(args))
+    replay.estimate = False
+    for name in OUTPUT_ARGUMENTS:
+        if hasattr(replay, name):
+            setattr(replay, name, os.path.join(workdir, name))
+    return replay
+
+
+def table_profile(client, table_name: str) -> Dict[str, Any]:
+    """Size, billing mode, provisioned throughput and GSI key schemas (DescribeTable, no read capacity)"""
+    table = client.describe_table(TableName=table_name)['Table']
+    throughput = table.get('ProvisionedThroughput', {})
+    on_demand = table.get('BillingModeSummary', {}).get('BillingMode') == 'PAY_PER_REQUEST'
+    return {
+        'items': table.get('ItemCount', 0),
+        'bytes': table.get('TableSizeBytes', 0),
+        'on_demand': on_demand or not throughput.get('ReadCapacityUnits'),
+        'read_capacity': throughput.get('ReadCapacityUnits', 0),
+        'write_capacity': throughput.get('WriteCapacityUnits', 0),
+        'key_schema': table['KeySchema'],
+        'indexes': [{'IndexName': index['IndexName'], 'KeySchema': index['KeySchema']}
+                    for index in table.get('GlobalSecondaryIndexes', [])]
+    }
+
+
+def sample_table(client, table_name: str, size: int = DEFAULT_SAMPLE_SIZE, seed: int = None) -> List[Dict[str, Any]]:
+    """
+    About `size` items spread over the table
+
+    Reads the first page of randomly chosen parallel-scan segments; each
+    segment is a hash range of the table, so their heads are an unbiased
+    sample. Costs roughly the sample's size in read capacity.
+    """
+    segments = list(range(SCAN_SEGMENTS))
+    random.Random(seed).shuffle(segments)
+    per_segment = max(1, -(-size // 8))
+    items: List[Dict[str, Any]] = []
+    for segment in segments:
+        if len(items) >= size:
+            break
+        response = client.scan(TableName=table_name, Segment=segment, TotalSegments=SCAN_SEGMENTS,
+                               Limit=min(per_segment, size - len(items)))
+        items.extend(response.get('Items', []))
+    return items
+
+
+def sample_scope(client, table_name: str, scope: str, value: str,
+                 size: int = DEFAULT_SAMPLE_SIZE) -> Tuple[List[Dict[str, Any]], int]:
+    """
+    Up to `size` items of one source/category, and how many it has
+
+    Small keys are read whole; for larger ones the rest is only counted
+    (Select=COUNT still reads, but returns no items).
+    """
+    attribute, index = SCOPES[scope]
+    query = {
+        'TableName': table_name,
+        'IndexName': index,
+        'KeyConditionExpression': '#key = :key',
+        'ExpressionAttributeNames': {'#key': attribute},
+        'ExpressionAttributeValues': {':key': {'S': value}}
+    }
+    items, start_key = [], None
+    while len(items) < size:
+        response = client.query(**query, Limit=size - len(items),
+                                **({'ExclusiveStartKey': start_key} if start_key else {}))
+        items.extend(response.get('Items', []))
+        start_key = response.get('LastEvaluatedKey')
+        if not start_key:
+            return items, len(items)
+    count = len(items)
+    while start_key:
+        response = client.query(**query, Select='COUNT', ExclusiveStartKey=start_key)
+        count += response.get('Count', 0)
+        start_key = response.get('LastEvaluatedKey')
+    return items, count
+
+
+def replica(profile: Dict[str, Any], table_name: str, items: List[Dict[str, Any]]) -> LocalDynamoDB:
+    """An in-process copy of the table's schema holding `items`"""
+    client = LocalDynamoDB()
+    attributes = {key['AttributeName'] for key in profile['key_schema']}
+    attributes.update(key['AttributeName'] for index in profile['indexes'] for key in index['KeySchema'])
+    client.create_table(
+        TableName=table_name,
+        KeySchema=profile['key_schema'],
+        AttributeDefinitions=[{'AttributeName': name, 'AttributeType': 'S'} for name in sorted(attributes)],
+        GlobalSecondaryIndexes=[{**index, 'Projection': {'ProjectionType': 'ALL'}} for index in profile['indexes']],
+        BillingMode='PAY_PER_REQUEST'
+    )
+    client.load(table_name, items)
+    return client
+
+
+def replay(make_agent: Callable[[Any], Any], run: Callable[[Any, str], Any], client: LocalDynamoDB,
+           command: str) -> Dict[str, Any]:
+    """Run a command on a replica with its output silenced; returns its usage and wall time"""
+    metrics = InstrumentedClient(client, command)
+    agent = make_agent(metrics)
+    error = None
+    start = time.perf_counter()
+    with tempfile.TemporaryDirectory() as workdir:
+        try:
+            with silenced():
+                run(agent, workdir)
+        except Exception as e:
+            error = f'{type(e).__name__}: {e}'[:200]
+    seconds = time.perf_counter() - start
+    usage = metrics.summary(command)
+    metrics.close()
+    return {'usage': usage, 'seconds': seconds, 'error': error}
+
+
+def calibration(command: str, table_name: str, history_path: str = None) -> Dict[str, Any]:
+    """
+    Corrections learned from past runs of the command (and of every command for latency)
+
+    `read_units_per_item` / `write_units_per_call` are what the real table
+    charged; `seconds_per_call` is the command's observed pace; per-operation
+    mean latencies come from all recorded runs.
+    """
+    history = [entry for entry in load_history(history_path)
+               if entry.get('table', table_name) == table_name and not entry['command'].endswith('--estimate')]
+    latency_ms, latency_calls = defaultdict(float), defaultdict(int)
+    for entry in history:
+        for operation, row in entry.get('operations', {}).items():
+            latency = row.get('latency', {})
+            latency_ms[operation] += latency.get('total_ms', 0.0)
+            latency_calls[operation] += latency.get('count', 0)
+
+    runs = [entry for entry in history if entry['command'] == command]
+    totals = defaultdict(float)
+    for entry in runs:
+        for operation, row in entry.get('operations', {}).items():
+            totals['calls'] += row['calls']
+            if operation in READ_OPERATIONS:
+                totals['read_units'] += row['read_units']
+                totals['scanned'] += row['scanned']
+            elif operation in WRITE_OPERATIONS:
+                totals['write_units'] += row['write_units']
+                totals['write_calls'] += row['calls']
+        totals['seconds'] += entry.get('elapsed_seconds', 0.0)
+
+    return {
+        'runs': len(runs),
+        'read_units_per_item': (totals['read_units'] / totals['scanned']
+                                if totals['read_units'] and totals['scanned'] else None),
+        'write_units_per_call': (totals['write_units'] / totals['write_calls']
+                                 if totals['write_units'] and totals['write_calls'] else None),
+        'seconds_per_call': totals['seconds'] / totals['calls'] if totals['calls'] else None,
+        'latency_ms': {operation: latency_ms[operation] / count for operation, count in latency_calls.items() if count}
+    }
+
+
+def estimate(usage: Dict[str, Any], factor: float, local_seconds: float, profile: Dict[str, Any],
+             calibrated: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Scale a replay's usage to the full table and predict the run time
+
+    Reads and writes grow with the items touched, so every count is
+    multiplied by `factor` (table or key size over sample size); scan and
+    query pages grow with the data read, and table-level calls not at all.
+    Capacity is corrected where past runs measured it; time is the larger of
+    the latency bound (calls × observed pace, or × mean latency plus the
+    replay's own compute time) and, on provisioned tables, the capacity bound.
+    """
+    operations = {}
+    replay_scanned = sum(row['scanned'] for op, row in usage['operations'].items() if op in READ_OPERATIONS)
+    replay_read_units = sum(row['read_units'] for op, row in usage['operations'].items() if op in READ_OPERATIONS)
+    read_scale = 1.0
+    if calibrated['read_units_per_item'] and replay_scanned and replay_read_units:
+        read_scale = calibrated['read_units_per_item'] / (replay_read_units / replay_scanned)
+
+    latency_seconds = 0.0
+    for operation, row in usage['operations'].items():
+        item_operation = operation in READ_OPERATIONS or operation in WRITE_OPERATIONS
+        calls = row['calls'] * factor if item_operation else row['calls']
+        if operation in ('scan', 'query'):
+            # Pages are cut at 1 MB (128 read units) however many items they hold
+            calls = max(row['calls'], row['read_units'] * factor / PAGE_READ_UNITS)
+        write_units = row['write_units'] * factor
+        if calibrated['write_units_per_call'] and operation in WRITE_OPERATIONS and row['write_units']:
+            write_units = calibrated['write_units_per_call'] * calls
+        mean_ms = calibrated['latency_ms'].get(operation, DEFAULT_LATENCY_MS.get(operation, 20.0))
+        latency_seconds += calls * mean_ms / 1000
+        operations[operation] = {
+            'calls': round(calls),
+            'items': round(row['items'] * factor),
+            'mb': round(row['bytes'] * factor / 1024 ** 2, 1),
+            'read_units': round(row['read_units'] * factor * read_scale, 1),
+            'write_units': round(write_units, 1),
+            'seconds': round(calls * mean_ms / 1000, 1)
+        }
+
+    calls = sum(row['calls'] for row in operations.values())
+    read_units = sum(row['read_units'] for row in operations.values())
+    write_units = sum(row['write_units'] for row in operations.values())
+    if calibrated['seconds_per_call']:
+        latency_bound = calls * calibrated['seconds_per_call']
+    else:
+        latency_bound = latency_seconds + local_seconds * factor
+    capacity_bound = 0.0
+    if not profile['on_demand']:
+        capacity_bound = max(read_units / max(profile['read_capacity'], 1),
+                             write_units / max(profile['write_capacity'], 1))
+    return {
+        'operations': operations,
+        'calls': calls,
+        'read_units': round(read_units, 1),
+        'write_units': round(write_units, 1),
+        'latency_bound_seconds': round(latency_bound, 1),
+        'capacity_bound_seconds': round(capacity_bound, 1),
+        'seconds': round(max(latency_bound, capacity_bound), 1)
+    }
+
+
+class SampleCache(TTLCache):
+    """Table samples kept between estimates (they cost read capacity)"""
+
+    def __init__(self, max_age_hours: float = SAMPLE_TTL_HOURS):
+        super().__init__('estimate_samples', ttl_seconds=max_age_hours * 3600)
+
+    def sample(self, client, table_name: str, size: int) -> Tuple[List[Dict[str, Any]], bool]:
+        """A fresh enough sample of at least `size` items; True if it was read just now"""
+        record = self.get(table_name)
+        # Reusable if big enough, or if it already holds the whole (small) table
+        if self.is_fresh(table_name) and record and (len(record['items']) >= size
+                                                     or len(record['items']) < record['wanted']):
+            return record['items'][:size], False
+        items = sample_table(client, table_name, size)
+        self.put(table_name, {'items': items, 'wanted': size})
+        self.save()
+        return items, True
+
+
+def format_seconds(seconds: float) -> str:
+    if seconds < 60:
+        return f'{seconds:.0f}s'
+    if seconds < 3600:
+        return f'{seconds // 60:.0f}m {seconds % 60:02.0f}s'
+    return f'{seconds // 3600:.0f}h {seconds % 3600 // 60:02.0f}m'
+
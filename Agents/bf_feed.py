@@ -0,0 +1,404 @@
+#!/usr/bin/env python3
+"""
+bf-db local feed server
+Snapshot-backed, DynamoDB-free read path for browse-content
+"""
+
+import gzip
+import json
+import os
+import random
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List, Optional, Tuple
+from urllib.parse import parse_qs, urlparse
+
+from bf_bitmap import BitmapIndex, bitmap_ids
+from bf_cache import cache_path
+from bf_dynamo import iter_items, plain_item
+from bf_sampler import CategorySampler, SessionSampler, WeightedPool, quality_weight
+
+# Fields the iOS app decodes from browse-content (plus a few cheap extras)
+SNAPSHOT_FIELDS = [
+    'url', 'title', 'aiSummary', 'bfCategory', 'bfSubcategory', 'domain',
+    'qualityScore', 'tags', 'source', 'thumbnailUrl', 'contentType', 'readingTime', 'mobileFriendly'
+]
+
+
+def default_snapshot_path() -> str:
+    """Default location of the feed snapshot file"""
+    return cache_path('feed_snapshot.json.gz')
+
+
+def build_snapshot(client, table_name: str, path: str = None) -> Dict[str, Any]:
+    """Stream all active items from status-index into a compact gzip snapshot
+
+    Returns:
+        Dictionary with snapshot statistics
+    """
+    path = path or default_snapshot_path()
+    names = {f'#f{i}': field for i, field in enumerate(SNAPSHOT_FIELDS)}
+    names['#status'] = 'status'
+
+    start_time = time.time()
+    items = []
+    for raw in iter_items(
+        client.query,
+        TableName=table_name,
+        IndexName='status-index',
+        KeyConditionExpression='#status = :status',
+        ExpressionAttributeNames=names,
+        ExpressionAttributeValues={':status': {'S': 'active'}},
+        ProjectionExpression=', '.join(k for k in names if k != '#status')
+    ):
+        item = plain_item(raw, SNAPSHOT_FIELDS)
+        if not item.get('bfCategory') or not item.get('url'):
+            continue
+        if not item.get('domain'):
+            item['domain'] = urlparse(item['url']).netloc.lower()
+        items.append(item)
+
+    snapshot = {
+        'builtAt': datetime.now().isoformat(),
+        'count': len(items),
+        'items': items
+    }
+
+    tmp_path = path + '.tmp'
+    with gzip.open(tmp_path, 'wt', encoding='utf-8') as f:
+        json.dump(snapshot, f, separators=(',', ':'))
+    os.replace(tmp_path, path)
+
+    return {
+        'path': path,
+        'items': len(items),
+        'bytes': os.path.getsize(path),
+        'elapsed_seconds': round(time.time() - start_time, 2)
+    }
+
+
+class SessionPermutation:
+    """Lazy Fisher-Yates shuffle: O(1) draws without replacement
+
+    Only the swapped positions are stored, so a session that reads a few
+    pages of a 14k-item category costs a few dozen dict entries.
+    """
+
+    __slots__ = ('size', 'drawn', 'swaps')
+
+    def __init__(self, size: int):
+        self.size = size
+        self.drawn = 0
+        self.swaps: Dict[int, int] = {}
+
+    def draw(self, rng: random.Random) -> int:
+        """Next position of the permutation (restarts once exhausted)"""
+        if self.drawn >= self.size:
+            self.drawn = 0
+            self.swaps.clear()
+        j = rng.randrange(self.drawn, self.size)
+        picked = self.swaps.get(j, j)
+        current = self.swaps.pop(self.drawn, self.drawn)
+        if j != self.drawn:
+            self.swaps[j] = current
+        self.drawn += 1
+        return picked
+
+
+class FeedSnapshot:
+    """In-memory arrays of active items indexed by category and subcategory"""
+
+    def __init__(self, items: List[Dict[str, Any]], built_at: str = ''):
+        self.items = items
+        self.built_at = built_at
+        self.loaded_at = time.time()
+        # Quality-weighted alias tables per (category, subcategory-or-None)
+        self.sampler = CategorySampler(items)
+        # (category, subcategory-or-None) -> positions in self.items
+        self.pools: Dict[Tuple[str, Optional[str]], List[int]] = self.sampler.members
+        # Attribute bitmaps for `filter=` requests, and their recent results
+        self.bitmaps = BitmapIndex.from_items(items)
+        self._filter_cache: 'OrderedDict[Tuple, List[int]]' = OrderedDict()
+        self._filter_lock = threading.Lock()
+
+    @classmethod
+    def load(cls, path: str) -> 'FeedSnapshot':
+        """Load a snapshot file written by build_snapshot"""
+        with gzip.open(path, 'rt', encoding='utf-8') as f:
+            data = json.load(f)
+        return cls(data['items'], built_at=data.get('builtAt', ''))
+
+    def categories(self) -> List[str]:
+        """Categories with at least one active item"""
+        return sorted({category for category, subcategory in self.pools if subcategory is None})
+
+    def pool(self, category: str, subcategory: str = None) -> List[int]:
+        """Item positions for a category (and optional subcategory)"""
+        return self.pools.get((category, subcategory or None), [])
+
+    def filtered_pool(self, category: str, subcategory: str = None, expression: str = '') -> List[int]:
+        """Item positions of a category that also match a bitmap filter expression"""
+        key = (category, subcategory or None, expression)
+        with self._filter_lock:
+            if key in self._filter_cache:
+                self._filter_cache.move_to_end(key)
+                return self._filter_cache[key]
+
+        bitmap = self.bitmaps.query(expression) & self.bitmaps.equals('bfCategory', category)
+        if subcategory:
+            bitmap &= self.bitmaps.equals('bfSubcategory', subcategory)
+        positions = bitmap_ids(bitmap)
+
+        with self._filter_lock:
+            self._filter_cache[key] = positions
+            if len(self._filter_cache) > 256:
+                self._filter_cache.popitem(last=False)
+        return positions
+
+
+class FeedService:
+    """Serve randomized feed pages from the current snapshot
+
+    The snapshot reference is swapped atomically on refresh, so requests
+    never wait on a rebuild; only the RNG and session shuffles are guarded.
+    Items are drawn in proportion to qualityScore unless `weighted` is off.
+    """
+
+    def __init__(self, snapshot: FeedSnapshot, max_sessions: int = 10000, seed: int = None,
+                 search_index=None, autocomplete=None, related=None, weighted: bool = True):
+        self.snapshot = snapshot
+        self.weighted = weighted
+        self.search_index = search_index
+        self.autocomplete = autocomplete
+        self.related = related
+        self.max_sessions = max_sessions
+        self._rng = random.Random(seed)
+        self._sessions: 'OrderedDict[Tuple, Any]' = OrderedDict()
+        self._lock = threading.Lock()
+
+    def swap_snapshot(self, snapshot: FeedSnapshot) -> None:
+        """Replace the snapshot; session shuffles restart on the new arrays"""
+        with self._lock:
+            self.snapshot = snapshot
+            self._sessions.clear()
+
+    def page(self, category: str, subcategory: str = None, limit: int = 20,
+             session: str = None, filter_expression: str = None) -> List[Dict[str, Any]]:
+        """Random page of items; with a session id, no repeats until the pool is exhausted"""
+        snapshot = self.snapshot
+        if filter_expression:
+            return self._filtered_page(snapshot, category, subcategory, limit, filter_expression)
+        pool = snapshot.pool(category, subcategory)
+        if not pool:
+            return []
+        limit = max(0, min(limit, len(pool)))
+
+        if not session:
+            with self._lock:
+                if self.weighted:
+                    return snapshot.sampler.sample(self._rng, category, subcategory, limit)
+                positions = self._rng.sample(pool, limit)
+            return [snapshot.items[p] for p in positions]
+
+        key = (session, category, subcategory or None)
+        with self._lock:
+            state = self._sessions.get(key)
+            if state is None or not self._session_matches(state, snapshot, category, subcategory):
+                state = self._new_session(snapshot, category, subcategory)
+                self._sessions[key] = state
+                if len(self._sessions) > self.max_sessions:
+                    self._sessions.popitem(last=False)
+            else:
+                self._sessions.move_to_end(key)
+            positions = [pool[state.draw(self._rng)] for _ in range(limit)]
+
+        return [snapshot.items[p] for p in positions]
+
+    def _filtered_page(self, snapshot: FeedSnapshot, category: str, subcategory: str, limit: int,
+                       expression: str) -> List[Dict[str, Any]]:
+        """Random page from the filtered subset (no per-session memory)"""
+        positions = snapshot.filtered_pool(category, subcategory, expression)
+        if not positions:
+            return []
+        limit = max(0, min(limit, len(positions)))
+        with self._lock:
+            if self.weighted:
+                pool = WeightedPool(quality_weight(snapshot.items[p]) for p in positions)
+                picked = [positions[slot] for slot in SessionSampler(pool).sample(self._rng, limit)]
+            else:
+                picked = self._rng.sample(positions, limit)
+        return [snapshot.items[p] for p in picked]
+
+    def _new_session(self, snapshot: FeedSnapshot, category: str, subcategory: str):
+        if self.weighted:
+            return snapshot.sampler.session(category, subcategory)
+        return SessionPermutation(len(snapshot.pool(category, subcategory)))
+
+    def _session_matches(self, state, snapshot: FeedSnapshot, category: str, subcategory: str) -> bool:
+        if isinstance(state, SessionSampler):
+            return state.pool is snapshot.sampler.pool(category, subcategory)
+        return state.size == len(snapshot.pool(category, subcategory))
+
+    def related_items(self, url: str, limit: int = 10) -> List[Dict[str, Any]]:
+        """Snapshot items most similar to `url` (skipping ones no longer active)"""
+        snapshot = self.snapshot
+        positions = snapshot.sampler.url_to_position
+        items = []
+        for entry in self.related.related(url, limit=self.related.k):
+            position = positions.get(entry['url'])
+            if position is not None:
+                items.append({**snapshot.items[position], 'relatedScore': entry['score']})
+                if len(items) >= limit:
+                    break
+        return items
+
+    def health(self) -> Dict[str, Any]:
+        """Snapshot freshness for monitoring"""
+        snapshot = self.snapshot
+        return {
+            'items': len(snapshot.items),
+            'categories': len(snapshot.categories()),
+            'builtAt': snapshot.built_at,
+            'loadedSecondsAgo': round(time.time() - snapshot.loaded_at, 1),
+            'sessions': len(self._sessions)
+        }
+
+
+class SnapshotRefresher(threading.Thread):
+    """Background thread that rebuilds the snapshot and swaps it in"""
+
+    def __init__(self, service: FeedService, client, table_name: str, path: str,
+                 interval_seconds: float):
+        super().__init__(daemon=True, name='feed-snapshot-refresher')
+        self.service = service
+        self.client = client
+        self.table_name = table_name
+        self.path = path
+        self.interval_seconds = interval_seconds
+        self._stop_event = threading.Event()
+
+    def run(self):
+        while not self._stop_event.wait(self.interval_seconds):
+            try:
+                stats = build_snapshot(self.client, self.table_name, self.path)
+                self.service.swap_snapshot(FeedSnapshot.load(self.path))
+                print(f"🔄 Snapshot refreshed: {stats['items']:,} items in {stats['elapsed_seconds']}s")
+            except Exception as e:
+                # Keep serving the previous snapshot
+                print(f"⚠️  Snapshot refresh failed: {e}")
+
+    def stop(self):
+        self._stop_event.set()
+
+
+def make_handler(service: FeedService):
+    """HTTP handler mirroring the browse-content query interface"""
+
+    class FeedHandler(BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'
+
+        def _send_json(self, status: int, payload: Dict[str, Any]):
+            body = json.dumps(payload, separators=(',', ':')).encode('utf-8')
+            self.send_response(status)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(body)))
+            self.send_header('Access-Control-Allow-Origin', '*')
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_GET(self):
+            parsed = urlparse(self.path)
+            query = {k: v[0] for k, v in parse_qs(parsed.query).items()}
+
+            if parsed.path == '/health':
+                return self._send_json(200, service.health())
+
+            if parsed.path != '/api/browse-content':
+                return self._send_json(404, {'error': 'Not found'})
+
+            if query.get('endpoint') == 'categories':
+                return self._send_json(200, {'categories': service.snapshot.categories()})
+
+            if query.get('suggest') and service.autocomplete is not None:
+                try:
+                    limit = int(query.get('limit', 10))
+                except ValueError:
+                    limit = 10
+                suggestions = service.autocomplete.suggest(query['suggest'], limit=limit)
+                return self._send_json(200, {
+                    'suggestions': suggestions,
+                    'prefix': query['suggest'],
+                    'count': len(suggestions)
+                })
+
+            if query.get('related') and service.related is not None:
+                try:
+                    limit = int(query.get('limit', 10))
+                except ValueError:
+                    limit = 10
+                items = service.related_items(query['related'], limit=limit)
+                return self._send_json(200, {
+                    'items': items,
+                    'url': query['related'],
+                    'count': len(items)
+                })
+
+            if query.get('search') and service.search_index is not None:
+                try:
+                    limit = int(query.get('limit', 20))
+                except ValueError:
+                    limit = 20
+                items = service.search_index.search(query['search'], limit=limit,
+                                                    category=query.get('category') or None)
+                return self._send_json(200, {
+                    'items': items,
+                    'query': query['search'],
+                    'count': len(items)
+                })
+
+            category = query.get('category')
+            if category:
+                try:
+                    limit = int(query.get('limit', 20))
+                except ValueError:
+                    limit = 20
+                subcategory = query.get('subcategory') or None
+                try:
+                    items = service.page(category, subcategory, limit, session=query.get('session'),
+                                         filter_expression=query.get('filter'))
+                except ValueError as e:
+                    return self._send_json(400, {'error': f'Invalid filter: {e}'})
+                return self._send_json(200, {
+                    'items': items,
+                    'category': category,
+                    'subcategory': subcategory,
+                    'count': len(items)
+                })
+
+            return self._send_json(400, {
+                'error': 'Invalid endpoint or missing parameters',
+                'endpoints': {
+                    'categories': '/api/browse-content?endpoint=categories',
+                    'content': '/api/browse-content?category=books&limit=20&session=<id>',
+                    'filtered': '/api/browse-content?category=webgames&filter=mobileFriendly=true',
+                    'search': '/api/browse-content?search=your-query&limit=20',
+                    'suggest': '/api/browse-content?suggest=gal&limit=10',
+                    'related': '/api/browse-content?related=<url>&limit=10'
+                }
+            })
+
+        def log_message(self, format, *args):
+            # Per-request logging would dominate latency at benchmark rates
+            pass
+
+    return FeedHandler
+
+
+def serve(service: FeedService, host: str = '127.0.0.1', port: int = 8787) -> ThreadingHTTPServer:
+    """Create (but don't start) the local HTTP feed server"""
+    server = ThreadingHTTPServer((host, port), make_handler(service))
+    server.daemon_threads = True
+    return server
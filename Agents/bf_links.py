@@ -0,0 +1,177 @@
+#!/usr/bin/env python3
+"""
+bf-db link health crawler
+Concurrent HEAD/GET checks with per-domain limits and connection reuse
+"""
+
+import threading
+import time
+from collections import defaultdict, deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Any, Callable, Dict, Iterable, Iterator
+from urllib.parse import urlparse
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from bf_profile import span
+
+# Check as the iOS app's web view would load the page
+MOBILE_SAFARI_UA = (
+    'Mozilla/5.0 (iPhone; CPU iPhone OS 17_5 like Mac OS X) AppleWebKit/605.1.15 '
+    '(KHTML, like Gecko) Version/17.5 Mobile/15E148 Safari/604.1'
+)
+
+# HEAD responses that servers commonly return instead of supporting HEAD
+HEAD_FALLBACK_STATUSES = {400, 403, 405, 406, 429, 500, 501, 503}
+
+
+def url_domain(url: str) -> str:
+    """Lowercased host of a url (without a leading www.)"""
+    domain = urlparse(url).netloc.lower()
+    return domain[4:] if domain.startswith('www.') else domain
+
+
+def classify_status(status: int, url: str, final_url: str) -> str:
+    """Map a check result to ok / redirected / blocked / dead / error"""
+    if status == 0:
+        return 'dead'
+    if 200 <= status < 300:
+        if final_url and final_url.rstrip('/') != url.rstrip('/'):
+            return 'redirected'
+        return 'ok'
+    if status in (401, 403, 429, 451):
+        return 'blocked'
+    if status in (404, 410):
+        return 'dead'
+    return 'error'
+
+
+class HttpWorker:
+    """Base for crawlers: per-thread pooled sessions + per-domain dispatch"""
+
+    def __init__(self, max_workers: int = 32, per_domain: int = 2, timeout: float = 10.0,
+                 user_agent: str = MOBILE_SAFARI_UA, buffer_size: int = None):
+        self.max_workers = max_workers
+        self.per_domain = max(1, per_domain)
+        self.timeout = timeout
+        self.user_agent = user_agent
+        self.buffer_size = buffer_size or max(5000, max_workers * 100)
+        self._local = threading.local()
+
+    def _session(self) -> requests.Session:
+        """Per-thread session so keep-alive connections are reused"""
+        session = getattr(self._local, 'session', None)
+        if session is None:
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=64, pool_maxsize=self.per_domain, max_retries=0)
+            session.mount('http://', adapter)
+            session.mount('https://', adapter)
+            session.headers.update({
+                'User-Agent': self.user_agent,
+                'Accept': 'text/html,application/xhtml+xml,*/*;q=0.8'
+            })
+            self._local.session = session
+        return session
+
+    def map_per_domain(self, fn: Callable[[str], Any], urls: Iterable[str]) -> Iterator[Any]:
+        """Run `fn(url)` over a stream of urls, yielding results as they complete
+
+        Urls are buffered in per-domain queues and dispatched round-robin, so a
+        run of urls from one big source never starves the thread pool and no
+        domain ever sees more than `per_domain` concurrent requests.
+        """
+        url_iter = iter(urls)
+        exhausted = False
+        buffered = 0
+
+        pending = defaultdict(deque)   # domain -> queued urls
+        in_flight = defaultdict(int)   # domain -> running requests
+        ready = deque()                # domains with queued urls and spare capacity
+        in_ready = set()
+        futures = {}
+
+        def mark_ready(domain):
+            if domain not in in_ready and pending.get(domain) and in_flight[domain] < self.per_domain:
+                ready.append(domain)
+                in_ready.add(domain)
+
+        with ThreadPoolExecutor(max_workers=self.max_workers) as pool:
+            while True:
+                # Refill the per-domain queues from the source stream
+                while not exhausted and buffered < self.buffer_size:
+                    try:
+                        url = next(url_iter)
+                    except StopIteration:
+                        exhausted = True
+                        break
+                    domain = url_domain(url)
+                    pending[domain].append(url)
+                    buffered += 1
+                    mark_ready(domain)
+
+                # Dispatch round-robin across domains with spare capacity
+                while ready and len(futures) < self.max_workers:
+                    domain = ready.popleft()
+                    in_ready.discard(domain)
+                    url = pending[domain].popleft()
+                    buffered -= 1
+                    if not pending[domain]:
+                        del pending[domain]
+                    in_flight[domain] += 1
+                    futures[pool.submit(fn, url)] = domain
+                    mark_ready(domain)
+
+                if not futures:
+                    if exhausted and not pending:
+                        break
+                    continue
+
+                done, _ = wait(futures, return_when=FIRST_COMPLETED)
+                for future in done:
+                    domain = futures.pop(future)
+                    in_flight[domain] -= 1
+                    mark_ready(domain)
+                    yield future.result()
+
+
+class LinkChecker(HttpWorker):
+    """Check many urls concurrently while capping in-flight requests per domain"""
+
+    def check_url(self, url: str) -> Dict[str, Any]:
+        """HEAD a url, falling back to a streamed GET when HEAD is refused"""
+        session = self._session()
+        start = time.perf_counter()
+        status, final_url, error, method = 0, '', '', 'HEAD'
+
+        try:
+            with span('fetch'):
+                response = session.head(url, allow_redirects=True, timeout=self.timeout)
+            status, final_url = response.status_code, response.url
+            response.close()
+        except requests.RequestException as e:
+            error = type(e).__name__
+
+        if status == 0 or status in HEAD_FALLBACK_STATUSES:
+            method = 'GET'
+            try:
+                # Only the status line and headers are needed
+                with span('fetch'), session.get(url, allow_redirects=True, timeout=self.timeout,
+                                                stream=True) as response:
+                    status, final_url, error = response.status_code, response.url, ''
+            except requests.RequestException as e:
+                error = type(e).__name__
+
+        return {
+            'url': url,
+            'httpStatus': status,
+            'finalUrl': final_url or url,
+            'verdict': classify_status(status, url, final_url),
+            'method': method,
+            'error': error,
+            'elapsedMs': round((time.perf_counter() - start) * 1000, 1)
+        }
+
+    def check_urls(self, urls: Iterable[str]) -> Iterator[Dict[str, Any]]:
+        """Check a stream of urls, yielding results as they complete"""
+        return self.map_per_domain(self.check_url, urls)
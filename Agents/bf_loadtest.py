@@ -0,0 +1,341 @@
+#!/usr/bin/env python3
+"""
+bf-db GSI load test
+Concurrent replay of BrowseForward category browsing: throughput and latency per category and index
+"""
+
+import glob
+import json
+import os
+import random
+import re
+import threading
+import time
+from collections import Counter, defaultdict
+from datetime import datetime
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+from urllib.parse import parse_qs, urlparse
+
+from bf_cache import cache_path
+from bf_dynamo import call_with_retries, error_code
+from bf_local import SOURCE_DISTRIBUTION
+from bf_metrics import THROTTLE_CODES, LatencyHistogram
+from bf_partitions import DEFAULT_SHARDS, SHARD_ATTRIBUTE, SHARD_INDEX, shard_key
+from bf_ranking import QUALITY_INDEX
+
+STATUS_INDEX = 'category-status-index'
+INDEXES = [STATUS_INDEX, QUALITY_INDEX, SHARD_INDEX]
+
+# The API reads at most this many items per Query (see getContentByCategory)
+API_QUERY_LIMIT = 100
+
+_API_REQUEST = re.compile(r'/api/browse-content\?\S+')
+
+
+class AccessPattern:
+    """
+    What a BrowseForward client asks for
+
+    `categories` and `limits` are weights of the category browsed and of the
+    page size requested; after each page the user scrolls on to the next one
+    with probability `continue_rate`, up to `max_depth` pages per session.
+    """
+
+    def __init__(self, categories: Dict[str, float], limits: Dict[int, float] = None,
+                 continue_rate: float = 0.5, max_depth: int = 5, source: str = 'default'):
+        if not categories:
+            raise ValueError('Access pattern has no categories')
+        self.categories = dict(categories)
+        self.limits = dict(limits or {20: 1.0})
+        self.continue_rate = continue_rate
+        self.max_depth = max(1, max_depth)
+        self.source = source
+
+    @classmethod
+    def default(cls, **kwargs) -> 'AccessPattern':
+        """Categories weighted by their active items in the production table"""
+        weights: Dict[str, float] = defaultdict(float)
+        for category, _, count, active in SOURCE_DISTRIBUTION:
+            if category:
+                weights[category] += count * active
+        return cls(weights, source='production category sizes', **kwargs)
+
+    @classmethod
+    def from_logs(cls, paths: Iterable[str], **kwargs) -> 'AccessPattern':
+        """Category and limit mix of the browse-content requests found in app or API logs"""
+        categories, limits = Counter(), Counter()
+        files = [path for pattern in paths for path in sorted(glob.glob(pattern)) or [pattern]]
+        for path in files:
+            with open(path, errors='replace') as f:
+                for line in f:
+                    for request in _API_REQUEST.findall(line):
+                        query = parse_qs(urlparse(request).query)
+                        if 'category' not in query:
+                            continue
+                        categories[query['category'][0]] += 1
+                        try:
+                            limits[int(query.get('limit', ['20'])[0])] += 1
+                        except ValueError:
+                            pass
+        if not categories:
+            raise ValueError(f"No browse-content category requests in {', '.join(files)}")
+        return cls(categories, limits, source=', '.join(files), **kwargs)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {'source': self.source, 'categories': self.categories, 'limits': self.limits,
+                'continue_rate': self.continue_rate, 'max_depth': self.max_depth}
+
+
+class PageStats:
+    """Counters of the pages served for one (category, index)"""
+
+    __slots__ = ('pages', 'queries', 'items', 'errors', 'throttles', 'read_units', 'latency')
+
+    def __init__(self):
+        self.pages = self.queries = self.items = self.errors = self.throttles = 0
+        self.read_units = 0.0
+        self.latency = LatencyHistogram()
+
+    def merge(self, other: 'PageStats') -> None:
+        for field in ('pages', 'queries', 'items', 'errors', 'throttles', 'read_units'):
+            setattr(self, field, getattr(self, field) + getattr(other, field))
+        self.latency.merge(other.latency)
+
+    def to_dict(self, seconds: float) -> Dict[str, Any]:
+        seconds = max(seconds, 1e-9)
+        return {
+            'pages': self.pages,
+            'queries': self.queries,
+            'items': self.items,
+            'errors': self.errors,
+            'throttles': self.throttles,
+            'read_units': round(self.read_units, 1),
+            'pages_per_second': round(self.pages / seconds, 2),
+            'items_per_second': round(self.items / seconds, 1),
+            'read_units_per_second': round(self.read_units / seconds, 2),
+            'mean_ms': round(self.latency.total_ms / self.latency.count, 2) if self.latency.count else 0.0,
+            'p50_ms': round(self.latency.percentile(50), 2),
+            'p95_ms': round(self.latency.percentile(95), 2),
+            'p99_ms': round(self.latency.percentile(99), 2),
+            'max_ms': round(self.latency.max_ms, 2),
+            'latency': self.latency.to_dict()
+        }
+
+
+def _query(table_name: str, index: str, category: str, shard: int) -> Dict[str, Any]:
+    """Query arguments for one category page on `index`, as the API or the agent reads it"""
+    if index == QUALITY_INDEX:
+        return {
+            'TableName': table_name,
+            'IndexName': QUALITY_INDEX,
+            'KeyConditionExpression': '#category = :category',
+            'ExpressionAttributeNames': {'#category': 'bfCategory'},
+            'ExpressionAttributeValues': {':category': {'S': category}},
+            'ScanIndexForward': False
+        }
+    if index == SHARD_INDEX:
+        return {
+            'TableName': table_name,
+            'IndexName': SHARD_INDEX,
+            'KeyConditionExpression': '#shard = :shard AND #status = :status',
+            'ExpressionAttributeNames': {'#shard': SHARD_ATTRIBUTE, '#status': 'status'},
+            'ExpressionAttributeValues': {':shard': {'S': shard_key(category, shard)}, ':status': {'S': 'active'}}
+        }
+    return {
+        'TableName': table_name,
+        'IndexName': STATUS_INDEX,
+        'KeyConditionExpression': 'bfCategory = :category AND #status = :status',
+        'ExpressionAttributeNames': {'#status': 'status'},
+        'ExpressionAttributeValues': {':category': {'S': category}, ':status': {'S': 'active'}}
+    }
+
+
+class LoadTest:
+    """
+    Closed-loop load: `concurrency` simulated users browse categories
+
+    Each user starts a session on a category and index drawn from the
+    pattern, fetches a page the way getContentByCategory does (Queries of
+    at most 100 items until the page is full, following LastEvaluatedKey),
+    then scrolls to the next page or starts a new session. Pages that start
+    during the `warmup` seconds are not counted; the run stops `duration`
+    seconds after the warm-up. Throttled queries are retried with backoff,
+    like the SDK does, and counted. On category-shard-index a session reads
+    one shard key, moving to the next shard when it runs out.
+    """
+
+    def __init__(self, client, table_name: str, pattern: AccessPattern, indexes: List[str] = None,
+                 concurrency: int = 8, duration: float = 30.0, warmup: float = 5.0, think_ms: float = 0.0,
+                 shards: int = DEFAULT_SHARDS, seed: int = 0):
+        self.dynamodb = client
+        self.table_name = table_name
+        self.pattern = pattern
+        self.indexes = indexes or [STATUS_INDEX]
+        self.concurrency = max(1, concurrency)
+        self.duration = duration
+        self.warmup = warmup
+        self.think_ms = think_ms
+        self.shards = shards
+        self.seed = seed
+        self.stats: Dict[Tuple[str, str], PageStats] = defaultdict(PageStats)
+        self.depths: Counter = Counter()
+        self._lock = threading.Lock()
+
+    def _page(self, index: str, category: str, limit: int, cursor: Dict[str, Any],
+              stats: PageStats) -> None:
+        """Fetch one page, advancing `cursor` (shard, start key, done) to the next one"""
+        items = 0
+        while items < limit:
+            kwargs = _query(self.table_name, index, category, cursor['shard'])
+            kwargs['Limit'] = min(limit - items, API_QUERY_LIMIT)
+            kwargs['ReturnConsumedCapacity'] = 'TOTAL'
+            if cursor['start_key']:
+                kwargs['ExclusiveStartKey'] = cursor['start_key']
+
+            def throttled(error, attempt):
+                if error_code(error) in THROTTLE_CODES:
+                    stats.throttles += 1
+
+            response = call_with_retries(self.dynamodb.query, on_retry=throttled, **kwargs)
+            stats.queries += 1
+            stats.read_units += float((response.get('ConsumedCapacity') or {}).get('CapacityUnits', 0.0))
+            items += len(response.get('Items', []))
+            cursor['start_key'] = response.get('LastEvaluatedKey')
+            if not cursor['start_key']:
+                if index == SHARD_INDEX and cursor['shards_left']:
+                    cursor['shards_left'] -= 1
+                    cursor['shard'] = (cursor['shard'] + 1) % self.shards
+                    continue
+                cursor['done'] = True
+                break
+        stats.items += items
+
+    def _worker(self, number: int, measure_from: float, deadline: float) -> None:
+        rng = random.Random(f'{self.seed}:{number}')
+        categories, category_weights = zip(*self.pattern.categories.items())
+        limits, limit_weights = zip(*self.pattern.limits.items())
+        local: Dict[Tuple[str, str], PageStats] = defaultdict(PageStats)
+        depths: Counter = Counter()
+
+        while time.perf_counter() < deadline:
+            category = rng.choices(categories, category_weights)[0]
+            index = rng.choice(self.indexes)
+            limit = rng.choices(limits, limit_weights)[0]
+            cursor = {'shard': rng.randrange(self.shards), 'shards_left': self.shards - 1,
+                      'start_key': None, 'done': False}
+            depth = 0
+            while depth < self.pattern.max_depth and not cursor['done']:
+                started = time.perf_counter()
+                if started >= deadline:
+                    break
+                measured = started >= measure_from
+                stats = local[(category, index)] if measured else PageStats()
+                try:
+                    self._page(index, category, limit, cursor, stats)
+                except Exception as e:
+                    if measured:
+                        stats.errors += 1
+                        if error_code(e) in THROTTLE_CODES:
+                            stats.throttles += 1
+                    break
+                if measured:
+                    stats.pages += 1
+                    stats.latency.add((time.perf_counter() - started) * 1000)
+                depth += 1
+                if rng.random() >= self.pattern.continue_rate:
+                    break
+                if self.think_ms:
+                    time.sleep(self.think_ms / 1000 * rng.uniform(0.5, 1.5))
+            if depth and time.perf_counter() >= measure_from:
+                depths[depth] += 1
+
+        with self._lock:
+            for key, stats in local.items():
+                self.stats[key].merge(stats)
+            self.depths.update(depths)
+
+    def run(self) -> Dict[str, Any]:
+        """Run the load and return its report (see `report`)"""
+        started_at = datetime.now().isoformat()
+        start = time.perf_counter()
+        measure_from = start + self.warmup
+        deadline = measure_from + self.duration
+        workers = [threading.Thread(target=self._worker, args=(number, measure_from, deadline), daemon=True)
+                   for number in range(self.concurrency)]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+        measured = max(time.perf_counter() - measure_from, 1e-9)
+        return self.report(started_at, measured)
+
+    def report(self, started_at: str, seconds: float) -> Dict[str, Any]:
+        """Per-category, per-index and total page stats of the measured window"""
+        categories: Dict[str, PageStats] = defaultdict(PageStats)
+        indexes: Dict[str, PageStats] = defaultdict(PageStats)
+        total = PageStats()
+        for (category, index), stats in self.stats.items():
+            categories[category].merge(stats)
+            indexes[index].merge(stats)
+            total.merge(stats)
+        return {
+            'startedAt': started_at,
+            'table': self.table_name,
+            'config': {'concurrency': self.concurrency, 'duration': self.duration, 'warmup': self.warmup,
+                       'think_ms': self.think_ms, 'indexes': self.indexes, 'shards': self.shards, 'seed': self.seed},
+            'pattern': self.pattern.to_dict(),
+            'measured_seconds': round(seconds, 3),
+            'total': total.to_dict(seconds),
+            'categories': {name: stats.to_dict(seconds) for name, stats in sorted(categories.items())},
+            'indexes': {name: stats.to_dict(seconds) for name, stats in sorted(indexes.items())},
+            'session_depths': {str(depth): count for depth, count in sorted(self.depths.items())}
+        }
+
+
+def default_results_dir() -> str:
+    """Where load test reports are kept for later comparison"""
+    return os.path.dirname(cache_path('loadtests', 'latest.json'))
+
+
+def save_result(result: Dict[str, Any], path: str = None) -> str:
+    """Write a report (default: a timestamped file in the results directory); returns its path"""
+    if not path:
+        stamp = datetime.fromisoformat(result['startedAt']).strftime('%Y%m%d-%H%M%S')
+        path = os.path.join(default_results_dir(), f'loadtest-{stamp}.json')
+    with open(path, 'w') as f:
+        json.dump(result, f, indent=2)
+    return path
+
+
+def load_result(path: str) -> Dict[str, Any]:
+    """A saved report; 'last' is the newest one in the results directory"""
+    if path == 'last':
+        saved = sorted(glob.glob(os.path.join(default_results_dir(), 'loadtest-*.json')))
+        if not saved:
+            raise FileNotFoundError(f'No saved load tests in {default_results_dir()}')
+        path = saved[-1]
+    with open(path) as f:
+        return json.load(f)
+
+
+def _change(current: float, previous: float) -> Optional[float]:
+    return round((current - previous) / previous * 100, 1) if previous else None
+
+
+def compare_results(current: Dict[str, Any], previous: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """Throughput and latency changes (in %) of every row two reports share, total first"""
+    rows = [('total', 'total', current['total'], previous['total'])]
+    for group in ('indexes', 'categories'):
+        for name, row in current[group].items():
+            if name in previous[group]:
+                rows.append((group, name, row, previous[group][name]))
+    return [{
+        'group': group,
+        'name': name,
+        'pages_per_second': now['pages_per_second'],
+        'previous_pages_per_second': before['pages_per_second'],
+        'throughput_change': _change(now['pages_per_second'], before['pages_per_second']),
+        'p50_change': _change(now['p50_ms'], before['p50_ms']),
+        'p95_change': _change(now['p95_ms'], before['p95_ms']),
+        'p99_change': _change(now['p99_ms'], before['p99_ms'])
+    } for group, name, now, before in rows]
@@ -0,0 +1,1411 @@
+#!/usr/bin/env python3
+"""
+bf-db local stand-in
+In-process DynamoDB client and a synthetic `webpages` table for benchmarks
+"""
+
+import bisect
+import copy
+import math
+import random
+import re
+import sys
+import threading
+import time
+from collections import defaultdict
+from datetime import datetime, timedelta
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from botocore.exceptions import ClientError
+
+from bf_dynamo import (
+    BATCH_GET_LIMIT, BATCH_WRITE_LIMIT, TRANSACT_ITEMS_LIMIT, MethodPaginator, backoff_delay, chunked, item_size,
+    response_bytes
+)
+from bf_markers import MARKERS, initial_markers
+from bf_partitions import GSI_KEYS, SHARD_ATTRIBUTE, SHARD_INDEX, shard_for, shard_key
+from bf_ranking import QUALITY_ATTRIBUTE, QUALITY_INDEX, quality_sort_attributes
+
+TABLE_NAME = 'webpages'
+
+# Scan/query pages stop at 1 MB of evaluated items, as in DynamoDB
+PAGE_BYTES = 1024 * 1024
+
+# GSIs of the migrated table: the production three plus the quality, shard and marker indexes
+WEBPAGES_INDEXES: Dict[str, Tuple[str, Optional[str]]] = {
+    **GSI_KEYS,
+    QUALITY_INDEX: ('bfCategory', QUALITY_ATTRIBUTE),
+    SHARD_INDEX: (SHARD_ATTRIBUTE, 'status'),
+    **{marker.index: (marker.attribute, None) for marker in MARKERS.values()}
+}
+
+
+class _Exceptions:
+    """`client.exceptions.<Code>` classes, all ClientError subclasses as in boto3"""
+
+    def __init__(self):
+        self._classes: Dict[str, type] = {}
+
+    def __getattr__(self, code: str) -> type:
+        if code.startswith('_'):
+            raise AttributeError(code)
+        if code not in self._classes:
+            self._classes[code] = type(code, (ClientError,), {})
+        return self._classes[code]
+
+    def make(self, code: str, message: str, operation: str, **extra) -> ClientError:
+        return getattr(self, code)({'Error': {'Code': code, 'Message': message}, **extra}, operation)
+
+
+# ---------- compact item storage ----------
+#
+# Items are held as (shape, values, size): `shape` is an interned tuple of
+# (attribute, type) pairs shared by every item with the same layout, `values`
+# the raw scalars. DynamoDB-JSON dicts are only built for the attributes a
+# call returns or evaluates, so a 1M-item table fits in memory and every read
+# allocates fresh objects the way boto3's response parsing does.
+
+_SHAPES: Dict[Tuple, Tuple] = {}
+
+
+def _pack(item: Dict[str, Any]) -> Tuple[Tuple, Tuple, int]:
+    shape, values = [], []
+    for name in sorted(item):
+        (type_key, raw), = item[name].items()
+        shape.append((name, type_key))
+        if type_key in ('SS', 'NS', 'BS'):
+            raw = tuple(raw)
+        elif type_key in ('L', 'M'):
+            raw = copy.deepcopy(raw)
+        values.append(raw)
+    shape = tuple(shape)
+    return _SHAPES.setdefault(shape, shape), tuple(values), item_size(item)
+
+
+def _unpack(packed: Tuple[Tuple, Tuple, int], names: Iterable[str] = None) -> Dict[str, Any]:
+    shape, values, _ = packed
+    item = {}
+    for (name, type_key), raw in zip(shape, values):
+        if names is not None and name not in names:
+            continue
+        if type_key in ('SS', 'NS', 'BS'):
+            raw = list(raw)
+        elif type_key in ('L', 'M'):
+            raw = copy.deepcopy(raw)
+        item[name] = {type_key: raw}
+    return item
+
+
+def _raw(packed: Tuple[Tuple, Tuple, int], name: str) -> Optional[Any]:
+    """Scalar value of one attribute of a packed item (None when absent)"""
+    for (attribute, _), raw in zip(packed[0], packed[1]):
+        if attribute == name:
+            return raw
+    return None
+
+
+def _scalar(value: Dict[str, Any]) -> Any:
+    (type_key, raw), = value.items()
+    return float(raw) if type_key == 'N' else raw
+
+
+# ---------- expressions ----------
+
+_TOKEN = re.compile(r'\s*(?:(<>|<=|>=|=|<|>|\(|\)|,|\+|-)|(#\w+)|(:\w+)|([A-Za-z_]\w*))')
+
+_ORDERED = {'<': lambda a, b: a < b, '<=': lambda a, b: a <= b,
+            '>': lambda a, b: a > b, '>=': lambda a, b: a >= b}
+
+
+def _comparable(value: Optional[Dict[str, Any]]) -> Optional[Tuple[str, Any]]:
+    if value is None:
+        return None
+    (type_key, raw), = value.items()
+    if type_key == 'N':
+        return 'N', float(raw)
+    if type_key in ('SS', 'NS', 'BS'):
+        return type_key, frozenset(raw)
+    if type_key in ('L', 'M'):
+        return type_key, repr(raw)
+    return type_key, raw
+
+
+def _compare(op: str, left: Optional[Dict[str, Any]], right: Optional[Dict[str, Any]]) -> bool:
+    a, b = _comparable(left), _comparable(right)
+    if op == '=':
+        return a is not None and a == b
+    if op == '<>':
+        return a != b
+    if a is None or b is None or a[0] != b[0] or a[0] not in ('S', 'N', 'B'):
+        return False
+    return _ORDERED[op](a[1], b[1])
+
+
+class _Expression:
+    """Tokenized expression with name/value substitution and usage tracking"""
+
+    def __init__(self, text: str, names: Dict[str, str], values: Dict[str, Any], used: set):
+        self.tokens: List[Tuple[str, str]] = []
+        position = 0
+        text = text.strip()
+        while position < len(text):
+            match = _TOKEN.match(text, position)
+            if not match or match.end() == position:
+                raise ValueError(f'Invalid expression near: {text[position:position + 20]!r}')
+            kind = ('op', 'name', 'value', 'word')[match.lastindex - 1]
+            self.tokens.append((kind, match.group(match.lastindex)))
+            position = match.end()
+        self.position = 0
+        self.names, self.values, self.used = names, values, used
+
+    def peek(self, offset: int = 0) -> Tuple[str, str]:
+        index = self.position + offset
+        return self.tokens[index] if index < len(self.tokens) else ('end', '')
+
+    def take(self, expected: str = None) -> Tuple[str, str]:
+        token = self.peek()
+        if expected is not None and token[1].upper() != expected:
+            raise ValueError(f'Expected {expected!r}, found {token[1]!r}')
+        self.position += 1
+        return token
+
+    def keyword(self, word: str) -> bool:
+        kind, text = self.peek()
+        if kind == 'word' and text.upper() == word:
+            self.position += 1
+            return True
+        return False
+
+    def at_end(self) -> bool:
+        return self.position >= len(self.tokens)
+
+    def path(self) -> str:
+        kind, text = self.take()
+        if kind == 'name':
+            if text not in self.names:
+                raise ValueError(f'Undefined attribute name {text}')
+            self.used.add(text)
+            return self.names[text]
+        if kind == 'word':
+            return text
+        raise ValueError(f'Expected an attribute, found {text!r}')
+
+    def value(self) -> Dict[str, Any]:
+        kind, text = self.take()
+        if kind != 'value' or text not in self.values:
+            raise ValueError(f'Undefined attribute value {text}')
+        self.used.add(text)
+        return self.values[text]
+
+    # operand := :value | size(path) | path
+    def operand(self) -> Tuple[Callable[[Dict[str, Any]], Optional[Dict[str, Any]]], set]:
+        kind, text = self.peek()
+        if kind == 'value':
+            constant = self.value()
+            return (lambda item: constant), set()
+        if kind == 'word' and text.lower() == 'size' and self.peek(1)[1] == '(':
+            self.take(), self.take('(')
+            name = self.path()
+            self.take(')')
+
+            def size(item):
+                value = item.get(name)
+                if value is None:
+                    return None
+                (_, raw), = value.items()
+                return {'N': str(len(raw))}
+            return size, {name}
+        name = self.path()
+        return (lambda item: item.get(name)), {name}
+
+    # condition := conjunction (OR conjunction)*
+    def condition(self) -> Tuple[Callable[[Dict[str, Any]], bool], set]:
+        test, names = self._conjunction()
+        while self.keyword('OR'):
+            right, more = self._conjunction()
+            test = (lambda a, b: lambda item: a(item) or b(item))(test, right)
+            names |= more
+        return test, names
+
+    def _conjunction(self):
+        test, names = self._negation()
+        while self.keyword('AND'):
+            right, more = self._negation()
+            test = (lambda a, b: lambda item: a(item) and b(item))(test, right)
+            names |= more
+        return test, names
+
+    def _negation(self):
+        if self.keyword('NOT'):
+            test, names = self._negation()
+            return (lambda item: not test(item)), names
+        return self._primary()
+
+    def _primary(self):
+        kind, text = self.peek()
+        if text == '(':
+            self.take()
+            result = self.condition()
+            self.take(')')
+            return result
+        function = text.lower() if kind == 'word' and self.peek(1)[1] == '(' else None
+        if function in ('attribute_exists', 'attribute_not_exists', 'attribute_type', 'begins_with', 'contains'):
+            self.take(), self.take('(')
+            name = self.path()
+            argument = None
+            if function != 'attribute_exists' and function != 'attribute_not_exists':
+                self.take(',')
+                argument, _ = self.operand()
+            self.take(')')
+            return self._function(function, name, argument), {name}
+
+        left, names = self.operand()
+        if self.keyword('BETWEEN'):
+            low, _ = self.operand()
+            self.take('AND')
+            high, _ = self.operand()
+            return (lambda item: _compare('>=', left(item), low(item)) and
+                    _compare('<=', left(item), high(item))), names
+        if self.keyword('IN'):
+            self.take('(')
+            options = [self.operand()[0]]
+            while self.peek()[1] == ',':
+                self.take()
+                options.append(self.operand()[0])
+            self.take(')')
+            return (lambda item: any(_compare('=', left(item), option(item)) for option in options)), names
+
+        op = self.take()[1]
+        if op not in ('=', '<>', '<', '<=', '>', '>='):
+            raise ValueError(f'Unsupported comparator {op!r}')
+        right, more = self.operand()
+        return (lambda item: _compare(op, left(item), right(item))), names | more
+
+    @staticmethod
+    def _function(function: str, name: str, argument):
+        if function == 'attribute_exists':
+            return lambda item: name in item
+        if function == 'attribute_not_exists':
+            return lambda item: name not in item
+        if function == 'attribute_type':
+            return lambda item: name in item and next(iter(item[name])) == argument(item)['S']
+        if function == 'begins_with':
+            def begins_with(item):
+                value = item.get(name)
+                prefix = argument(item)
+                return value is not None and 'S' in value and value['S'].startswith(prefix['S'])
+            return begins_with
+
+        def contains(item):
+            value = item.get(name)
+            needle = argument(item)
+            if value is None:
+                return False
+            (type_key, raw), = value.items()
+            (_, wanted), = needle.items()
+            if type_key == 'S':
+                return isinstance(wanted, str) and wanted in raw
+            if type_key in ('SS', 'NS', 'BS'):
+                return wanted in raw
+            if type_key == 'L':
+                return needle in raw
+            return False
+        return contains
+
+
+class _Call:
+    """Expressions of one request, checking that every name/value is used"""
+
+    def __init__(self, request: Dict[str, Any]):
+        self.names = request.get('ExpressionAttributeNames') or {}
+        self.values = request.get('ExpressionAttributeValues') or {}
+        self.used: set = set()
+
+    def expression(self, text: str) -> _Expression:
+        return _Expression(text, self.names, self.values, self.used)
+
+    def condition(self, text: Optional[str]):
+        """(test, attribute names) of a condition/filter expression, or (None, set())"""
+        if not text:
+            return None, set()
+        expression = self.expression(text)
+        result = expression.condition()
+        if not expression.at_end():
+            raise ValueError(f'Unexpected {expression.peek()[1]!r} in {text!r}')
+        return result
+
+    def projection(self, text: Optional[str]) -> Optional[set]:
+        if not text:
+            return None
+        expression = self.expression(text)
+        names = {expression.path()}
+        while expression.peek()[1] == ',':
+            expression.take()
+            names.add(expression.path())
+        return names
+
+    def finish(self):
+        unused = [token for token in list(self.names) + list(self.values) if token not in self.used]
+        if unused:
+            raise ValueError(f'Value provided in ExpressionAttributeNames/Values unused in expressions: {unused}')
+
+
+def _update_function(call: _Call, text: str) -> Tuple[Callable[[Dict[str, Any]], Dict[str, Any]], set]:
+    """Compile an UpdateExpression into `item -> updated item` (right sides see the old item)"""
+    expression = call.expression(text)
+    sets: List[Tuple[str, Callable]] = []
+    removes: List[str] = []
+    adds: List[Tuple[str, Callable]] = []
+    deletes: List[Tuple[str, Callable]] = []
+    touched = set()
+
+    def set_value():
+        kind, word = expression.peek()
+        if kind == 'word' and word.lower() in ('if_not_exists', 'list_append') and expression.peek(1)[1] == '(':
+            expression.take(), expression.take('(')
+            first, _ = expression.operand()
+            expression.take(',')
+            second, _ = expression.operand()
+            expression.take(')')
+            if word.lower() == 'if_not_exists':
+                return lambda item: first(item) if first(item) is not None else second(item)
+            return lambda item: {'L': first(item)['L'] + second(item)['L']}
+        left, _ = expression.operand()
+        if expression.peek()[1] in ('+', '-'):
+            sign = 1 if expression.take()[1] == '+' else -1
+            right, _ = expression.operand()
+
+            def arithmetic(item):
+                total = float(left(item)['N']) + sign * float(right(item)['N'])
+                return {'N': str(int(total)) if total.is_integer() else repr(total)}
+            return arithmetic
+        return left
+
+    while not expression.at_end():
+        clause = expression.take()[1].upper()
+        while True:
+            name = expression.path()
+            touched.add(name)
+            if clause == 'SET':
+                expression.take('=')
+                sets.append((name, set_value()))
+            elif clause == 'REMOVE':
+                removes.append(name)
+            elif clause in ('ADD', 'DELETE'):
+                (adds if clause == 'ADD' else deletes).append((name, expression.operand()[0]))
+            else:
+                raise ValueError(f'Unsupported update clause {clause!r}')
+            if expression.peek()[1] != ',':
+                break
+            expression.take()
+
+    def apply(item: Dict[str, Any]) -> Dict[str, Any]:
+        updated = dict(item)
+        for name, value in sets:
+            updated[name] = value(item)
+        for name in removes:
+            updated.pop(name, None)
+        for name, value in adds:
+            (type_key, raw), = value(item).items()
+            current = item.get(name)
+            if type_key == 'N':
+                total = float(raw) + (float(current['N']) if current else 0.0)
+                updated[name] = {'N': str(int(total)) if total.is_integer() else repr(total)}
+            else:
+                merged = list(dict.fromkeys((current or {type_key: []})[type_key] + list(raw)))
+                updated[name] = {type_key: merged}
+        for name, value in deletes:
+            (type_key, raw), = value(item).items()
+            if name in item:
+                remaining = [v for v in item[name][type_key] if v not in raw]
+                if remaining:
+                    updated[name] = {type_key: remaining}
+                else:
+                    updated.pop(name)
+        return updated
+    return apply, touched
+
+
+# ---------- tables ----------
+
+class _Index:
+    """One GSI: hash value -> {table key: sort value}, ordered lazily on read"""
+
+    def __init__(self, name: str, hash_key: str, range_key: Optional[str], table_key: str):
+        self.name = name
+        self.hash_key = hash_key
+        self.range_key = range_key
+        self.table_key = table_key
+        self.buckets: Dict[Any, Dict[str, Any]] = defaultdict(dict)
+        self._ordered: Dict[Any, List[str]] = {}
+        self._all: Optional[Tuple[List[str], Dict[str, int]]] = None
+
+    def keys_of(self, packed) -> Optional[Tuple[Any, Any]]:
+        hash_value = _raw(packed, self.hash_key)
+        if hash_value is None:
+            return None
+        if self.range_key is None:
+            return hash_value, ''
+        range_value = _raw(packed, self.range_key)
+        return None if range_value is None else (hash_value, range_value)
+
+    def add(self, key: str, packed) -> None:
+        keys = self.keys_of(packed)
+        if keys:
+            self.buckets[keys[0]][key] = keys[1]
+            self._ordered.pop(keys[0], None)
+            self._all = None
+
+    def remove(self, key: str, packed) -> None:
+        keys = self.keys_of(packed)
+        if keys:
+            bucket = self.buckets[keys[0]]
+            bucket.pop(key, None)
+            if not bucket:
+                del self.buckets[keys[0]]
+            self._ordered.pop(keys[0], None)
+            self._all = None
+
+    def ordered(self, hash_value: Any) -> List[str]:
+        """Table keys under one hash value in (sort key, table key) order"""
+        if hash_value not in self._ordered:
+            bucket = self.buckets.get(hash_value, {})
+            self._ordered[hash_value] = sorted(bucket, key=lambda k: (bucket[k], k))
+        return self._ordered[hash_value]
+
+    def sort_key(self, hash_value: Any) -> Callable[[str], Tuple[Any, str]]:
+        bucket = self.buckets.get(hash_value, {})
+        return lambda k: (bucket[k], k)
+
+    def everything(self) -> Tuple[List[str], Dict[str, int]]:
+        """Table keys of every indexed item and their positions, for index scans"""
+        if self._all is None:
+            keys = [k for h in sorted(self.buckets, key=str) for k in self.ordered(h)]
+            self._all = keys, {k: i for i, k in enumerate(keys)}
+        return self._all
+
+    def description(self) -> Dict[str, Any]:
+        schema = [{'AttributeName': self.hash_key, 'KeyType': 'HASH'}]
+        if self.range_key:
+            schema.append({'AttributeName': self.range_key, 'KeyType': 'RANGE'})
+        return {
+            'IndexName': self.name,
+            'KeySchema': schema,
+            'Projection': {'ProjectionType': 'ALL'},
+            'IndexStatus': 'ACTIVE',
+            'Backfilling': False,
+            'ItemCount': sum(len(bucket) for bucket in self.buckets.values())
+        }
+
+
+class _Table:
+    """Items of one hash-keyed table in insertion order, plus its GSIs
+
+    A deleted key keeps its (empty) position, so a scan resuming from it
+    continues where it was, and re-inserting it puts it back in place.
+    """
+
+    def __init__(self, name: str, key: str):
+        self.name = name
+        self.key = key
+        self.items: Dict[str, Tuple] = {}
+        self.order: List[Optional[str]] = []
+        self.positions: Dict[str, int] = {}
+        self.indexes: Dict[str, _Index] = {}
+        self.bytes = 0
+
+    def put(self, packed) -> None:
+        key = _raw(packed, self.key)
+        old = self.items.get(key)
+        if old is not None:
+            self.bytes -= old[2]
+            for index in self.indexes.values():
+                index.remove(key, old)
+        elif key in self.positions:
+            self.order[self.positions[key]] = key
+        else:
+            self.positions[key] = len(self.order)
+            self.order.append(key)
+        self.items[key] = packed
+        self.bytes += packed[2]
+        for index in self.indexes.values():
+            index.add(key, packed)
+
+    def delete(self, key: str) -> None:
+        old = self.items.pop(key, None)
+        if old is None:
+            return
+        self.bytes -= old[2]
+        for index in self.indexes.values():
+            index.remove(key, old)
+        self.order[self.positions[key]] = None
+
+    def add_index(self, name: str, hash_key: str, range_key: Optional[str]) -> None:
+        index = _Index(name, hash_key, range_key, self.key)
+        for key, packed in self.items.items():
+            index.add(key, packed)
+        self.indexes[name] = index
+
+    def description(self) -> Dict[str, Any]:
+        description = {
+            'TableName': self.name,
+            'TableStatus': 'ACTIVE',
+            'KeySchema': [{'AttributeName': self.key, 'KeyType': 'HASH'}],
+            'ItemCount': len(self.items),
+            'TableSizeBytes': self.bytes,
+            'BillingModeSummary': {'BillingMode': 'PAY_PER_REQUEST'}
+        }
+        if self.indexes:
+            description['GlobalSecondaryIndexes'] = [index.description() for index in self.indexes.values()]
+        return description
+
+
+class LocalDynamoDB:
+    """
+    In-process stand-in for the low-level boto3 DynamoDB client
+
+    Implements the calls the bf-db tools make (scan/query with GSIs, key and
+    filter expressions, projections, Limit, 1 MB pages, parallel scan
+    segments and pagination; get/put/update/delete, batch and transactional
+    writes; describe/create/update table) with DynamoDB's validation of
+    unused expression names/values and its error codes, so commands run
+    unmodified. Tables are hash-keyed; GSIs are ALL-projection and become
+    ACTIVE immediately. Capacity is reported per call when requested;
+    write capacity includes the GSI writes an item change causes.
+    """
+
+    def __init__(self):
+        self.tables: Dict[str, _Table] = {}
+        self.exceptions = _Exceptions()
+        self._lock = threading.RLock()
+
+    # ----- helpers -----
+
+    def _table(self, name: str, operation: str) -> _Table:
+        table = self.tables.get(name)
+        if table is None:
+            raise self.exceptions.make('ResourceNotFoundException', f'Requested resource not found: Table: {name} not found',
+                                       operation)
+        return table
+
+    def _validation(self, error: Exception, operation: str) -> ClientError:
+        return self.exceptions.make('ValidationException', str(error), operation)
+
+    @staticmethod
+    def _capacity(request: Dict[str, Any], table: str, units: float, index: str = None) -> Dict[str, Any]:
+        if request.get('ReturnConsumedCapacity', 'NONE') == 'NONE':
+            return {}
+        consumed = {'TableName': table, 'CapacityUnits': units}
+        if index and request['ReturnConsumedCapacity'] == 'INDEXES':
+            consumed['GlobalSecondaryIndexes'] = {index: {'CapacityUnits': units}}
+        return {'ConsumedCapacity': consumed}
+
+    @staticmethod
+    def _read_units(size: int, consistent: bool) -> float:
+        units = math.ceil(max(size, 1) / 4096)
+        return float(units) if consistent else units / 2
+
+    @staticmethod
+    def _write_units(size: int) -> float:
+        return float(math.ceil(max(size, 1) / 1024))
+
+    def _write_cost(self, table: _Table, old: Optional[Tuple], new: Optional[Tuple]) -> float:
+        """Write units of replacing `old` by `new` (either may be None)
+
+        The item itself plus every GSI it enters, leaves or is rewritten in;
+        a changed GSI key costs a delete and a put in that index.
+        """
+        units = self._write_units(max(old[2] if old else 0, new[2] if new else 0))
+        for index in table.indexes.values():
+            before = index.keys_of(old) if old else None
+            after = index.keys_of(new) if new else None
+            if before and after and before != after:
+                units += self._write_units(old[2]) + self._write_units(new[2])
+            elif after:
+                units += self._write_units(new[2])
+            elif before:
+                units += self._write_units(old[2])
+        return units
+
+    @staticmethod
+    def _metadata(response: Dict[str, Any], size: int) -> Dict[str, Any]:
+        """ResponseMetadata as boto3 returns it; content-length is the size of the returned items"""
+        response['ResponseMetadata'] = {'HTTPStatusCode': 200, 'RetryAttempts': 0,
+                                        'HTTPHeaders': {'content-length': str(size)}}
+        return response
+
+    @staticmethod
+    def _returned(packed, projection: Optional[set]) -> Tuple[Dict[str, Any], int]:
+        item = _unpack(packed, projection)
+        return item, packed[2] if projection is None else item_size(item)
+
+    def _key_of(self, table: _Table, key: Dict[str, Any], operation: str) -> str:
+        if set(key) != {table.key}:
+            raise self.exceptions.make('ValidationException', 'The provided key element does not match the schema',
+                                       operation)
+        return _scalar(key[table.key])
+
+    # ----- table management -----
+
+    def create_table(self, **request) -> Dict[str, Any]:
+        with self._lock:
+            name = request['TableName']
+            if name in self.tables:
+                raise self.exceptions.make('ResourceInUseException', f'Table already exists: {name}', 'CreateTable')
+            hash_key = next(k['AttributeName'] for k in request['KeySchema'] if k['KeyType'] == 'HASH')
+            table = self.tables[name] = _Table(name, hash_key)
+            for index in request.get('GlobalSecondaryIndexes', []):
+                keys = {k['KeyType']: k['AttributeName'] for k in index['KeySchema']}
+                table.add_index(index['IndexName'], keys['HASH'], keys.get('RANGE'))
+            return {'TableDescription': table.description()}
+
+    def describe_table(self, **request) -> Dict[str, Any]:
+        with self._lock:
+            return {'Table': self._table(request['TableName'], 'DescribeTable').description()}
+
+    def update_table(self, **request) -> Dict[str, Any]:
+        with self._lock:
+            table = self._table(request['TableName'], 'UpdateTable')
+            updates = request.get('GlobalSecondaryIndexUpdates', [])
+            if len(updates) > 1:
+                raise self.exceptions.make('ValidationException',
+                                           'Subscriber limit exceeded: Only 1 online index can be created or '
+                                           'deleted simultaneously per table', 'UpdateTable')
+            for update in updates:
+                if 'Create' in update:
+                    create = update['Create']
+                    if create['IndexName'] in table.indexes:
+                        raise self.exceptions.make('ValidationException', 'Attempting to create an index which '
+                                                   'already exists', 'UpdateTable')
+                    keys = {k['KeyType']: k['AttributeName'] for k in create['KeySchema']}
+                    table.add_index(create['IndexName'], keys['HASH'], keys.get('RANGE'))
+                elif 'Delete' in update:
+                    table.indexes.pop(update['Delete']['IndexName'], None)
+            return {'TableDescription': table.description()}
+
+    def list_tables(self, **request) -> Dict[str, Any]:
+        return {'TableNames': sorted(self.tables)}
+
+    def get_paginator(self, operation: str) -> MethodPaginator:
+        return MethodPaginator(getattr(self, operation))
+
+    def load(self, table_name: str, items: Iterable[Dict[str, Any]]) -> int:
+        """Bulk-insert DynamoDB-JSON items without going through the API (seeding)"""
+        count = 0
+        with self._lock:
+            table = self._table(table_name, 'Load')
+            for item in items:
+                table.put(_pack(item))
+                count += 1
+            # Order every index now, so forked readers do not each sort it again
+            for index in table.indexes.values():
+                for hash_value in list(index.buckets):
+                    index.ordered(hash_value)
+        return count
+
+    # ----- reads -----
+
+    def get_item(self, **request) -> Dict[str, Any]:
+        with self._lock:
+            table = self._table(request['TableName'], 'GetItem')
+            call = _Call(request)
+            try:
+                projection = call.projection(request.get('ProjectionExpression'))
+                call.finish()
+            except ValueError as e:
+                raise self._validation(e, 'GetItem')
+            packed = table.items.get(self._key_of(table, request['Key'], 'GetItem'))
+            response = self._capacity(request, table.name,
+                                      self._read_units(packed[2] if packed else 1, request.get('ConsistentRead')))
+            size = 0
+            if packed is not None:
+                response['Item'], size = self._returned(packed, projection)
+            return self._metadata(response, size)
+
+    def batch_get_item(self, **request) -> Dict[str, Any]:
+        with self._lock:
+            responses, consumed, size = {}, [], 0
+            keys = sum(len(spec['Keys']) for spec in request['RequestItems'].values())
+            if keys > BATCH_GET_LIMIT:
+                raise self.exceptions.make('ValidationException', 'Too many items requested for the BatchGetItem call',
+                                           'BatchGetItem')
+            for name, spec in request['RequestItems'].items():
+                table = self._table(name, 'BatchGetItem')
+                call = _Call(spec)
+                try:
+                    projection = call.projection(spec.get('ProjectionExpression'))
+                    call.finish()
+                except ValueError as e:
+                    raise self._validation(e, 'BatchGetItem')
+                found, units = [], 0.0
+                for key in spec['Keys']:
+                    packed = table.items.get(self._key_of(table, key, 'BatchGetItem'))
+                    units += self._read_units(packed[2] if packed else 1, spec.get('ConsistentRead'))
+                    if packed is not None:
+                        item, item_bytes = self._returned(packed, projection)
+                        found.append(item)
+                        size += item_bytes
+                responses[name] = found
+                consumed.append({'TableName': name, 'CapacityUnits': units})
+            response = {'Responses': responses, 'UnprocessedKeys': {}}
+            if request.get('ReturnConsumedCapacity', 'NONE') != 'NONE':
+                response['ConsumedCapacity'] = consumed
+            return self._metadata(response, size)
+
+    def scan(self, **request) -> Dict[str, Any]:
+        with self._lock:
+            table = self._table(request['TableName'], 'Scan')
+            index = self._index(table, request.get('IndexName'), 'Scan')
+            keys, positions = (table.order, table.positions) if index is None else index.everything()
+            start = 0
+            if request.get('ExclusiveStartKey'):
+                start = positions.get(_scalar(request['ExclusiveStartKey'][table.key]), len(keys)) + 1
+
+            step = 1
+            segments = request.get('TotalSegments')
+            if segments:
+                # Segment s owns positions s, s + N, s + 2N, ...
+                start += (request['Segment'] - start) % segments
+                step = segments
+            return self._page(table, index, request, keys, start, len(keys), step, 'Scan')
+
+    def query(self, **request) -> Dict[str, Any]:
+        with self._lock:
+            table = self._table(request['TableName'], 'Query')
+            index = self._index(table, request.get('IndexName'), 'Query')
+            call = _Call(request)
+            try:
+                hash_value, range_test = self._key_condition(call, request['KeyConditionExpression'],
+                                                             index.hash_key if index else table.key,
+                                                             index.range_key if index else None)
+            except ValueError as e:
+                raise self._validation(e, 'Query')
+
+            if index is None:
+                keys = [hash_value] if hash_value in table.items else []
+                return self._page(table, index, request, keys, 0, len(keys), 1, 'Query', call)
+
+            keys = index.ordered(hash_value)
+            sort_key = index.sort_key(hash_value)
+            low, high = range_test(keys, sort_key) if range_test else (0, len(keys))
+            forward = request.get('ScanIndexForward', True)
+            if request.get('ExclusiveStartKey'):
+                last = request['ExclusiveStartKey']
+                position = (_scalar(last[index.range_key]) if index.range_key else '', _scalar(last[table.key]))
+                if forward:
+                    low = max(low, bisect.bisect_right(keys, position, key=sort_key))
+                else:
+                    high = min(high, bisect.bisect_left(keys, position, key=sort_key))
+            if forward:
+                return self._page(table, index, request, keys, low, high, 1, 'Query', call)
+            return self._page(table, index, request, keys, high - 1, low - 1, -1, 'Query', call)
+
+    def _index(self, table: _Table, name: Optional[str], operation: str) -> Optional[_Index]:
+        if not name:
+            return None
+        if name not in table.indexes:
+            raise self.exceptions.make('ValidationException',
+                                       f'The table does not have the specified index: {name}', operation)
+        return table.indexes[name]
+
+    @staticmethod
+    def _key_condition(call: _Call, text: str, hash_key: str, range_key: Optional[str]):
+        """Hash value and a `(keys, sort_key) -> (start, stop)` range bound of a KeyConditionExpression"""
+        expression = call.expression(text)
+        hash_value, range_test = None, None
+        while True:
+            kind, word = expression.peek()
+            if kind == 'word' and word.lower() == 'begins_with':
+                expression.take(), expression.take('(')
+                name = expression.path()
+                expression.take(',')
+                prefix = _scalar(expression.value())
+                expression.take(')')
+                if name != range_key:
+                    raise ValueError(f'begins_with on non-sort key {name}')
+                range_test = lambda keys, key, p=prefix: (bisect.bisect_left(keys, (p, ''), key=key),
+                                                          bisect.bisect_left(keys, (p + '\U0010ffff', ''), key=key))
+            else:
+                name = expression.path()
+                if expression.keyword('BETWEEN'):
+                    low = _scalar(expression.value())
+                    expression.take('AND')
+                    high = _scalar(expression.value())
+                    op = 'BETWEEN'
+                else:
+                    op = expression.take()[1]
+                    low = high = _scalar(expression.value())
+                if name == hash_key and op == '=':
+                    hash_value = low
+                elif name == range_key:
+                    range_test = LocalDynamoDB._range_test(op, low, high)
+                else:
+                    raise ValueError(f'Query condition missed key schema element: {name}')
+            if not expression.keyword('AND'):
+                break
+        if not expression.at_end() or hash_value is None:
+            raise ValueError('Query condition missed key schema element')
+        return hash_value, range_test
+
+    @staticmethod
+    def _range_test(op: str, low: Any, high: Any):
+        top = '\U0010ffff' if isinstance(low, str) else float('inf')
+        bounds = {
+            '=': ((low, ''), 'left', (low, top), 'right'),
+            '<': ((None,), None, (low, ''), 'left'),
+            '<=': ((None,), None, (low, top), 'right'),
+            '>': ((low, top), 'right', None, None),
+            '>=': ((low, ''), 'left', None, None),
+            'BETWEEN': ((low, ''), 'left', (high, top), 'right')
+        }
+        if op not in bounds:
+            raise ValueError(f'Unsupported key condition operator {op!r}')
+        lower, lower_side, upper, upper_side = bounds[op]
+
+        def test(keys, key):
+            start = 0 if lower_side is None else (
+                bisect.bisect_left if lower_side == 'left' else bisect.bisect_right)(keys, lower, key=key)
+            stop = len(keys) if upper_side is None else (
+                bisect.bisect_left if upper_side == 'left' else bisect.bisect_right)(keys, upper, key=key)
+            return start, max(start, stop)
+        return test
+
+    def _page(self, table: _Table, index: Optional[_Index], request: Dict[str, Any], keys: List[Optional[str]],
+              start: int, stop: int, step: int, operation: str, call: _Call = None) -> Dict[str, Any]:
+        """One page of keys[start:stop:step]: Limit and 1 MB count evaluated items, as in DynamoDB"""
+        call = call or _Call(request)
+        try:
+            test, filter_names = call.condition(request.get('FilterExpression'))
+            projection = call.projection(request.get('ProjectionExpression'))
+            call.finish()
+        except ValueError as e:
+            raise self._validation(e, operation)
+
+        limit = request.get('Limit')
+        count_only = request.get('Select') == 'COUNT'
+        items, scanned, size, returned = [], 0, 0, 0
+        last = None
+        position = start
+        remaining = (lambda p: p < stop) if step > 0 else (lambda p: p > stop)
+        while remaining(position):
+            key = keys[position]
+            packed = table.items.get(key) if key is not None else None
+            if packed is None:
+                position += step
+                continue
+            if (limit is not None and scanned >= limit) or (scanned and size + packed[2] > PAGE_BYTES):
+                break
+            scanned += 1
+            size += packed[2]
+            last = packed
+            position += step
+            if test is None or test(_unpack(packed, filter_names)):
+                if count_only:
+                    items.append(None)
+                else:
+                    item, item_bytes = self._returned(packed, projection)
+                    items.append(item)
+                    returned += item_bytes
+
+        response = {'Count': len(items), 'ScannedCount': scanned}
+        if not count_only:
+            response['Items'] = items
+        if remaining(position) and last is not None:
+            key = {table.key: _unpack(last, {table.key})[table.key]}
+            if index is not None:
+                key.update(_unpack(last, {index.hash_key, index.range_key or index.hash_key}))
+            response['LastEvaluatedKey'] = key
+        response.update(self._capacity(request, table.name, self._read_units(size, request.get('ConsistentRead')),
+                                       index.name if index else None))
+        return self._metadata(response, returned)
+
+    # ----- writes -----
+
+    def _check(self, call: _Call, request: Dict[str, Any], current: Optional[Dict[str, Any]]) -> bool:
+        test, _ = call.condition(request.get('ConditionExpression'))
+        return test is None or test(current or {})
+
+    def _conditional_failure(self, operation: str, request: Dict[str, Any], current) -> ClientError:
+        extra = {}
+        if request.get('ReturnValuesOnConditionCheckFailure') == 'ALL_OLD' and current:
+            extra['Item'] = current
+        return self.exceptions.make('ConditionalCheckFailedException', 'The conditional request failed',
+                                    operation, **extra)
+
+    def put_item(self, **request) -> Dict[str, Any]:
+        with self._lock:
+            table = self._table(request['TableName'], 'PutItem')
+            key = self._key_of(table, {table.key: request['Item'][table.key]}, 'PutItem')
+            old = table.items.get(key)
+            current = _unpack(old) if old else None
+            call = _Call(request)
+            try:
+                passed = self._check(call, request, current)
+                call.finish()
+            except ValueError as e:
+                raise self._validation(e, 'PutItem')
+            if not passed:
+                raise self._conditional_failure('PutItem', request, current)
+            packed = _pack(request['Item'])
+            table.put(packed)
+            response = self._capacity(request, table.name, self._write_cost(table, old, packed))
+            if request.get('ReturnValues') == 'ALL_OLD' and current:
+                response['Attributes'] = current
+            return response
+
+    def update_item(self, **request) -> Dict[str, Any]:
+        with self._lock:
+            table = self._table(request['TableName'], 'UpdateItem')
+            key = self._key_of(table, request['Key'], 'UpdateItem')
+            old = table.items.get(key)
+            current = _unpack(old) if old else None
+            call = _Call(request)
+            try:
+                passed = self._check(call, request, current)
+                apply, touched = _update_function(call, request.get('UpdateExpression', ''))
+                call.finish()
+            except ValueError as e:
+                raise self._validation(e, 'UpdateItem')
+            if not passed:
+                raise self._conditional_failure('UpdateItem', request, current)
+            if table.key in touched:
+                raise self.exceptions.make('ValidationException', 'Cannot update attribute url. This attribute '
+                                           'is part of the key', 'UpdateItem')
+            updated = apply(current or dict(request['Key']))
+            packed = _pack(updated)
+            table.put(packed)
+
+            response = self._capacity(request, table.name, self._write_cost(table, old, packed))
+            returns = request.get('ReturnValues', 'NONE')
+            if returns == 'ALL_NEW':
+                response['Attributes'] = _unpack(packed)
+            elif returns == 'ALL_OLD' and current:
+                response['Attributes'] = current
+            elif returns == 'UPDATED_NEW':
+                response['Attributes'] = {name: value for name, value in updated.items() if name in touched}
+            elif returns == 'UPDATED_OLD' and current:
+                response['Attributes'] = {name: value for name, value in current.items() if name in touched}
+            return response
+
+    def delete_item(self, **request) -> Dict[str, Any]:
+        with self._lock:
+            table = self._table(request['TableName'], 'DeleteItem')
+            key = self._key_of(table, request['Key'], 'DeleteItem')
+            old = table.items.get(key)
+            current = _unpack(old) if old else None
+            call = _Call(request)
+            try:
+                passed = self._check(call, request, current)
+                call.finish()
+            except ValueError as e:
+                raise self._validation(e, 'DeleteItem')
+            if not passed:
+                raise self._conditional_failure('DeleteItem', request, current)
+            table.delete(key)
+            response = self._capacity(request, table.name, self._write_cost(table, old, None) if old else 1.0)
+            if request.get('ReturnValues') == 'ALL_OLD' and current:
+                response['Attributes'] = current
+            return response
+
+    def batch_write_item(self, **request) -> Dict[str, Any]:
+        with self._lock:
+            writes = sum(len(requests) for requests in request['RequestItems'].values())
+            if writes > BATCH_WRITE_LIMIT:
+                raise self.exceptions.make('ValidationException', 'Too many items requested for the BatchWriteItem call',
+                                           'BatchWriteItem')
+            consumed = []
+            for name, requests in request['RequestItems'].items():
+                table = self._table(name, 'BatchWriteItem')
+                units = 0.0
+                for write in requests:
+                    if 'PutRequest' in write:
+                        packed = _pack(write['PutRequest']['Item'])
+                        old = table.items.get(_raw(packed, table.key))
+                        table.put(packed)
+                        units += self._write_cost(table, old, packed)
+                    else:
+                        key = self._key_of(table, write['DeleteRequest']['Key'], 'BatchWriteItem')
+                        old = table.items.get(key)
+                        table.delete(key)
+                        units += self._write_cost(table, old, None) if old else 1.0
+                consumed.append({'TableName': name, 'CapacityUnits': units})
+            response = {'UnprocessedItems': {}}
+            if request.get('ReturnConsumedCapacity', 'NONE') != 'NONE':
+                response['ConsumedCapacity'] = consumed
+            return response
+
+    def transact_write_items(self, **request) -> Dict[str, Any]:
+        with self._lock:
+            actions = request['TransactItems']
+            if len(actions) > TRANSACT_ITEMS_LIMIT:
+                raise self.exceptions.make('ValidationException', 'Member must have length less than or equal to 100',
+                                           'TransactWriteItems')
+            planned, reasons = [], []
+            for action in actions:
+                (kind, spec), = action.items()
+                table = self._table(spec['TableName'], 'TransactWriteItems')
+                key_attributes = {table.key: spec['Item'][table.key]} if kind == 'Put' else spec['Key']
+                key = self._key_of(table, key_attributes, 'TransactWriteItems')
+                old = table.items.get(key)
+                current = _unpack(old) if old else None
+                call = _Call(spec)
+                try:
+                    passed = self._check(call, spec, current)
+                    apply = _update_function(call, spec['UpdateExpression'])[0] if kind == 'Update' else None
+                    call.finish()
+                except ValueError as e:
+                    raise self._validation(e, 'TransactWriteItems')
+                reasons.append({'Code': 'None'} if passed else {'Code': 'ConditionalCheckFailed',
+                                                                'Message': 'The conditional request failed'})
+                planned.append((kind, spec, table, key, current, apply))
+
+            if any(reason['Code'] != 'None' for reason in reasons):
+                codes = ', '.join(reason['Code'] for reason in reasons)
+                raise self.exceptions.make('TransactionCanceledException',
+                                           f'Transaction cancelled, please refer cancellation reasons for specific '
+                                           f'reasons [{codes}]', 'TransactWriteItems', CancellationReasons=reasons)
+
+            units = 0.0
+            for kind, spec, table, key, current, apply in planned:
+                old = table.items.get(key)
+                if kind == 'Put':
+                    packed = _pack(spec['Item'])
+                    table.put(packed)
+                elif kind == 'Update':
+                    packed = _pack(apply(current or dict(spec['Key'])))
+                    table.put(packed)
+                elif kind == 'Delete':
+                    table.delete(key)
+                    packed = None
+                else:
+                    continue
+                units += 2 * (self._write_cost(table, old, packed) if old or packed else 1.0)
+            return self._capacity(request, planned[0][2].name if planned else '', units)
+
+
+# ---------- latency, throttling and accounting ----------
+
+
+# Operations that return items, and where in the response they are
+_ITEM_RESPONSES = {'scan', 'query', 'get_item', 'batch_get_item'}
+
+
+class SimulatedClient:
+    """
+    Wraps any DynamoDB client with injected latency/throttling and counters
+
+    Every call sleeps `latency_ms` (±50% jitter) and, with probability
+    `throttle_rate`, fails with ProvisionedThroughputExceededException before
+    reaching the table, as a hot partition would. Counters record calls per
+    operation, throttles, items evaluated and returned, and bytes returned.
+    Works over LocalDynamoDB, moto or a DynamoDB Local endpoint client.
+    """
+
+    def __init__(self, client, latency_ms: float = 0.0, throttle_rate: float = 0.0, seed: int = 0):
+        self.client = client
+        self.latency_ms = latency_ms
+        self.throttle_rate = throttle_rate
+        self.exceptions = client.exceptions
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self.reset_stats()
+
+    def reseed(self, seed: Any) -> None:
+        """Restart the latency/throttle sequence (e.g. per benchmarked command)"""
+        with self._lock:
+            self._random.seed(seed)
+
+    def reset_stats(self) -> None:
+        with self._lock:
+            self.calls: Dict[str, int] = defaultdict(int)
+            self.throttled: Dict[str, int] = defaultdict(int)
+            self.items_scanned = 0
+            self.items_returned = 0
+            self.bytes_returned = 0
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                'calls': sum(self.calls.values()),
+                'calls_by_operation': dict(self.calls),
+                'throttled': sum(self.throttled.values()),
+                'items_scanned': self.items_scanned,
+                'items_returned': self.items_returned,
+                'bytes_returned': self.bytes_returned
+            }
+
+    def get_paginator(self, operation: str) -> MethodPaginator:
+        return MethodPaginator(getattr(self, operation))
+
+    def __getattr__(self, operation: str):
+        method = getattr(self.client, operation)
+        if operation.startswith('_') or not callable(method):
+            return method
+
+        def call(**request):
+            with self._lock:
+                self.calls[operation] += 1
+                throttle = self.throttle_rate and self._random.random() < self.throttle_rate
+                delay = self.latency_ms / 1000 * self._random.uniform(0.5, 1.5) if self.latency_ms else 0.0
+            if delay:
+                time.sleep(delay)
+            if throttle:
+                with self._lock:
+                    self.throttled[operation] += 1
+                raise self.exceptions.ProvisionedThroughputExceededException(
+                    {'Error': {'Code': 'ProvisionedThroughputExceededException',
+                               'Message': 'The level of configured provisioned throughput for the table was '
+                                          'exceeded. Consider increasing your provisioning level'}},
+                    operation)
+
+            response = method(**request)
+            if operation in _ITEM_RESPONSES:
+                if operation == 'batch_get_item':
+                    items = [item for found in response.get('Responses', {}).values() for item in found]
+                else:
+                    items = response.get('Items', [response['Item']] if 'Item' in response else [])
+                size = response_bytes(response, items)
+                with self._lock:
+                    self.items_scanned += response.get('ScannedCount', len(items))
+                    self.items_returned += len(items)
+                    self.bytes_returned += size
+            return response
+        return call
+
+
+# ---------- synthetic webpages table ----------
+
+# (bfCategory, source, items out of the 60,991-row production table, active share);
+# category totals follow the production distribution, '' is not yet categorized
+SOURCE_DISTRIBUTION: List[Tuple[str, str, int, float]] = [
+    ('movies', 'tmdb-to-imdb', 9800, 0.97),
+    ('movies', 'reddit-movies', 2936, 0.85),
+    ('books', 'google-books-to-goodreads', 8200, 0.95),
+    ('books', 'internet-archive-books', 4100, 0.9),
+    ('books', 'reddit-books', 1581, 0.85),
+    ('culture', 'internet-archive-culture', 6100, 0.9),
+    ('art', 'internet-archive-art', 2400, 0.9),
+    ('art', 'wikipedia-art', 1542, 0.95),
+    ('science', 'internet-archive-science', 4700, 0.9),
+    ('science', 'reddit-physics', 2270, 0.85),
+    ('technology', 'hackernews', 4300, 0.9),
+    ('long-reads', 'reddit-TrueReddit', 1600, 0.9),
+    ('long-reads', 'reddit-Foodforthought', 1261, 0.9),
+    ('long-reads', 'reddit-longreads', 900, 0.9),
+    ('webgames', 'reddit-webgames', 493, 0.01),
+    ('music', 'youtube-music', 755, 0.95),
+    ('', 'reddit-history', 1800, 0.9),
+    ('', 'reddit-food', 1500, 0.9),
+    ('', 'reddit-space', 1400, 0.9),
+    ('', 'designboom', 1200, 0.95),
+    ('', 'youtube', 1153, 0.95),
+    ('', 'reddit-programming', 1000, 0.9),
+]
+
+PRODUCTION_ITEMS = sum(count for _, _, count, _ in SOURCE_DISTRIBUTION)
+
+# Hosts per source; sources not listed link out to article sites
+SOURCE_DOMAINS = {
+    'tmdb-to-imdb': ['www.imdb.com'],
+    'google-books-to-goodreads': ['www.goodreads.com'],
+    'internet-archive-books': ['archive.org'],
+    'internet-archive-culture': ['archive.org'],
+    'internet-archive-art': ['archive.org'],
+    'internet-archive-science': ['archive.org'],
+    'wikipedia-art': ['en.wikipedia.org'],
+    'youtube-music': ['www.youtube.com'],
+    'youtube': ['www.youtube.com'],
+    'designboom': ['www.designboom.com'],
+    'reddit-webgames': ['www.eyezmaze.com', 'gamejolt.com', 'lichess.org', 'itch.io', 'www.kongregate.com'],
+}
+ARTICLE_DOMAINS = [
+    'www.theatlantic.com', 'www.newyorker.com', 'aeon.co', 'www.wired.com', 'arstechnica.com',
+    'www.nytimes.com', 'www.theguardian.com', 'www.quantamagazine.org', 'nautil.us', 'www.vox.com',
+    'longreads.com', 'www.bbc.com', 'www.npr.org', 'github.com', 'medium.com', 'www.smithsonianmag.com',
+    'www.vulture.com', 'pitchfork.com', 'www.rogerebert.com', 'www.lrb.co.uk'
+]
+
+SUBCATEGORIES = {
+    'movies': ['film-database', 'film-reviews', 'classic-films'],
+    'books': ['fiction', 'non-fiction', 'classics'],
+    'culture': ['history', 'folklore', 'film-archive'],
+    'art': ['painting', 'design', 'photography'],
+    'science': ['research', 'astronomy', 'education'],
+    'technology': ['tech-news', 'development', 'hardware'],
+    'long-reads': ['journalism', 'essays', 'analysis', 'investigative'],
+    'webgames': ['puzzle', 'strategy', 'arcade'],
+    'music': ['albums', 'live', 'playlists'],
+}
+
+# Words titles, tags and summaries are drawn from, per category (Zipf-weighted)
+VOCABULARY = {
+    'movies': 'film director cinema drama thriller noir comedy horror review classic sequel actor oscar '
+              'western documentary animation festival screenplay trailer',
+    'books': 'novel author fiction memoir poetry essay literature classic biography history fantasy '
+             'mystery translation chapter series prize library',
+    'culture': 'archive history culture folk tradition ritual museum heritage film recording photograph '
+               'society ancient language',
+    'art': 'painting sculpture gallery exhibition design artist modern portrait installation photography '
+           'architecture museum drawing',
+    'science': 'physics quantum universe research space climate biology energy particle galaxy evolution '
+               'theory experiment',
+    'technology': 'software startup programming ai hardware security open source data privacy chip '
+                  'robot network cloud',
+    'long-reads': 'story investigation essay politics economy power family crime culture war history '
+                  'profile analysis',
+    'webgames': 'game puzzle browser strategy arcade chess multiplayer retro flash casual',
+    'music': 'album song live concert band jazz electronic session playlist vinyl',
+    '': 'history food space design video programming recipe rocket documentary code',
+}
+
+CONTENT_TYPES = {'youtube': 'video', 'webgames': 'game', 'letterboxd': 'review'}
+
+
+def _content_type(source: str) -> str:
+    return next((kind for marker, kind in CONTENT_TYPES.items() if marker in source), 'article')
+
+
+def production_plan(count: int) -> List[Tuple[str, str, float, int]]:
+    """(bfCategory, source, active share, items) with the production shares, summing to `count`"""
+    plan = []
+    for category, source, share, active in SOURCE_DISTRIBUTION:
+        plan.append((category, source, active, max(1, round(count * share / PRODUCTION_ITEMS))))
+    # Rounding drift goes to the largest source
+    plan[0] = plan[0][:3] + (plan[0][3] + count - sum(n for *_, n in plan),)
+    return plan
+
+
+def synthetic_items(count: int, seed: int = 0, migrated: bool = True,
+                    now: datetime = None, profile=None) -> Iterator[Dict[str, Any]]:
+    """
+    `count` DynamoDB-JSON webpages items with the production source/category mix
+
+    Deterministic for a seed. Sources keep their production shares at any
+    size; active/inactive status, bfSubcategory, thumbnails, summaries, word
+    counts, link checks and engagement are filled at realistic rates so
+    every command finds work. `migrated` adds the derived qualitySort,
+    bfCategoryShard and needs* attributes, as on a fully migrated table.
+    Items come out shuffled, so scans do not see sources in blocks.
+
+    A `profile` (bf_corpus.CorpusProfile) replaces the production mix with
+    its own plan and decorates items (textContent, engagement) from a second
+    random stream, so the base attributes of a seed stay the same.
+    """
+    rng = random.Random(seed)
+    detail_rng = random.Random(f'{seed}:detail')
+    now = now or datetime(2026, 1, 1)
+    plan = profile.plan(count) if profile is not None else production_plan(count)
+
+    vocabularies = {}
+    for category, words in VOCABULARY.items():
+        words = words.split()
+        vocabularies[category] = (words, [1.0 / (rank + 1) for rank in range(len(words))])
+
+    slots = [index for index, (*_, n) in enumerate(plan) for _ in range(n)]
+    rng.shuffle(slots)
+    serials = [0] * len(plan)
+    intern = sys.intern
+    for slot in slots:
+        category, source, active_share, _ = plan[slot]
+        serials[slot] += 1
+        words, weights = vocabularies[category]
+        title_words = rng.choices(words, weights=weights, k=rng.randint(3, 8))
+        domains = SOURCE_DOMAINS.get(source, ARTICLE_DOMAINS)
+        domain = domains[rng.randrange(len(domains))]
+        url = f"https://{domain}/{source}/{'-'.join(title_words[:4])}-{serials[slot]}"
+        active = rng.random() < active_share
+        added = now - timedelta(seconds=rng.randrange(730 * 86400))
+
+        item = {
+            'url': {'S': url},
+            'title': {'S': ' '.join(title_words).capitalize()},
+            'source': {'S': intern(source)},
+            'domain': {'S': intern(domain)},
+            'status': {'S': intern('active' if active else 'inactive')},
+            'isActive': {'BOOL': active},
+            'contentType': {'S': intern(_content_type(source))},
+            'dateAdded': {'S': added.isoformat()},
+            'qualityScore': {'N': intern(str(min(100, max(0, round(rng.gauss(62, 14))))))},
+            'tags': {'SS': sorted(set(rng.choices(words, weights=weights, k=rng.randint(2, 4))))}
+        }
+        if category:
+            item['bfCategory'] = {'S': intern(category)}
+            if rng.random() < 0.6:
+                item['bfSubcategory'] = {'S': intern(rng.choice(SUBCATEGORIES[category]))}
+        if rng.random() < 0.7:
+            item['thumbnailUrl'] = {'S': f'https://{domain}/images/{serials[slot]}.jpg'}
+        if rng.random() < 0.45:
+            summary = rng.choices(words, weights=weights, k=rng.randint(20, 45))
+            item['aiSummary'] = {'S': ' '.join(summary).capitalize() + '.'}
+        if item['contentType']['S'] == 'article' and rng.random() < 0.5:
+            words_count = int(rng.lognormvariate(7.0, 0.8))
+            item['wordCount'] = {'N': str(words_count)}
+            item['readingTime'] = {'N': intern(str(max(1, words_count // 200)))}
+        if source.startswith('reddit-') or source == 'hackernews':
+            item['upvotes'] = {'N': str(int(rng.paretovariate(1.2) * 5))}
+        if rng.random() < 0.3:
+            checked = added + timedelta(seconds=rng.randrange(max(1, int((now - added).total_seconds()))))
+            item['lastChecked'] = {'S': checked.isoformat()}
+            item['httpStatus'] = {'N': intern('200' if rng.random() < 0.9 else '404')}
+
+        if migrated:
+            item.update(quality_sort_attributes(item))
+            if category:
+                item[SHARD_ATTRIBUTE] = {'S': intern(shard_key(category, shard_for(url)))}
+            item.update(initial_markers(item))
+        if profile is not None:
+            profile.decorate(item, detail_rng, category)
+        yield item
+
+
+def webpages_definition(table_name: str = TABLE_NAME, migrated: bool = True) -> Dict[str, Any]:
+    """CreateTable arguments for the webpages table (on-demand) and its GSIs"""
+    indexes = WEBPAGES_INDEXES if migrated else GSI_KEYS
+    attributes = {'url'}
+    definitions = []
+    for name, (hash_key, range_key) in indexes.items():
+        keys = [(hash_key, 'HASH')] + ([(range_key, 'RANGE')] if range_key else [])
+        attributes.update(attribute for attribute, _ in keys)
+        definitions.append({
+            'IndexName': name,
+            'KeySchema': [{'AttributeName': attribute, 'KeyType': key_type} for attribute, key_type in keys],
+            'Projection': {'ProjectionType': 'ALL'}
+        })
+    return {
+        'TableName': table_name,
+        'KeySchema': [{'AttributeName': 'url', 'KeyType': 'HASH'}],
+        'AttributeDefinitions': [{'AttributeName': name, 'AttributeType': 'S'} for name in sorted(attributes)],
+        'GlobalSecondaryIndexes': definitions,
+        'BillingMode': 'PAY_PER_REQUEST'
+    }
+
+
+def seed_table(client, count: int, table_name: str = TABLE_NAME, seed: int = 0, migrated: bool = True,
+               items: Iterable[Dict[str, Any]] = None, profile=None) -> Dict[str, Any]:
+    """
+    Create and fill a synthetic webpages table on any client
+
+    LocalDynamoDB is loaded directly; other clients (moto, DynamoDB Local)
+    get BatchWriteItem calls, retrying unprocessed items.
+    """
+    start_time = time.time()
+    client.create_table(**webpages_definition(table_name, migrated))
+    items = items if items is not None else synthetic_items(count, seed=seed, migrated=migrated, profile=profile)
+    if hasattr(client, 'load'):
+        loaded = client.load(table_name, items)
+    else:
+        loaded = 0
+        for chunk in chunked(items, BATCH_WRITE_LIMIT):
+            request = {table_name: [{'PutRequest': {'Item': item}} for item in chunk]}
+            attempt = 0
+            while request:
+                request = client.batch_write_item(RequestItems=request).get('UnprocessedItems') or {}
+                if request:
+                    time.sleep(backoff_delay(attempt))
+                    attempt += 1
+            loaded += len(chunk)
+    return {
+        'table': table_name,
+        'items': loaded,
+        'elapsed_seconds': round(time.time() - start_time, 2)
+    }
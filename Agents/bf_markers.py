@@ -0,0 +1,156 @@
+#!/usr/bin/env python3
+"""
+bf-db work markers
+Sparse "needs work" attributes and the sparse GSIs that serve them as queues
+"""
+
+from collections import defaultdict
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from bf_dynamo import index_definition, index_status, iter_items
+
+# Metadata fields enrichment fills; an item missing any of them needs work
+METADATA_FIELDS = ('thumbnailUrl', 'aiSummary', 'wordCount')
+
+
+def _text(item: Dict[str, Any], field: str) -> str:
+    return item.get(field, {}).get('S', '')
+
+
+class Marker:
+    """One kind of pending work: a sparse attribute plus its GSI
+
+    The attribute exists only while the item needs the work, and its value
+    is the item's `scope_field` (source or category), which is the GSI hash
+    key: a job scoped to one source/category queries its key, an unscoped
+    job scans the index. Either way it reads only marked items.
+    """
+
+    def __init__(self, name: str, attribute: str, scope_field: str,
+                 needs: Callable[[Dict[str, Any]], bool]):
+        self.name = name
+        self.attribute = attribute
+        self.index = f"needs-{name}-index"
+        self.scope_field = scope_field
+        self.needs = needs
+
+    def value(self, item: Dict[str, Any]) -> Optional[str]:
+        """Marker value the item should carry (None: no work pending)"""
+        if not self.needs(item):
+            return None
+        return _text(item, self.scope_field) or 'unknown'
+
+
+MARKERS = {marker.name: marker for marker in [
+    Marker('category', 'needsCategory', 'source',
+           lambda item: not _text(item, 'bfCategory')),
+    Marker('subcategory', 'needsSubcategory', 'bfCategory',
+           lambda item: bool(_text(item, 'bfCategory')) and not _text(item, 'bfSubcategory')),
+    Marker('metadata', 'needsMetadata', 'source',
+           lambda item: not all(item.get(field) for field in METADATA_FIELDS)),
+    Marker('link-check', 'needsLinkCheck', 'source',
+           lambda item: not _text(item, 'lastChecked'))
+]}
+
+# Attributes a marker decision depends on, plus the markers themselves
+SOURCE_FIELDS = sorted({'url', 'source', 'bfCategory', 'bfSubcategory', 'lastChecked', *METADATA_FIELDS}
+                       | {marker.attribute for marker in MARKERS.values()})
+
+
+def marker_changes(current: Dict[str, Any], updated: Dict[str, Any] = None,
+                   only: Iterable[str] = None) -> Dict[str, Any]:
+    """
+    Marker attributes to write so markers match `updated` (default: `current`)
+
+    Returns `{attribute: value-or-None}` for markers that must be set,
+    changed or removed, ready to merge into the same UpdateItem that changes
+    the item itself, so data and markers never disagree. `only` limits the
+    check to some markers, for callers that read a narrow projection.
+    """
+    updated = current if updated is None else updated
+    changes = {}
+    for marker in (MARKERS[name] for name in only) if only else MARKERS.values():
+        desired = marker.value(updated)
+        existing = _text(current, marker.attribute) or None
+        if desired != existing:
+            changes[marker.attribute] = {'S': desired} if desired else None
+    return changes
+
+
+def initial_markers(item: Dict[str, Any]) -> Dict[str, Any]:
+    """Marker attributes for a brand-new item (PutItem)"""
+    return {attr: value for attr, value in marker_changes({}, item).items() if value}
+
+
+def marker_updates(items: Iterable[Dict[str, Any]],
+                   stats: Dict[str, int] = None) -> Iterator[Tuple[str, Dict[str, Any]]]:
+    """`(url, attributes)` updates that bring every item's markers up to date"""
+    stats = stats if stats is not None else defaultdict(int)
+    for item in items:
+        stats['scanned'] += 1
+        changes = marker_changes(item)
+        for marker in MARKERS.values():
+            if marker.value(item):
+                stats[marker.name] += 1
+        if changes:
+            stats['queued'] += 1
+            yield item['url']['S'], changes
+        else:
+            stats['current'] += 1
+
+
+def marker_index_definitions(client, table_name: str) -> List[Dict[str, Any]]:
+    """UpdateTable arguments for every marker GSI that does not exist yet"""
+    definitions = []
+    for marker in MARKERS.values():
+        definition = index_definition(client, table_name, marker.index, marker.attribute)
+        if definition:
+            definitions.append(definition)
+    return definitions
+
+
+def marker_ready(client, table_name: str, name: str) -> bool:
+    """Whether a marker's GSI exists and has finished backfilling"""
+    try:
+        status = index_status(client, table_name, MARKERS[name].index)
+    except Exception:
+        return False
+    return status['status'] == 'ACTIVE' and not status['backfilling']
+
+
+def iter_marked(client, table_name: str, name: str, scope: str = None,
+                projection: List[str] = None, filters: Dict[str, str] = None) -> Iterator[Dict[str, Any]]:
+    """
+    Items carrying a marker, read from its sparse GSI
+
+    `scope` (a source or category, per the marker) queries one hash key;
+    otherwise the whole sparse index is scanned. `filters` adds equality
+    conditions on other attributes (e.g. {'status': 'active'}).
+    """
+    marker = MARKERS[name]
+    kwargs: Dict[str, Any] = {'TableName': table_name, 'IndexName': marker.index}
+    names, values = {}, {}
+    if projection:
+        names.update({f'#p{i}': field for i, field in enumerate(projection)})
+        kwargs['ProjectionExpression'] = ', '.join(f'#p{i}' for i in range(len(projection)))
+    if filters:
+        conditions = []
+        for i, (field, value) in enumerate(sorted(filters.items())):
+            names[f'#f{i}'] = field
+            values[f':f{i}'] = {'S': value}
+            conditions.append(f'#f{i} = :f{i}')
+        kwargs['FilterExpression'] = ' AND '.join(conditions)
+
+    if scope:
+        names['#marker'] = marker.attribute
+        values[':scope'] = {'S': scope}
+        kwargs['KeyConditionExpression'] = '#marker = :scope'
+        method = client.query
+    else:
+        method = client.scan
+
+    if names:
+        kwargs['ExpressionAttributeNames'] = names
+    if values:
+        kwargs['ExpressionAttributeValues'] = values
+    return iter_items(method, **kwargs)
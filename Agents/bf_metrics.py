@@ -0,0 +1,304 @@
+#!/usr/bin/env python3
+"""
+bf-db client instrumentation
+Per-command/per-operation call counts, latency percentiles and consumed capacity
+"""
+
+import json
+import math
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from bf_cache import cache_path
+from bf_dynamo import MethodPaginator, error_code, response_bytes
+
+# Operations that accept ReturnConsumedCapacity, and which side they consume
+READ_OPERATIONS = {'get_item', 'batch_get_item', 'query', 'scan', 'transact_get_items'}
+WRITE_OPERATIONS = {'put_item', 'update_item', 'delete_item', 'batch_write_item', 'transact_write_items'}
+
+THROTTLE_CODES = {'ProvisionedThroughputExceededException', 'ThrottlingException', 'RequestLimitExceeded'}
+
+
+def default_history_path() -> str:
+    """Per-command usage summaries of past runs (one JSON object per line)"""
+    return cache_path('metrics', 'history.jsonl')
+
+
+class LatencyHistogram:
+    """Log-bucketed latencies: fixed memory, about 4% percentile error, mergeable"""
+
+    MIN_MS = 0.01
+    LOG_RATIO = math.log(1.08)
+
+    def __init__(self):
+        self.buckets: Dict[int, int] = defaultdict(int)
+        self.count = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+
+    def add(self, ms: float) -> None:
+        self.buckets[int(math.log(max(ms, self.MIN_MS) / self.MIN_MS) / self.LOG_RATIO)] += 1
+        self.count += 1
+        self.total_ms += ms
+        self.max_ms = max(self.max_ms, ms)
+
+    def merge(self, other: 'LatencyHistogram') -> None:
+        for bucket, count in other.buckets.items():
+            self.buckets[bucket] += count
+        self.count += other.count
+        self.total_ms += other.total_ms
+        self.max_ms = max(self.max_ms, other.max_ms)
+
+    def percentile(self, p: float) -> float:
+        """Latency at percentile `p` (0-100), from the bucket's geometric midpoint"""
+        if not self.count:
+            return 0.0
+        rank = math.ceil(p / 100 * self.count)
+        seen = 0
+        for bucket in sorted(self.buckets):
+            seen += self.buckets[bucket]
+            if seen >= rank:
+                return min(self.max_ms, self.MIN_MS * math.exp((bucket + 0.5) * self.LOG_RATIO))
+        return self.max_ms
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {'buckets': {str(b): c for b, c in sorted(self.buckets.items())}, 'count': self.count,
+                'total_ms': round(self.total_ms, 3), 'max_ms': round(self.max_ms, 3)}
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> 'LatencyHistogram':
+        histogram = cls()
+        histogram.buckets.update({int(b): c for b, c in data.get('buckets', {}).items()})
+        histogram.count = data.get('count', 0)
+        histogram.total_ms = data.get('total_ms', 0.0)
+        histogram.max_ms = data.get('max_ms', 0.0)
+        return histogram
+
+
+class OperationStats:
+    """Counters of one (command, operation, index)"""
+
+    __slots__ = ('calls', 'errors', 'throttles', 'retries', 'items', 'scanned', 'bytes',
+                 'read_units', 'write_units', 'latency', 'error_codes')
+
+    def __init__(self):
+        self.calls = self.errors = self.throttles = self.retries = 0
+        self.items = self.scanned = self.bytes = 0
+        self.read_units = self.write_units = 0.0
+        self.latency = LatencyHistogram()
+        self.error_codes: Dict[str, int] = defaultdict(int)
+
+    def merge(self, other: 'OperationStats') -> None:
+        for field in ('calls', 'errors', 'throttles', 'retries', 'items', 'scanned', 'bytes',
+                      'read_units', 'write_units'):
+            setattr(self, field, getattr(self, field) + getattr(other, field))
+        self.latency.merge(other.latency)
+        for code, count in other.error_codes.items():
+            self.error_codes[code] += count
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            'calls': self.calls,
+            'errors': self.errors,
+            'throttles': self.throttles,
+            'retries': self.retries,
+            'items': self.items,
+            'scanned': self.scanned,
+            'bytes': self.bytes,
+            'read_units': round(self.read_units, 1),
+            'write_units': round(self.write_units, 1),
+            'p50_ms': round(self.latency.percentile(50), 2),
+            'p95_ms': round(self.latency.percentile(95), 2),
+            'p99_ms': round(self.latency.percentile(99), 2),
+            'max_ms': round(self.latency.max_ms, 2),
+            'latency': self.latency.to_dict(),
+            'error_codes': dict(self.error_codes)
+        }
+
+
+def _capacity_units(consumed: Any) -> float:
+    """CapacityUnits of a ConsumedCapacity value (a dict, or a list for batch calls)"""
+    if not consumed:
+        return 0.0
+    if isinstance(consumed, list):
+        return sum(_capacity_units(entry) for entry in consumed)
+    return float(consumed.get('CapacityUnits', 0.0))
+
+
+class InstrumentedClient:
+    """
+    Low-level DynamoDB client wrapper that accounts every call
+
+    Counts calls, errors, throttles, botocore retries, items, scanned items,
+    bytes returned and consumed capacity per (command, operation, index),
+    with a latency histogram each; ReturnConsumedCapacity is requested on
+    every call that supports it. `command` labels the calls that follow
+    (see `command_scope`). With a `trace_path`, every call is also written
+    as a JSON line. Anything else is passed through to the wrapped client.
+    """
+
+    def __init__(self, client, command: str = '-', trace_path: str = None):
+        self.client = client
+        self.command = command
+        self.stats: Dict[Tuple[str, str, str], OperationStats] = defaultdict(OperationStats)
+        self._lock = threading.Lock()
+        self._trace = open(trace_path, 'a') if trace_path else None
+        self.started = time.time()
+
+    def __getattr__(self, operation: str):
+        attribute = getattr(self.client, operation)
+        if operation.startswith('_') or not callable(attribute) or operation == 'get_paginator':
+            return attribute
+        return lambda **request: self._call(operation, attribute, request)
+
+    def get_paginator(self, operation: str) -> MethodPaginator:
+        return MethodPaginator(getattr(self, operation))
+
+    @contextmanager
+    def command_scope(self, command: str) -> Iterator['InstrumentedClient']:
+        """Label calls made inside the block with `command`"""
+        previous, self.command = self.command, command
+        try:
+            yield self
+        finally:
+            self.command = previous
+
+    def _call(self, operation: str, method, request: Dict[str, Any]) -> Any:
+        if operation in READ_OPERATIONS or operation in WRITE_OPERATIONS:
+            request.setdefault('ReturnConsumedCapacity', 'TOTAL')
+        start = time.perf_counter()
+        response, error = None, None
+        try:
+            response = method(**request)
+            return response
+        except Exception as e:
+            error = e
+            raise
+        finally:
+            self._record(operation, request, response, error, (time.perf_counter() - start) * 1000)
+
+    def _record(self, operation: str, request: Dict[str, Any], response: Optional[Dict[str, Any]],
+                error: Optional[Exception], ms: float) -> None:
+        items, scanned, size, units, retries = 0, 0, 0, 0.0, 0
+        if response is not None:
+            if operation == 'batch_get_item':
+                found = [item for batch in response.get('Responses', {}).values() for item in batch]
+            else:
+                found = response.get('Items') or ([response['Item']] if 'Item' in response else [])
+            items = response.get('Count', len(found))
+            scanned = response.get('ScannedCount', items)
+            size = response_bytes(response, found)
+            units = _capacity_units(response.get('ConsumedCapacity'))
+            retries = response.get('ResponseMetadata', {}).get('RetryAttempts', 0)
+        code = error_code(error) if error is not None else ''
+
+        key = (self.command, operation, request.get('IndexName', ''))
+        with self._lock:
+            stats = self.stats[key]
+            stats.calls += 1
+            stats.latency.add(ms)
+            stats.items += items
+            stats.scanned += scanned
+            stats.bytes += size
+            stats.retries += retries
+            if operation in WRITE_OPERATIONS:
+                stats.write_units += units
+            else:
+                stats.read_units += units
+            if error is not None:
+                stats.errors += 1
+                stats.error_codes[code or type(error).__name__] += 1
+                if code in THROTTLE_CODES:
+                    stats.throttles += 1
+            if self._trace:
+                self._trace.write(json.dumps({
+                    'ts': round(time.time(), 4), 'command': key[0], 'operation': operation, 'index': key[2],
+                    'ms': round(ms, 3), 'items': items, 'scanned': scanned, 'bytes': size,
+                    'units': units, 'retries': retries, 'error': code or (type(error).__name__ if error else None)
+                }) + '\n')
+
+    # ----- reporting -----
+
+    def totals(self, command: str = None, by: str = 'operation') -> Dict[str, OperationStats]:
+        """Stats merged per operation ('operation') or per index ('index'), optionally for one command"""
+        merged: Dict[str, OperationStats] = defaultdict(OperationStats)
+        with self._lock:
+            for (cmd, operation, index), stats in self.stats.items():
+                if command is None or cmd == command:
+                    merged[operation if by == 'operation' else f"{operation}:{index or '(table)'}"].merge(stats)
+        return dict(merged)
+
+    def summary(self, command: str = None) -> Dict[str, Any]:
+        """JSON-able usage of one command (or everything so far)"""
+        operations = self.totals(command)
+        total = OperationStats()
+        for stats in operations.values():
+            total.merge(stats)
+        return {
+            'command': command or 'all',
+            'recordedAt': datetime.now().isoformat(),
+            'elapsed_seconds': round(time.time() - self.started, 3),
+            'operations': {name: stats.to_dict() for name, stats in sorted(operations.items())},
+            'indexes': {name: stats.to_dict() for name, stats in sorted(self.totals(command, by='index').items())},
+            'total': total.to_dict()
+        }
+
+    def print_summary(self, command: str = None) -> Optional[Dict[str, Any]]:
+        """Print the per-operation usage table of a command; returns its summary (None without calls)"""
+        summary = self.summary(command)
+        if not summary['operations']:
+            return None
+        print(f"\n📈 DYNAMODB USAGE{': ' + command if command else ''}")
+        print("=" * 60)
+        print(f"   {'Operation':<22} {'Calls':>7} {'p50ms':>7} {'p95ms':>7} {'p99ms':>7} {'Retry':>5} "
+              f"{'Thrtl':>5} {'Err':>4} {'Items':>9} {'MB':>7} {'RCU':>9} {'WCU':>8}")
+        rows = list(summary['operations'].items()) + [('total', summary['total'])]
+        for name, row in rows:
+            print(f"   {name:<22} {row['calls']:>7,} {row['p50_ms']:>7.1f} {row['p95_ms']:>7.1f} {row['p99_ms']:>7.1f} "
+                  f"{row['retries']:>5,} {row['throttles']:>5,} {row['errors']:>4,} {row['items']:>9,} "
+                  f"{row['bytes'] / 1024 ** 2:>7.1f} {row['read_units']:>9,.1f} {row['write_units']:>8,.1f}")
+        return summary
+
+    def save_history(self, command: str, path: str = None, **context) -> None:
+        """Append a command's summary to the usage history (for estimates and comparisons)"""
+        summary = self.summary(command)
+        if not summary['operations']:
+            return
+        summary.update(context)
+        with open(path or default_history_path(), 'a') as f:
+            f.write(json.dumps(summary) + '\n')
+        if self._trace:
+            self._trace.write(json.dumps({'summary': summary}) + '\n')
+
+    def reset(self) -> None:
+        """Forget the calls recorded so far, so the next command reports alone"""
+        with self._lock:
+            self.stats.clear()
+            self.started = time.time()
+
+    def close(self) -> None:
+        if self._trace:
+            self._trace.close()
+            self._trace = None
+
+
+def load_history(path: str = None, command: str = None) -> List[Dict[str, Any]]:
+    """Past usage summaries, oldest first, optionally of one command"""
+    path = path or default_history_path()
+    history = []
+    try:
+        with open(path) as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    continue
+                if command is None or entry.get('command') == command:
+                    history.append(entry)
+    except FileNotFoundError:
+        pass
+    return history
@@ -0,0 +1,218 @@
+#!/usr/bin/env python3
+"""
+bf-db partition skew
+GSI key-skew analysis, write-sharded category keys and scatter-gather reads
+"""
+
+import math
+import zlib
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from bf_dynamo import call_with_retries, index_definition, item_size
+
+# GSI name -> (partition key attribute, sort key attribute)
+GSI_KEYS = {
+    'category-status-index': ('bfCategory', 'status'),
+    'status-index': ('status', None),
+    'source-status-index': ('source', 'status')
+}
+
+# Write-sharded replacement for category-status-index
+SHARD_ATTRIBUTE = 'bfCategoryShard'
+SHARD_INDEX = 'category-shard-index'
+DEFAULT_SHARDS = 8
+
+# Per-partition ceiling for reads (eventually consistent: 2 x 4 KB per RCU)
+PARTITION_RCU = 3000
+READ_UNIT_BYTES = 4096
+
+
+def shard_for(url: str, shards: int = DEFAULT_SHARDS) -> int:
+    """Stable shard number of an item (the same on every run and machine)"""
+    return zlib.crc32(url.encode('utf-8')) % shards
+
+
+def shard_key(category: str, shard: int) -> str:
+    return f'{category}#{shard}'
+
+
+def gini(values: List[int]) -> float:
+    """Gini coefficient of a distribution (0 = even, towards 1 = one key has everything)"""
+    values = sorted(values)
+    total = sum(values)
+    if not values or not total:
+        return 0.0
+    weighted = sum((i + 1) * v for i, v in enumerate(values))
+    return (2 * weighted) / (len(values) * total) - (len(values) + 1) / len(values)
+
+
+def recommended_shards(items: int, target_items: int = 2000, max_shards: int = 32) -> int:
+    """Shards needed to keep each key under `target_items`, as a power of two"""
+    needed = max(1, math.ceil(items / target_items))
+    return min(max_shards, 1 << (needed - 1).bit_length())
+
+
+def read_ceiling(average_bytes: float) -> int:
+    """Items/s one partition can return to eventually consistent queries"""
+    return int(PARTITION_RCU * 2 * READ_UNIT_BYTES / max(average_bytes, 1.0))
+
+
+class PartitionAnalyzer:
+    """Per-key item counts and bytes for every GSI, accumulated over one scan
+
+    Items without the partition key attribute are not in that (sparse)
+    index. All items of one (partition key, sort key) pair share a single
+    partition however large they grow, so those pairs are the unit of skew.
+    """
+
+    def __init__(self, indexes: Dict[str, Tuple[str, Optional[str]]] = None):
+        self.indexes = indexes or GSI_KEYS
+        self.counts: Dict[str, Dict[Tuple, int]] = {name: defaultdict(int) for name in self.indexes}
+        self.bytes: Dict[str, Dict[Tuple, int]] = {name: defaultdict(int) for name in self.indexes}
+        self.items = 0
+        self.total_bytes = 0
+
+    def add(self, item: Dict[str, Any]) -> None:
+        """Account one DynamoDB-JSON item"""
+        size = item_size(item)
+        self.items += 1
+        self.total_bytes += size
+        for name, (partition, sort) in self.indexes.items():
+            value = item.get(partition, {}).get('S')
+            if not value:
+                continue
+            key = (value, item.get(sort, {}).get('S', '')) if sort else (value,)
+            self.counts[name][key] += 1
+            self.bytes[name][key] += size
+
+    def add_all(self, items: Iterable[Dict[str, Any]]) -> 'PartitionAnalyzer':
+        for item in items:
+            self.add(item)
+        return self
+
+    def report(self, index: str, top: int = 10, target_items: int = 2000) -> Dict[str, Any]:
+        """Skew summary and the heaviest keys of one index"""
+        counts, sizes = self.counts[index], self.bytes[index]
+        total = sum(counts.values())
+        mean = total / len(counts) if counts else 0.0
+        keys = []
+        for key, count in sorted(counts.items(), key=lambda kv: kv[1], reverse=True)[:top]:
+            average = sizes[key] / count
+            keys.append({
+                'key': '#'.join(key),
+                'items': count,
+                'bytes': sizes[key],
+                'share': round(count / total, 4),
+                'to_mean': round(count / mean, 2) if mean else 0.0,
+                'read_ceiling_items_s': read_ceiling(average),
+                'recommended_shards': recommended_shards(count, target_items)
+            })
+        return {
+            'index': index,
+            'keys': len(counts),
+            'items': total,
+            'bytes': sum(sizes.values()),
+            'max_to_mean': keys[0]['to_mean'] if keys else 0.0,
+            'top_share': keys[0]['share'] if keys else 0.0,
+            'gini': round(gini(list(counts.values())), 3),
+            'top_keys': keys
+        }
+
+
+def shard_updates(items: Iterable[Dict[str, Any]], shards: int = DEFAULT_SHARDS,
+                  stats: Dict[str, int] = None) -> Iterable[Tuple[str, Dict[str, Any]]]:
+    """`(url, attributes)` updates that bring each item's shard key up to date"""
+    stats = stats if stats is not None else defaultdict(int)
+    for item in items:
+        url = item['url']['S']
+        category = item.get('bfCategory', {}).get('S')
+        current = item.get(SHARD_ATTRIBUTE, {}).get('S')
+        stats['scanned'] += 1
+        if not category:
+            if current:
+                stats['cleared'] += 1
+                yield url, {SHARD_ATTRIBUTE: None}
+            continue
+        desired = shard_key(category, shard_for(url, shards))
+        if current == desired:
+            stats['current'] += 1
+        else:
+            stats['queued'] += 1
+            yield url, {SHARD_ATTRIBUTE: {'S': desired}}
+
+
+def shard_index_definition(client, table_name: str) -> Optional[Dict[str, Any]]:
+    """UpdateTable arguments creating the sharded GSI, or None if it exists"""
+    return index_definition(client, table_name, SHARD_INDEX, SHARD_ATTRIBUTE, 'status')
+
+
+class ShardedQuery:
+    """Scatter-gather reads of one category over its `bfCategory#shard` keys
+
+    All shards are queried concurrently; with a `limit`, each round asks
+    every shard that still has items for an equal share of what is missing,
+    so a short shard never stalls the page. Results are merged round-robin
+    across shards, which keeps pages from favouring any one shard.
+    """
+
+    def __init__(self, client, table_name: str, shards: int = DEFAULT_SHARDS, max_workers: int = None):
+        self.dynamodb = client
+        self.table_name = table_name
+        self.shards = shards
+        self.max_workers = max_workers or shards
+
+    def _read(self, category: str, shard: int, status: str, limit: Optional[int],
+              start_key: Optional[Dict[str, Any]], projection: List[str] = None):
+        kwargs = {
+            'TableName': self.table_name,
+            'IndexName': SHARD_INDEX,
+            'KeyConditionExpression': '#shard = :shard AND #status = :status',
+            'ExpressionAttributeNames': {'#shard': SHARD_ATTRIBUTE, '#status': 'status'},
+            'ExpressionAttributeValues': {
+                ':shard': {'S': shard_key(category, shard)},
+                ':status': {'S': status}
+            }
+        }
+        if projection:
+            kwargs['ExpressionAttributeNames'].update({f'#p{i}': f for i, f in enumerate(projection)})
+            kwargs['ProjectionExpression'] = ', '.join(f'#p{i}' for i in range(len(projection)))
+
+        items = []
+        while True:
+            if start_key:
+                kwargs['ExclusiveStartKey'] = start_key
+            if limit is not None:
+                kwargs['Limit'] = limit - len(items)
+            response = call_with_retries(self.dynamodb.query, **kwargs)
+            items.extend(response.get('Items', []))
+            start_key = response.get('LastEvaluatedKey')
+            if not start_key or (limit is not None and len(items) >= limit):
+                return items, start_key
+
+    def query(self, category: str, status: str = 'active', limit: int = None,
+              projection: List[str] = None) -> List[Dict[str, Any]]:
+        """Items of a category from every shard (all of them, or up to `limit`)"""
+        results: List[List[Dict[str, Any]]] = [[] for _ in range(self.shards)]
+        cursors: Dict[int, Optional[Dict[str, Any]]] = {shard: None for shard in range(self.shards)}
+
+        with ThreadPoolExecutor(max_workers=self.max_workers) as pool:
+            while cursors:
+                missing = None if limit is None else limit - sum(len(r) for r in results)
+                if missing is not None and missing <= 0:
+                    break
+                quota = None if missing is None else math.ceil(missing / len(cursors))
+                futures = {shard: pool.submit(self._read, category, shard, status, quota, start, projection)
+                           for shard, start in cursors.items()}
+                cursors = {}
+                for shard, future in futures.items():
+                    items, start_key = future.result()
+                    results[shard].extend(items)
+                    if start_key:
+                        cursors[shard] = start_key
+
+        merged = []
+        for position in range(max((len(r) for r in results), default=0)):
+            merged.extend(r[position] for r in results if position < len(r))
+        return merged[:limit] if limit is not None else merged
@@ -0,0 +1,247 @@
+#!/usr/bin/env python3
+"""
+bf-db plans
+Several commands in one process: one shared read pass, then one coalesced write per changed item
+"""
+
+import argparse
+import json
+import shlex
+import time
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Set, Tuple
+
+from bf_dynamo import (
+    BATCH_WRITE_LIMIT, MethodPaginator, backoff_delay, call_with_retries, chunked, iter_items, url_key
+)
+from bf_estimate import SCOPES
+from bf_progress import finish, progress
+
+# Calls counted as reads the shared pass saved
+READ_OPERATIONS = ('get_item', 'batch_get_item', 'scan', 'query')
+
+# A read a plan shares: (scope, value) for one source/category key, None for the whole table
+Read = Optional[Tuple[str, str]]
+
+
+def load_plan(path: str) -> List[Any]:
+    """Operations of a YAML or JSON plan file (a list, or a mapping with an `operations` list)"""
+    with open(path) as f:
+        text = f.read()
+    if path.endswith(('.yaml', '.yml')):
+        try:
+            import yaml
+        except ImportError:
+            raise RuntimeError('PyYAML is not installed (pip install pyyaml); use a JSON plan instead')
+        plan = yaml.safe_load(text)
+    else:
+        plan = json.loads(text)
+    if isinstance(plan, dict):
+        plan = plan.get('operations')
+    if not isinstance(plan, list) or not plan:
+        raise ValueError(f'{path}: expected a non-empty list of operations')
+    return plan
+
+
+def operation_tokens(operation: Any) -> List[str]:
+    """
+    CLI tokens of one plan operation
+
+    An operation is a command line (`"cleanup-reddit --source reddit-movies"`),
+    a token list, or a mapping `{command: ..., <option>: <value>}` where
+    true flags are passed bare and false/null options are left out.
+    """
+    if isinstance(operation, str):
+        return shlex.split(operation)
+    if isinstance(operation, list):
+        return [str(token) for token in operation]
+    if isinstance(operation, dict) and 'command' in operation:
+        tokens = [str(operation['command'])]
+        for name, value in operation.items():
+            if name == 'command' or value is None or value is False:
+                continue
+            flag = '--' + name.replace('_', '-')
+            if value is True:
+                tokens.append(flag)
+            elif isinstance(value, list):
+                for entry in value:
+                    tokens += [flag, str(entry)]
+            else:
+                tokens += [flag, str(value)]
+        return tokens
+    raise ValueError(f'Bad plan operation {operation!r} (expected a command line, a list or a mapping)')
+
+
+def parse_operations(operations: List[Any], parser: argparse.ArgumentParser,
+                     allowed: Iterable[str]) -> List[argparse.Namespace]:
+    """Parse every operation with the CLI parser; commands outside `allowed` are refused"""
+    allowed = set(allowed)
+    parsed = []
+    for position, operation in enumerate(operations, 1):
+        tokens = operation_tokens(operation)
+        if not tokens or tokens[0] not in allowed:
+            raise ValueError(f"Operation {position} ({' '.join(tokens)!r}) is not a plan command "
+                             f"(allowed: {', '.join(sorted(allowed))})")
+        args = parser.parse_args(tokens)
+        if getattr(args, 'estimate', False):
+            raise ValueError(f'Operation {position}: --estimate is not available inside a plan')
+        parsed.append(args)
+    return parsed
+
+
+def shared_reads(operations: List[argparse.Namespace],
+                 reads: Dict[str, Callable[[argparse.Namespace], List[Read]]]) -> Optional[Set[Tuple[str, str]]]:
+    """
+    The keys the operations read, or None when one of them needs the whole table
+
+    `reads` maps a command to the source/category keys it queries; any
+    other command is assumed to scan. Overlapping keys are read once.
+    """
+    keys: Set[Tuple[str, str]] = set()
+    for args in operations:
+        scoped = reads.get(args.command)
+        wanted = scoped(args) if scoped else None
+        if wanted is None or None in wanted:
+            return None
+        keys.update(wanted)
+    return keys
+
+
+def read_pass(client, table_name: str, keys: Optional[Set[Tuple[str, str]]]) -> Iterator[Dict[str, Any]]:
+    """Stream the items a plan needs: one scan, or one query per source/category key"""
+    if keys is None:
+        streams = [iter_items(client.scan, TableName=table_name)]
+    else:
+        streams = []
+        for scope, value in sorted(keys):
+            attribute, index = SCOPES[scope]
+            streams.append(iter_items(client.query, TableName=table_name, IndexName=index,
+                                      KeyConditionExpression='#key = :key',
+                                      ExpressionAttributeNames={'#key': attribute},
+                                      ExpressionAttributeValues={':key': {'S': value}}))
+    count = 0
+    for stream in streams:
+        for item in stream:
+            count += 1
+            progress('read pass', count)
+            yield item
+    finish()
+
+
+class WriteRecorder:
+    """
+    Client over the plan's replica that remembers every item a write touches
+
+    Reads and writes go to the replica, so each operation sees the writes of
+    the ones before it; the first write to an item also keeps its state
+    before the plan, which `coalesce` diffs against the final state.
+    """
+
+    def __init__(self, replica, table_name: str):
+        self.replica = replica
+        self.table_name = table_name
+        self.before: Dict[str, Optional[Dict[str, Any]]] = {}
+        self.write_calls = 0
+        self.item_writes = 0
+        self.read_calls = 0
+
+    def __getattr__(self, name: str):
+        attribute = getattr(self.replica, name)
+        if name in READ_OPERATIONS:
+            def counted(**request):
+                self.read_calls += 1
+                return attribute(**request)
+            return counted
+        return attribute
+
+    def get_paginator(self, operation: str) -> MethodPaginator:
+        return MethodPaginator(getattr(self, operation))
+
+    def _touch(self, table_name: str, url: str) -> None:
+        if table_name == self.table_name and url not in self.before:
+            self.before[url] = self.replica.get_item(TableName=table_name, Key=url_key(url)).get('Item')
+        self.item_writes += 1
+
+    def put_item(self, **request) -> Dict[str, Any]:
+        self.write_calls += 1
+        self._touch(request['TableName'], request['Item']['url']['S'])
+        return self.replica.put_item(**request)
+
+    def update_item(self, **request) -> Dict[str, Any]:
+        self.write_calls += 1
+        self._touch(request['TableName'], request['Key']['url']['S'])
+        return self.replica.update_item(**request)
+
+    def delete_item(self, **request) -> Dict[str, Any]:
+        self.write_calls += 1
+        self._touch(request['TableName'], request['Key']['url']['S'])
+        return self.replica.delete_item(**request)
+
+    def batch_write_item(self, **request) -> Dict[str, Any]:
+        self.write_calls += 1
+        for table_name, writes in request['RequestItems'].items():
+            for write in writes:
+                if 'PutRequest' in write:
+                    self._touch(table_name, write['PutRequest']['Item']['url']['S'])
+                else:
+                    self._touch(table_name, write['DeleteRequest']['Key']['url']['S'])
+        return self.replica.batch_write_item(**request)
+
+    def transact_write_items(self, **request) -> Dict[str, Any]:
+        self.write_calls += 1
+        for entry in request['TransactItems']:
+            (kind, write), = entry.items()
+            if kind != 'ConditionCheck':
+                self._touch(write['TableName'], (write.get('Item') or write['Key'])['url']['S'])
+        return self.replica.transact_write_items(**request)
+
+
+def coalesce(recorder: WriteRecorder) -> Dict[str, Any]:
+    """
+    One write per touched item: the net change between its state before and after the plan
+
+    Changed and added attributes are SET and dropped ones REMOVEd in a single
+    UpdateItem; new items become puts, removed items deletes, and items the
+    plan left as they were are not written at all.
+    """
+    updates: List[Tuple[str, Dict[str, Any]]] = []
+    puts: List[Dict[str, Any]] = []
+    deletes: List[str] = []
+    unchanged = 0
+    for url, before in recorder.before.items():
+        after = recorder.replica.get_item(TableName=recorder.table_name, Key=url_key(url)).get('Item')
+        if after is None:
+            if before is None:
+                unchanged += 1
+            else:
+                deletes.append(url)
+        elif before is None:
+            puts.append(after)
+        else:
+            changes = {name: value for name, value in after.items() if before.get(name) != value}
+            changes.update({name: None for name in before if name not in after})
+            if changes:
+                updates.append((url, changes))
+            else:
+                unchanged += 1
+    return {'updates': updates, 'puts': puts, 'deletes': deletes, 'unchanged': unchanged}
+
+
+def batch_delete(client, table_name: str, urls: Iterable[str], max_retries: int = 8) -> int:
+    """Delete items with BatchWriteItem, retrying unprocessed keys with backoff"""
+    deleted = 0
+    for batch in chunked(urls, BATCH_WRITE_LIMIT):
+        request = {table_name: [{'DeleteRequest': {'Key': url_key(url)}} for url in batch]}
+        attempt = 0
+        while request:
+            response = call_with_retries(client.batch_write_item, RequestItems=request, max_retries=max_retries)
+            request = response.get('UnprocessedItems') or {}
+            if request:
+                if attempt >= max_retries:
+                    raise RuntimeError(f'{len(request[table_name])} deletes still unprocessed after '
+                                       f'{max_retries} retries')
+                time.sleep(backoff_delay(attempt))
+                attempt += 1
+        deleted += len(batch)
+        progress('delete', deleted)
+    finish()
+    return deleted
@@ -0,0 +1,332 @@
+#!/usr/bin/env python3
+"""
+bf-db profiling
+Named timing spans, cProfile, tracemalloc and a sampling profiler around one command
+"""
+
+import contextlib
+import cProfile
+import os
+import pstats
+import sys
+import threading
+import time
+import tracemalloc
+from collections import Counter, defaultdict
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from bf_dynamo import MethodPaginator
+from bf_metrics import READ_OPERATIONS, WRITE_OPERATIONS
+
+# Span covering a whole command; its self time is everything outside other spans
+ROOT_SPAN = 'transform'
+
+_NULL_SPAN = contextlib.nullcontext()
+
+
+class SpanRecorder:
+    """
+    Named, nestable timing spans
+
+    Every span records its count, total time and self time (total minus
+    nested spans) per name. Each thread has its own stack, so spans in
+    worker threads add thread time: concurrent spans can sum to more than
+    the wall time. The innermost open span of each thread is visible to the
+    sampling profiler.
+    """
+
+    def __init__(self):
+        self.totals: Dict[str, List[float]] = defaultdict(lambda: [0, 0.0, 0.0])
+        self.stacks: Dict[int, List[List[Any]]] = {}
+        self._lock = threading.Lock()
+
+    @contextlib.contextmanager
+    def span(self, name: str) -> Iterator[None]:
+        stack = self.stacks.setdefault(threading.get_ident(), [])
+        entry = [name, 0.0]
+        stack.append(entry)
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - start
+            stack.pop()
+            if stack:
+                stack[-1][1] += elapsed
+            with self._lock:
+                totals = self.totals[name]
+                totals[0] += 1
+                totals[1] += elapsed
+                totals[2] += elapsed - entry[1]
+
+    def current(self, thread_id: int) -> Optional[str]:
+        """Innermost open span of a thread"""
+        stack = self.stacks.get(thread_id)
+        return stack[-1][0] if stack else None
+
+    def report(self) -> Dict[str, Dict[str, float]]:
+        with self._lock:
+            return {name: {'count': int(count), 'total_seconds': round(total, 4), 'self_seconds': round(own, 4)}
+                    for name, (count, total, own) in self.totals.items()}
+
+
+_recorder: Optional[SpanRecorder] = None
+
+
+def span(name: str):
+    """Time the enclosed block under `name` while a profile session runs (free otherwise)"""
+    return _recorder.span(name) if _recorder is not None else _NULL_SPAN
+
+
+class SpannedClient:
+    """
+    DynamoDB client wrapper timing every call as a 'read' or 'write' span
+
+    Calls go through the `read`/`write`/`call` methods, so cProfile's
+    cumulative time of those three is the time each stage spent in DynamoDB.
+    """
+
+    def __init__(self, client):
+        self.client = client
+
+    def __getattr__(self, operation: str):
+        attribute = getattr(self.client, operation)
+        if operation.startswith('_') or not callable(attribute) or operation == 'get_paginator':
+            return attribute
+        stage = self.read if operation in READ_OPERATIONS else self.write if operation in WRITE_OPERATIONS else self.call
+        return lambda **request: stage(attribute, request)
+
+    def get_paginator(self, operation: str) -> MethodPaginator:
+        return MethodPaginator(getattr(self, operation))
+
+    def read(self, method, request: Dict[str, Any]) -> Any:
+        with span('read'):
+            return method(**request)
+
+    def write(self, method, request: Dict[str, Any]) -> Any:
+        with span('write'):
+            return method(**request)
+
+    def call(self, method, request: Dict[str, Any]) -> Any:
+        with span('dynamodb'):
+            return method(**request)
+
+
+def _frame_key(frame) -> Tuple[str, int, str]:
+    code = frame.f_code
+    return os.path.basename(code.co_filename), code.co_firstlineno, code.co_name
+
+
+class StackSampler:
+    """
+    Statistical profiler: samples one thread's stack every `interval_ms`
+
+    Counts, per function, samples where it was running (self) and on the
+    stack at all (inclusive), the span open at each sample, and whole stacks
+    (for folded flame-graph output). Costs one short wake-up per interval.
+    """
+
+    def __init__(self, interval_ms: float = 5.0, thread_id: int = None, recorder: SpanRecorder = None):
+        self.interval = max(interval_ms, 0.5) / 1000
+        self.thread_id = thread_id or threading.get_ident()
+        self.recorder = recorder
+        self.samples = 0
+        self.self_counts: Counter = Counter()
+        self.inclusive_counts: Counter = Counter()
+        self.span_counts: Counter = Counter()
+        self.stacks: Counter = Counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name='bf-sampler', daemon=True)
+
+    def start(self) -> None:
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is None:
+                continue
+            stack = []
+            while frame is not None:
+                stack.append(_frame_key(frame))
+                frame = frame.f_back
+            self.samples += 1
+            self.self_counts[stack[0]] += 1
+            self.inclusive_counts.update(set(stack))
+            self.stacks[tuple(reversed(stack))] += 1
+            if self.recorder is not None:
+                self.span_counts[self.recorder.current(self.thread_id) or '(none)'] += 1
+
+    def write_folded(self, path: str) -> None:
+        """Stacks in the folded format flame-graph tools read (`a;b;c count`)"""
+        with open(path, 'w') as f:
+            for stack, count in self.stacks.most_common():
+                f.write(';'.join(f'{name} ({filename}:{line})' for filename, line, name in stack) + f' {count}\n')
+
+
+class PeakSnapshots:
+    """
+    Keeps the tracemalloc snapshot taken nearest the peak
+
+    Objects built by a command are mostly freed when it returns, so a final
+    snapshot shows little; this polls traced memory every `interval_ms` and
+    re-snapshots whenever it grows `growth` past the last snapshot.
+    """
+
+    def __init__(self, interval_ms: float = 50.0, growth: float = 1.1):
+        self.interval = interval_ms / 1000
+        self.growth = growth
+        self.snapshot: Optional[tracemalloc.Snapshot] = None
+        self.snapshot_bytes = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name='bf-memory', daemon=True)
+
+    def start(self) -> None:
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        self._thread.join()
+        self.take()
+
+    def take(self) -> None:
+        current = tracemalloc.get_traced_memory()[0]
+        if self.snapshot is None or current > self.snapshot_bytes:
+            self.snapshot, self.snapshot_bytes = tracemalloc.take_snapshot(), current
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            if tracemalloc.get_traced_memory()[0] > max(self.snapshot_bytes, 1) * self.growth:
+                self.take()
+
+
+class ProfileSession:
+    """
+    Profiling around one command: spans always, plus any of cProfile
+    (`profile`), tracemalloc (`trace_memory`) and the sampler (`sample_ms`)
+
+    Disabled (no-op) unless at least one of the three is requested.
+    """
+
+    def __init__(self, profile: bool = False, profile_output: str = None, trace_memory: bool = False,
+                 sample_ms: float = None, sample_output: str = None, top: int = 25):
+        self.profile = profile
+        self.profile_output = profile_output
+        self.trace_memory = trace_memory
+        self.sample_ms = sample_ms
+        self.sample_output = sample_output
+        self.top = top
+        self.enabled = bool(profile or trace_memory or sample_ms)
+        self.recorder = SpanRecorder()
+        self.profiler: Optional[cProfile.Profile] = None
+        self.sampler: Optional[StackSampler] = None
+        self.snapshots: Optional[PeakSnapshots] = None
+        self.memory: Optional[Tuple[tracemalloc.Snapshot, int, int, int]] = None
+        self.wall_seconds = 0.0
+        self._root = None
+        self._start = 0.0
+
+    def __enter__(self) -> 'ProfileSession':
+        global _recorder
+        if not self.enabled:
+            return self
+        _recorder = self.recorder
+        if self.trace_memory:
+            tracemalloc.start()
+            self.snapshots = PeakSnapshots()
+            self.snapshots.start()
+        if self.sample_ms:
+            self.sampler = StackSampler(self.sample_ms, recorder=self.recorder)
+            self.sampler.start()
+        self._root = self.recorder.span(ROOT_SPAN)
+        self._root.__enter__()
+        self._start = time.perf_counter()
+        if self.profile:
+            self.profiler = cProfile.Profile()
+            self.profiler.enable()
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        global _recorder
+        if not self.enabled:
+            return
+        if self.profiler:
+            self.profiler.disable()
+        self.wall_seconds = time.perf_counter() - self._start
+        self._root.__exit__(None, None, None)
+        if self.sampler:
+            self.sampler.stop()
+        if self.snapshots:
+            self.snapshots.stop()
+            current, peak = tracemalloc.get_traced_memory()
+            self.memory = (self.snapshots.snapshot, self.snapshots.snapshot_bytes, current, peak)
+            tracemalloc.stop()
+        _recorder = None
+
+    def report(self) -> Optional[Dict[str, Any]]:
+        """Print every enabled report; returns the spans, memory and sampler summaries"""
+        if not self.enabled:
+            return None
+        result: Dict[str, Any] = {'wall_seconds': round(self.wall_seconds, 3), 'spans': self.recorder.report()}
+
+        print(f"\n⏱️  SPANS ({self.wall_seconds:.2f}s wall; worker-thread spans add thread time)")
+        print("=" * 60)
+        print(f"   {'Span':<16} {'Count':>9} {'Total s':>9} {'Self s':>9} {'Self %':>7}")
+        for name, row in sorted(result['spans'].items(), key=lambda entry: -entry[1]['self_seconds']):
+            share = row['self_seconds'] / self.wall_seconds * 100 if self.wall_seconds else 0.0
+            print(f"   {name:<16} {row['count']:>9,} {row['total_seconds']:>9.2f} {row['self_seconds']:>9.2f} "
+                  f"{share:>6.1f}%")
+
+        if self.profiler:
+            print(f"\n🔬 CPROFILE: top {self.top} by cumulative time")
+            print("=" * 60)
+            stats = pstats.Stats(self.profiler, stream=sys.stdout).strip_dirs()
+            stats.sort_stats('cumulative').print_stats(self.top)
+            print(f"🔥 CPROFILE: top {self.top} by own time")
+            print("=" * 60)
+            stats.sort_stats('tottime').print_stats(self.top)
+            if self.profile_output:
+                self.profiler.dump_stats(self.profile_output)
+                print(f"💾 pstats written to {self.profile_output} (python -m pstats {self.profile_output})")
+
+        if self.memory:
+            snapshot, snapshot_bytes, current, peak = self.memory
+            statistics = snapshot.filter_traces([
+                tracemalloc.Filter(False, tracemalloc.__file__),
+                tracemalloc.Filter(False, '<frozen importlib._bootstrap>')
+            ]).statistics('lineno')
+            print(f"\n🧠 MEMORY: peak {peak / 1024 ** 2:,.1f} MB traced, {current / 1024 ** 2:,.1f} MB still held")
+            print("=" * 60)
+            print(f"   Top allocations at {snapshot_bytes / 1024 ** 2:,.1f} MB (snapshot nearest the peak):")
+            top = []
+            for stat in statistics[:self.top]:
+                frame = stat.traceback[0]
+                where = f'{os.path.basename(frame.filename)}:{frame.lineno}'
+                top.append({'where': where, 'mb': round(stat.size / 1024 ** 2, 2), 'blocks': stat.count})
+                print(f"   {where:<40} {stat.size / 1024 ** 2:>9,.2f} MB {stat.count:>10,} blocks")
+            result['memory'] = {'peak_mb': round(peak / 1024 ** 2, 2), 'held_mb': round(current / 1024 ** 2, 2),
+                                'top': top}
+
+        if self.sampler:
+            sampler = self.sampler
+            print(f"\n📍 SAMPLES: {sampler.samples:,} every {self.sample_ms:g}ms")
+            print("=" * 60)
+            if sampler.samples:
+                print(f"   {'Span':<16} {'Samples':>9} {'Share':>7}")
+                for name, count in sampler.span_counts.most_common():
+                    print(f"   {name:<16} {count:>9,} {count / sampler.samples * 100:>6.1f}%")
+                print(f"\n   {'Function':<52} {'Self':>7} {'Incl.':>7}")
+                for key, count in sampler.self_counts.most_common(self.top):
+                    filename, line, name = key
+                    print(f"   {(name + ' (' + filename + ':' + str(line) + ')')[:52]:<52} "
+                          f"{count / sampler.samples * 100:>6.1f}% "
+                          f"{sampler.inclusive_counts[key] / sampler.samples * 100:>6.1f}%")
+            if self.sample_output:
+                sampler.write_folded(self.sample_output)
+                print(f"💾 Folded stacks written to {self.sample_output}")
+            result['samples'] = {'count': sampler.samples, 'spans': dict(sampler.span_counts)}
+        return result
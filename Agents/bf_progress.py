@@ -0,0 +1,261 @@
+#!/usr/bin/env python3
+"""
+bf-db progress
+Rate-limited progress line, JSON-lines events and machine-readable command results
+"""
+
+import contextlib
+import json
+import os
+import sys
+import threading
+import time
+from datetime import date, datetime
+from decimal import Decimal
+from typing import Any, Dict, Iterator, Optional
+
+# Output modes of the CLI; 'silent' (no output at all) is for commands run internally
+MODES = ('normal', 'quiet', 'json')
+
+# Redraws of the progress line per second (terminal), and seconds between
+# plain progress lines when stderr is not a terminal
+REDRAW_INTERVAL = 0.1
+LOG_INTERVAL = 10.0
+
+# Seconds between progress events in the events file / --json output
+EVENT_INTERVAL = 1.0
+
+BAR_WIDTH = 24
+
+
+def _jsonable(value: Any) -> Any:
+    if isinstance(value, (set, frozenset, tuple)):
+        return list(value)
+    if isinstance(value, Decimal):
+        return float(value)
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    return str(value)
+
+
+def _format_count(value: Any) -> str:
+    return f'{value:,}' if isinstance(value, int) else str(value)
+
+
+class _ClearingStream:
+    """stdout wrapper that clears the progress line before text is written over it"""
+
+    def __init__(self, stream, reporter: 'ProgressReporter'):
+        self.stream = stream
+        self.reporter = reporter
+
+    def write(self, text: str) -> int:
+        self.reporter.clear()
+        return self.stream.write(text)
+
+    def __getattr__(self, name: str):
+        return getattr(self.stream, name)
+
+
+class _Task:
+    __slots__ = ('name', 'start', 'drawn', 'logged', 'evented', 'done', 'total', 'counts')
+
+    def __init__(self, name: str):
+        self.name = name
+        self.start = self.logged = time.monotonic()
+        self.drawn = self.evented = 0.0
+        self.done, self.total, self.counts = 0, None, {}
+
+
+class ProgressReporter:
+    """
+    Progress and events of one command
+
+    Modes: 'normal' keeps the human output and draws a single progress line
+    on stderr; 'quiet' hides the human output (notes go to stderr) and keeps
+    the progress line; 'json' hides it and writes events, notes and the
+    command result as JSON lines on stdout; 'silent' shows nothing. With
+    `events_path`, every event is also appended to that file in any mode.
+    Per-item events are only written to the file; progress events are
+    rate limited.
+    """
+
+    def __init__(self, mode: str = 'normal', events_path: str = None, command: str = None):
+        if mode not in MODES + ('silent',):
+            raise ValueError(f'unknown output mode {mode!r} (expected one of {", ".join(MODES)})')
+        self.mode = mode
+        self.command = command
+        self.stdout = sys.stdout
+        self.stderr = sys.stderr
+        self.tty = mode != 'silent' and self.stderr.isatty()
+        self._events = open(events_path, 'a') if events_path else None
+        self._task: Optional[_Task] = None
+        self._line = 0
+        self._lock = threading.RLock()
+
+    # ----- output -----
+
+    @contextlib.contextmanager
+    def output(self) -> Iterator['ProgressReporter']:
+        """Route the command's printed output for this mode (hidden unless 'normal')"""
+        with contextlib.ExitStack() as stack:
+            if self.mode == 'normal':
+                target = _ClearingStream(sys.stdout, self)
+            else:
+                target = stack.enter_context(open(os.devnull, 'w'))
+            stack.enter_context(contextlib.redirect_stdout(target))
+            stack.callback(self.finish)
+            yield self
+
+    def _write_event(self, record: Dict[str, Any], echo: bool) -> None:
+        line = json.dumps(record, default=_jsonable)
+        if self._events:
+            self._events.write(line + '\n')
+            self._events.flush()
+        if echo and self.mode == 'json':
+            self.stdout.write(line + '\n')
+            self.stdout.flush()
+
+    def event(self, kind: str, echo: bool = False, **fields) -> None:
+        """Record an event; `echo` also writes it to stdout in 'json' mode"""
+        if not self._events and not (echo and self.mode == 'json'):
+            return
+        record = {'ts': round(time.time(), 3), 'event': kind, 'command': self.command, **fields}
+        with self._lock:
+            self._write_event(record, echo)
+
+    def note(self, message: str, kind: str = 'warning', **fields) -> None:
+        """A line worth reading (errors, warnings): printed, or written as an event in 'json' mode"""
+        with self._lock:
+            if self.mode == 'normal':
+                self.clear()
+                print(message)
+            elif self.mode == 'quiet':
+                self.clear()
+                self.stderr.write(message + '\n')
+            self.event(kind, echo=True, message=message.strip(), **fields)
+
+    def result(self, command: str, value: Any) -> None:
+        """The summary a command returned, as one machine-readable event"""
+        self.event('result', echo=True, result=value if value is not None else {}, **(
+            {'command': command} if command != self.command else {}))
+
+    # ----- progress -----
+
+    def progress(self, task: str, done: int, total: int = None, **counts) -> None:
+        """Report `done` of `total` units of `task`; cheap enough to call per item"""
+        now = time.monotonic()
+        with self._lock:
+            current = self._task
+            if current is None or current.name != task:
+                self.finish()
+                current = self._task = _Task(task)
+            current.done, current.total, current.counts = done, total, counts
+            if now - current.drawn >= REDRAW_INTERVAL:
+                current.drawn = now
+                self._draw(current, now)
+            if now - current.evented >= EVENT_INTERVAL:
+                current.evented = now
+                self.event('progress', echo=True, task=task, done=done, total=total, **counts)
+
+    def finish(self) -> None:
+        """End the current task: erase its line and record its final counts"""
+        with self._lock:
+            current, self._task = self._task, None
+            if current is None:
+                return
+            self.clear()
+            self.event('progress', echo=True, task=current.name, done=current.done, total=current.total,
+                       seconds=round(time.monotonic() - current.start, 3), **current.counts)
+
+    def clear(self) -> None:
+        """Erase the progress line so ordinary output starts on a clean line"""
+        if self._line:
+            self.stderr.write('\r' + ' ' * self._line + '\r')
+            self.stderr.flush()
+            self._line = 0
+
+    def _render(self, task: _Task, now: float) -> str:
+        elapsed = now - task.start
+        rate = task.done / elapsed if elapsed >= 0.5 else 0.0
+        parts = [f'⏳ {task.name}']
+        if task.total:
+            share = min(task.done / task.total, 1.0)
+            filled = int(share * BAR_WIDTH)
+            parts.append('[' + '#' * filled + '-' * (BAR_WIDTH - filled) + ']')
+            parts.append(f'{task.done:,}/{task.total:,} {share * 100:3.0f}%')
+        else:
+            parts.append(f'{task.done:,}')
+        if rate:
+            parts.append(f'{rate:,.0f}/s')
+        if task.total and rate and task.done < task.total:
+            parts.append(f'eta {(task.total - task.done) / rate:,.0f}s')
+        parts.extend(f'{name}={_format_count(value)}' for name, value in task.counts.items())
+        return '   ' + '  '.join(parts)
+
+    def _draw(self, task: _Task, now: float) -> None:
+        if self.mode in ('json', 'silent'):
+            return
+        if self.tty:
+            text = self._render(task, now)
+            self.stderr.write('\r' + text + ' ' * max(self._line - len(text), 0))
+            self.stderr.flush()
+            self._line = len(text)
+        elif self.mode == 'normal' and now - task.logged >= LOG_INTERVAL:
+            task.logged = now
+            self.stderr.write(self._render(task, now) + '\n')
+            self.stderr.flush()
+
+    def close(self) -> None:
+        self.finish()
+        if self._events:
+            self._events.close()
+            self._events = None
+
+
+# Reporter of the running command; a plain 'normal' one until main() configures it
+_reporter = ProgressReporter()
+
+
+def configure(mode: str = 'normal', events_path: str = None, command: str = None) -> ProgressReporter:
+    """Replace the module reporter (main() does this once per command)"""
+    global _reporter
+    _reporter.close()
+    _reporter = ProgressReporter(mode, events_path=events_path, command=command)
+    return _reporter
+
+
+def reporter() -> ProgressReporter:
+    return _reporter
+
+
+@contextlib.contextmanager
+def silenced() -> Iterator[None]:
+    """Run a command internally (benchmarks, estimates): no printed output, progress or events"""
+    global _reporter
+    previous, _reporter = _reporter, ProgressReporter('silent')
+    try:
+        with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+            yield
+    finally:
+        _reporter = previous
+
+
+def progress(task: str, done: int, total: int = None, **counts) -> None:
+    _reporter.progress(task, done, total, **counts)
+
+
+def finish() -> None:
+    _reporter.finish()
+
+
+def event(kind: str, **fields) -> None:
+    _reporter.event(kind, **fields)
+
+
+def note(message: str, kind: str = 'warning', **fields) -> None:
+    _reporter.note(message, kind, **fields)
+
+
+def result(command: str, value: Any) -> None:
+    _reporter.result(command, value)
@@ -0,0 +1,140 @@
+#!/usr/bin/env python3
+"""
+bf-db quality ranking
+Sortable `qualityScore#dateAdded` key, its category GSI and top-N reads
+"""
+
+from collections import defaultdict
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from bf_dynamo import call_with_retries, index_definition
+from bf_sampler import DEFAULT_QUALITY
+
+# bfCategory (HASH) + qualitySort (RANGE), read in descending order. Only
+# active items carry qualitySort, so the index holds nothing a top-N read
+# would have to filter out.
+QUALITY_ATTRIBUTE = 'qualitySort'
+QUALITY_INDEX = 'category-quality-index'
+
+# Attributes the sort key is derived from
+SOURCE_FIELDS = ['url', 'bfCategory', 'status', 'qualityScore', 'dateAdded', QUALITY_ATTRIBUTE]
+
+
+def quality_sort_key(item: Dict[str, Any]) -> Optional[str]:
+    """`NNN#dateAdded` for a DynamoDB-JSON item, or None unless it is active and categorized
+
+    The score is clamped to 0-100 and zero-padded so string order is score
+    order; dateAdded (ISO 8601) breaks ties in favour of newer items.
+    """
+    if not item.get('bfCategory', {}).get('S') or item.get('status', {}).get('S') != 'active':
+        return None
+    raw = item.get('qualityScore', {}).get('N')
+    try:
+        score = DEFAULT_QUALITY if raw is None else round(float(raw))
+    except ValueError:
+        score = DEFAULT_QUALITY
+    score = min(100, max(0, score))
+    return f"{score:03d}#{item.get('dateAdded', {}).get('S', '')}"
+
+
+def quality_sort_attributes(item: Dict[str, Any]) -> Dict[str, Any]:
+    """`{qualitySort: ...}` to write alongside a changed score (empty unless ranked)"""
+    key = quality_sort_key(item)
+    return {QUALITY_ATTRIBUTE: {'S': key}} if key else {}
+
+
+def quality_updates(items: Iterable[Dict[str, Any]],
+                    stats: Dict[str, int] = None) -> Iterable[Tuple[str, Dict[str, Any]]]:
+    """`(url, attributes)` updates that bring each item's sort key up to date"""
+    stats = stats if stats is not None else defaultdict(int)
+    for item in items:
+        stats['scanned'] += 1
+        desired = quality_sort_key(item)
+        current = item.get(QUALITY_ATTRIBUTE, {}).get('S')
+        if desired == current:
+            stats['current' if desired else 'uncategorized'] += 1
+        elif desired is None:
+            stats['cleared'] += 1
+            yield item['url']['S'], {QUALITY_ATTRIBUTE: None}
+        else:
+            stats['queued'] += 1
+            yield item['url']['S'], {QUALITY_ATTRIBUTE: {'S': desired}}
+
+
+def quality_index_definition(client, table_name: str) -> Optional[Dict[str, Any]]:
+    """UpdateTable arguments creating the quality GSI, or None if it exists"""
+    return index_definition(client, table_name, QUALITY_INDEX, 'bfCategory', QUALITY_ATTRIBUTE)
+
+
+def validate_coverage(items: Iterable[Dict[str, Any]], samples: int = 5) -> Dict[str, Any]:
+    """
+    Check that every active categorized item carries a current sort key
+
+    Returns per-category counts of items that are covered, missing the key
+    (invisible to the index) or stale (ranked by an outdated score), items
+    that should not be ranked but are (orphaned, e.g. deactivated), plus a
+    few example urls of each problem.
+    """
+    categories: Dict[str, Dict[str, int]] = defaultdict(lambda: defaultdict(int))
+    examples: Dict[str, List[str]] = defaultdict(list)
+    for item in items:
+        desired = quality_sort_key(item)
+        current = item.get(QUALITY_ATTRIBUTE, {}).get('S')
+        if desired is None:
+            outcome = 'orphaned' if current else None
+            category = '(none)'
+        else:
+            outcome = 'covered' if current == desired else 'missing' if not current else 'stale'
+            category = item['bfCategory']['S']
+        if outcome is None:
+            continue
+        categories[category][outcome] += 1
+        if outcome != 'covered' and len(examples[outcome]) < samples:
+            examples[outcome].append(item['url']['S'])
+
+    totals = defaultdict(int)
+    for counts in categories.values():
+        for outcome, count in counts.items():
+            totals[outcome] += count
+    categorized = totals['covered'] + totals['missing'] + totals['stale']
+    return {
+        'categories': {name: dict(counts) for name, counts in categories.items()},
+        'covered': totals['covered'],
+        'missing': totals['missing'],
+        'stale': totals['stale'],
+        'orphaned': totals['orphaned'],
+        'coverage_percentage': round(totals['covered'] / categorized * 100, 2) if categorized else 100.0,
+        'examples': dict(examples)
+    }
+
+
+def top_n(client, table_name: str, category: str, n: int = 20,
+          projection: List[str] = None) -> List[Dict[str, Any]]:
+    """
+    The `n` best active items of a category, best first, from category-quality-index
+
+    Reads the index backwards with `Limit=n`. The index is sparse (active
+    items only), so nothing is filtered after the read and one page normally
+    answers; a further page is fetched only past the 1 MB response cap.
+    """
+    kwargs = {
+        'TableName': table_name,
+        'IndexName': QUALITY_INDEX,
+        'KeyConditionExpression': '#category = :category',
+        'ExpressionAttributeNames': {'#category': 'bfCategory'},
+        'ExpressionAttributeValues': {':category': {'S': category}},
+        'ScanIndexForward': False,
+        'Limit': n
+    }
+    if projection:
+        kwargs['ExpressionAttributeNames'].update({f'#p{i}': f for i, f in enumerate(projection)})
+        kwargs['ProjectionExpression'] = ', '.join(f'#p{i}' for i in range(len(projection)))
+
+    items = []
+    while len(items) < n:
+        response = call_with_retries(client.query, **kwargs)
+        items.extend(response.get('Items', []))
+        if 'LastEvaluatedKey' not in response:
+            break
+        kwargs['ExclusiveStartKey'] = response['LastEvaluatedKey']
+    return items[:n]
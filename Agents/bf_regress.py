@@ -0,0 +1,278 @@
+#!/usr/bin/env python3
+"""
+bf-db hot-path benchmarks
+Timed scan, scoring, matching, write, feed and search paths against a stored baseline
+"""
+
+import json
+import os
+import platform
+import random
+import statistics
+import subprocess
+import tempfile
+import time
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from bf_bulk import BulkUpdater
+from bf_cache import cache_path
+from bf_corpus import parallel_load
+from bf_dynamo import iter_items, plain_item
+from bf_feed import SNAPSHOT_FIELDS, FeedService, FeedSnapshot
+from bf_local import TABLE_NAME, LocalDynamoDB, seed_table, webpages_definition
+from bf_progress import silenced
+from bf_search import SearchIndex
+
+# Bumped when benchmarks change meaning; results of another schema are not compared
+BASELINE_SCHEMA = 1
+
+# Versioned with the code, so a change and its new baseline land together
+DEFAULT_BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'benchmarks', 'hot_paths.json')
+
+DEFAULT_ITEMS = 20000
+DEFAULT_REPEATS = 5
+
+# Slowdown (share of the baseline time per unit) that warns / fails
+WARN_THRESHOLD = 0.10
+FAIL_THRESHOLD = 0.25
+
+BULK_WRITES = 5000
+FEED_PAGES = 5000
+SEARCH_QUERIES = ['film noir review', 'quantum physics', 'history of design', 'chess puzzle', 'jazz album live',
+                  'climate research', 'open source security', 'classic novel author', 'space rocket', 'museum art']
+
+
+class HotPathFixture:
+    """Shared inputs: a seeded stand-in table, its raw and plain items, an agent, a feed snapshot"""
+
+    def __init__(self, make_agent: Callable[[Any], Any], items: int, seed: int, workdir: str):
+        self.items = items
+        self.seed = seed
+        self.workdir = workdir
+        self.client = LocalDynamoDB()
+        seed_table(self.client, items, seed=seed)
+        self.agent = make_agent(self.client)
+        self.raw = list(iter_items(self.client.scan, TableName=TABLE_NAME))
+        self.plain = [plain_item(item) for item in self.raw]
+        active = [item for item in self.plain if item.get('status') == 'active' and item.get('bfCategory')]
+        self.snapshot = FeedSnapshot([{field: item[field] for field in SNAPSHOT_FIELDS if field in item}
+                                      for item in active])
+        self.categories = self.snapshot.categories()
+        self.search_path = os.path.join(workdir, 'search')
+        SearchIndex.build(self.plain, path=self.search_path)
+
+
+def _scan(fixture: HotPathFixture) -> int:
+    return sum(1 for _ in iter_items(fixture.client.scan, TableName=TABLE_NAME))
+
+
+def _quality_score(fixture: HotPathFixture) -> int:
+    score = fixture.agent._calculate_quality_score
+    for item in fixture.raw:
+        score(item)
+    return len(fixture.raw)
+
+
+def _keyword_match(fixture: HotPathFixture) -> int:
+    agent = fixture.agent
+    for item in fixture.raw:
+        title = item.get('title', {}).get('S', '')
+        source = item['source']['S']
+        agent._generate_tags(title, source)
+        agent._evaluate_reddit_content(source, item)
+        agent._score_mobile_compatibility(item['url']['S'], title)
+    return len(fixture.raw)
+
+
+def _bulk_update(fixture: HotPathFixture) -> int:
+    updates = [(item['url']['S'], {'benchmarkRun': {'N': str(position)}})
+               for position, item in enumerate(fixture.raw[:BULK_WRITES])]
+    BulkUpdater(fixture.client, TABLE_NAME).update_items(updates)
+    return len(updates)
+
+
+def _batch_write(fixture: HotPathFixture) -> int:
+    client = LocalDynamoDB()
+    client.create_table(**webpages_definition(TABLE_NAME))
+    return parallel_load(client, TABLE_NAME, fixture.raw[:BULK_WRITES], max_workers=4)['items']
+
+
+def _feed_sampler(fixture: HotPathFixture) -> int:
+    service = FeedService(fixture.snapshot, seed=fixture.seed)
+    categories = fixture.categories
+    for page in range(FEED_PAGES):
+        # Half anonymous (weighted) pages, half sessions paging without repeats
+        session = f's{page % 50}' if page % 2 else None
+        service.page(categories[page % len(categories)], limit=20, session=session)
+    return FEED_PAGES
+
+
+def _search_build(fixture: HotPathFixture) -> int:
+    SearchIndex.build(fixture.plain, path=os.path.join(fixture.workdir, 'search-build'))
+    return len(fixture.plain)
+
+
+def _search_query(fixture: HotPathFixture) -> int:
+    index = SearchIndex(fixture.search_path)
+    queries = 0
+    for _ in range(20):
+        for query in SEARCH_QUERIES:
+            index.search(query, limit=20)
+            queries += 1
+    index.close()
+    return queries
+
+
+# Name -> (callable(fixture) returning units done, unit name)
+BENCHMARKS: Dict[str, Tuple[Callable[[HotPathFixture], int], str]] = {
+    'scan': (_scan, 'item'),
+    'quality-score': (_quality_score, 'item'),
+    'keyword-match': (_keyword_match, 'item'),
+    'bulk-update': (_bulk_update, 'write'),
+    'batch-write': (_batch_write, 'item'),
+    'feed-sampler': (_feed_sampler, 'page'),
+    'search-build': (_search_build, 'item'),
+    'search-query': (_search_query, 'query'),
+}
+
+
+def _commit() -> Optional[str]:
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__)), timeout=5).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+def environment() -> Dict[str, Any]:
+    """Where a run happened; comparisons across machines are flagged"""
+    return {
+        'python': platform.python_version(),
+        'machine': platform.machine(),
+        'processor': platform.processor() or platform.machine(),
+        'cpus': os.cpu_count(),
+        'system': platform.system()
+    }
+
+
+def run_hot_paths(make_agent: Callable[[Any], Any], items: int = DEFAULT_ITEMS, repeats: int = DEFAULT_REPEATS,
+                  names: List[str] = None, seed: int = 0,
+                  on_result: Optional[Callable[[str, Dict[str, Any]], None]] = None) -> Dict[str, Any]:
+    """
+    Time each benchmark `repeats` times (after one warm-up) on a seeded fixture
+
+    The compared metric is the median time per unit (item, write, page,
+    query) in microseconds; medians keep one noisy repeat from flagging a
+    regression.
+    """
+    names = names or list(BENCHMARKS)
+    unknown = [name for name in names if name not in BENCHMARKS]
+    if unknown:
+        raise ValueError(f"Unknown benchmarks: {', '.join(unknown)} (known: {', '.join(BENCHMARKS)})")
+
+    results = {}
+    with tempfile.TemporaryDirectory() as workdir:
+        with silenced():
+            fixture = HotPathFixture(make_agent, items, seed, workdir)
+        for name in names:
+            run, unit = BENCHMARKS[name]
+            timings = []
+            with silenced():
+                random.seed(seed)
+                units = run(fixture)
+                for _ in range(repeats):
+                    start = time.perf_counter()
+                    units = run(fixture)
+                    timings.append(time.perf_counter() - start)
+            median = statistics.median(timings)
+            results[name] = {
+                'unit': unit,
+                'units': units,
+                'median_seconds': round(median, 5),
+                'min_seconds': round(min(timings), 5),
+                'spread': round((max(timings) - min(timings)) / median, 3) if median else 0.0,
+                'us_per_unit': round(median / max(units, 1) * 1e6, 3),
+                'per_second': round(units / median) if median else 0
+            }
+            if on_result:
+                on_result(name, results[name])
+
+    return {
+        'schema': BASELINE_SCHEMA,
+        'recordedAt': datetime.now().isoformat(),
+        'commit': _commit(),
+        'environment': environment(),
+        'items': items,
+        'repeats': repeats,
+        'seed': seed,
+        'benchmarks': results
+    }
+
+
+def default_results_dir() -> str:
+    return os.path.dirname(cache_path('hot_paths', 'x'))
+
+
+def save_run(result: Dict[str, Any], path: str = None) -> str:
+    """Write a run (default: a timestamped file in the cache); returns the path"""
+    path = path or os.path.join(default_results_dir(), f"hot-paths-{datetime.now():%Y%m%d-%H%M%S}.json")
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    with open(path, 'w') as f:
+        json.dump(result, f, indent=2)
+        f.write('\n')
+    return path
+
+
+def load_run(path: str) -> Dict[str, Any]:
+    """A saved run or baseline; 'last' is the newest run in the cache"""
+    if path == 'last':
+        directory = default_results_dir()
+        runs = sorted(name for name in os.listdir(directory) if name.startswith('hot-paths-'))
+        if not runs:
+            raise FileNotFoundError(f'No saved hot-path runs in {directory}')
+        path = os.path.join(directory, runs[-1])
+    with open(path) as f:
+        return json.load(f)
+
+
+def compare_runs(current: Dict[str, Any], baseline: Dict[str, Any], warn: float = WARN_THRESHOLD,
+                 fail: float = FAIL_THRESHOLD) -> Dict[str, Any]:
+    """
+    Per-benchmark change of the time per unit, with a status
+
+    'regressed' is slower than `fail`, 'slower' than `warn`, 'faster' is
+    quicker by more than `warn`; 'new'/'missing' benchmarks exist on one
+    side only. `notes` explain why the runs may not be comparable.
+    """
+    notes = []
+    if current.get('schema') != baseline.get('schema'):
+        notes.append(f"schema {baseline.get('schema')} vs {current.get('schema')}: benchmarks changed meaning")
+    if current.get('items') != baseline.get('items'):
+        notes.append(f"table size {baseline.get('items'):,} vs {current.get('items'):,}")
+    if current.get('environment') != baseline.get('environment'):
+        notes.append('recorded on a different machine or Python; expect noise')
+
+    rows = []
+    ours, theirs = current.get('benchmarks', {}), baseline.get('benchmarks', {})
+    for name in list(theirs) + [name for name in ours if name not in theirs]:
+        before, after = theirs.get(name), ours.get(name)
+        row = {'benchmark': name, 'baseline_us': before and before['us_per_unit'],
+               'current_us': after and after['us_per_unit'], 'change': None}
+        if before is None:
+            row['status'] = 'new'
+        elif after is None:
+            row['status'] = 'missing'
+        else:
+            change = (after['us_per_unit'] - before['us_per_unit']) / before['us_per_unit'] \
+                if before['us_per_unit'] else 0.0
+            row['change'] = round(change, 4)
+            row['status'] = ('regressed' if change > fail else 'slower' if change > warn
+                             else 'faster' if change < -warn else 'ok')
+        rows.append(row)
+    return {
+        'rows': rows,
+        'notes': notes,
+        'regressions': [row['benchmark'] for row in rows if row['status'] == 'regressed'],
+        'warnings': [row['benchmark'] for row in rows if row['status'] == 'slower']
+    }
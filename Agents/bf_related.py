@@ -0,0 +1,277 @@
+#!/usr/bin/env python3
+"""
+bf-db related items
+TF-IDF nearest neighbours per category, stored as an mmap neighbour table
+"""
+
+import heapq
+import math
+import mmap
+import os
+import struct
+import time
+import zlib
+from array import array
+from collections import Counter, defaultdict
+from operator import itemgetter
+from typing import Any, Dict, Iterable, List, Tuple
+
+from bf_cache import cache_path
+from bf_search import tokenize
+
+MAGIC = b'BFRL'
+VERSION = 1
+
+# magic, version, k, item count, hash slot count, then 5 section offsets
+HEADER = struct.Struct('<4sIIII5Q')
+
+# Fields that describe what an item is about, and their term-frequency weights
+RELATED_FIELDS = {
+    'title': 3,
+    'tags': 2,
+    'bfTags': 2,
+    'bfSubcategory': 2,
+    'aiSummary': 1
+}
+
+# Fields read from the table for a build
+ITEM_FIELDS = ['url', 'bfCategory'] + list(RELATED_FIELDS)
+
+NO_NEIGHBOR = 0xFFFFFFFF
+
+
+def default_related_path() -> str:
+    """Default location of the related-items file"""
+    return cache_path('related.bin')
+
+
+def related_terms(item: Dict[str, Any]) -> Counter:
+    """Field-weighted term frequencies for one plain item"""
+    terms = Counter()
+    for field, weight in RELATED_FIELDS.items():
+        value = item.get(field)
+        if not value:
+            continue
+        text = ' '.join(value) if isinstance(value, list) else str(value).replace('-', ' ')
+        for token in tokenize(text):
+            terms[token] += weight
+    return terms
+
+
+def url_slot(url: bytes, slot_count: int) -> int:
+    return zlib.crc32(url) & (slot_count - 1)
+
+
+class CategoryMatrix:
+    """L2-normalised TF-IDF rows of one category as parallel sparse arrays
+
+    Row i holds terms[starts[i]:starts[i + 1]] (sorted by term id) with the
+    matching weights. `postings` is the transposed matrix, each column
+    ordered by weight and cut to the `max_postings` strongest entries.
+    """
+
+    def __init__(self, rows: List[Tuple[array, array]], max_terms: int = 64,
+                 max_postings: int = 500, max_df: float = 0.5):
+        self.size = len(rows)
+        df = Counter()
+        for term_ids, _ in rows:
+            df.update(term_ids)
+        idf = {term: math.log((1 + self.size) / (1 + count)) + 1.0 for term, count in df.items()}
+
+        self.starts = array('I', [0])
+        self.terms = array('I')
+        self.weights = array('f')
+        for term_ids, counts in rows:
+            vector = [(term, (1.0 + math.log(count)) * idf[term]) for term, count in zip(term_ids, counts)]
+            norm = math.sqrt(sum(w * w for _, w in vector)) or 1.0
+            if len(vector) > max_terms:
+                vector = heapq.nlargest(max_terms, vector, key=itemgetter(1))
+            vector.sort()
+            self.terms.extend(term for term, _ in vector)
+            self.weights.extend(w / norm for _, w in vector)
+            self.starts.append(len(self.terms))
+
+        # Terms shared by nobody else link nothing; very common ones link everything
+        max_count = max(2, int(max_df * self.size)) if self.size >= 20 else self.size
+        columns: Dict[int, List[Tuple[float, int]]] = defaultdict(list)
+        for row in range(self.size):
+            for i in range(self.starts[row], self.starts[row + 1]):
+                term = self.terms[i]
+                if 2 <= df[term] <= max_count:
+                    columns[term].append((self.weights[i], row))
+        self.postings: Dict[int, List[Tuple[int, float]]] = {}
+        for term, column in columns.items():
+            strongest = heapq.nlargest(max_postings, column) if len(column) > max_postings else column
+            self.postings[term] = [(row, weight) for weight, row in strongest]
+
+    def row(self, i: int) -> Dict[int, float]:
+        start, end = self.starts[i], self.starts[i + 1]
+        return dict(zip(self.terms[start:end], self.weights[start:end]))
+
+    def dot(self, vector: Dict[int, float], j: int) -> float:
+        get = vector.get
+        start, end = self.starts[j], self.starts[j + 1]
+        return sum(w * get(t, 0.0) for t, w in zip(self.terms[start:end], self.weights[start:end]))
+
+    def neighbors(self, k: int = 10, block_size: int = 256, query_terms: int = 12,
+                  rescore: int = 3) -> Iterable[Tuple[int, List[Tuple[int, float]]]]:
+        """
+        Top-k cosine neighbours of every row, one block of rows at a time
+
+        Each block is multiplied against the postings term-at-a-time (every
+        posting list is read once per block), using the `query_terms`
+        strongest terms of each row; the best `rescore * k` candidates are
+        then scored exactly. Memory is bounded by the block's accumulators.
+        """
+        for block_start in range(0, self.size, block_size):
+            block = range(block_start, min(block_start + block_size, self.size))
+            vectors = {row: self.row(row) for row in block}
+
+            by_term: Dict[int, List[Tuple[int, float]]] = defaultdict(list)
+            for row, vector in vectors.items():
+                strongest = heapq.nlargest(query_terms, ((w, t) for t, w in vector.items() if t in self.postings))
+                for weight, term in strongest:
+                    by_term[term].append((row, weight))
+
+            scores: Dict[int, Dict[int, float]] = {row: defaultdict(float) for row in block}
+            for term, entries in by_term.items():
+                column = self.postings[term]
+                for row, query_weight in entries:
+                    accumulator = scores[row]
+                    for other, weight in column:
+                        accumulator[other] += query_weight * weight
+
+            for row in block:
+                accumulator = scores.pop(row)
+                accumulator.pop(row, None)
+                candidates = heapq.nlargest(rescore * k, accumulator.items(), key=itemgetter(1))
+                vector = vectors[row]
+                exact = [(other, self.dot(vector, other)) for other, _ in candidates]
+                yield row, heapq.nlargest(k, exact, key=itemgetter(1))
+
+
+def build_related(items: Iterable[Dict[str, Any]], path: str = None, k: int = 10,
+                  block_size: int = 256, max_postings: int = 500) -> Dict[str, Any]:
+    """
+    Build the related-items file from plain items
+
+    Items are only compared within their bfCategory. Each category's rows
+    are held as compact term-id/count arrays until its matrix is built, so
+    memory grows with the number of terms rather than with Python objects.
+    """
+    path = path or default_related_path()
+    start_time = time.time()
+
+    vocabulary: Dict[str, int] = {}
+    urls: List[str] = []
+    categories: Dict[str, List[int]] = defaultdict(list)
+    rows: List[Tuple[array, array]] = []
+    for item in items:
+        terms = related_terms(item)
+        ids = sorted((vocabulary.setdefault(term, len(vocabulary)), count) for term, count in terms.items())
+        categories[item.get('bfCategory') or ''].append(len(urls))
+        urls.append(item['url'])
+        rows.append((array('I', (t for t, _ in ids)), array('I', (c for _, c in ids))))
+
+    neighbor_ids = array('I', [NO_NEIGHBOR]) * (len(urls) * k)
+    neighbor_scores = array('f', [0.0]) * (len(urls) * k)
+    linked = 0
+    for members in categories.values():
+        matrix = CategoryMatrix([rows[i] for i in members], max_postings=max_postings)
+        for row, neighbors in matrix.neighbors(k=k, block_size=block_size):
+            base = members[row] * k
+            for slot, (other, score) in enumerate(n for n in neighbors if n[1] > 0):
+                neighbor_ids[base + slot] = members[other]
+                neighbor_scores[base + slot] = score
+                linked += 1
+        for i in members:
+            rows[i] = None
+
+    # Open-addressing url -> id table, at most half full
+    slot_count = 1 << max(1, (2 * len(urls) - 1).bit_length())
+    slots = array('I', [0]) * slot_count
+    url_offsets, url_blob = array('I', [0]), bytearray()
+    for i, url in enumerate(urls):
+        encoded = url.encode('utf-8')
+        url_blob += encoded
+        url_offsets.append(len(url_blob))
+        slot = url_slot(encoded, slot_count)
+        while slots[slot]:
+            slot = (slot + 1) & (slot_count - 1)
+        slots[slot] = i + 1
+
+    sections = [url_offsets.tobytes(), bytes(url_blob), slots.tobytes(),
+                neighbor_ids.tobytes(), neighbor_scores.tobytes()]
+    offsets, position = [], HEADER.size
+    for section in sections:
+        offsets.append(position)
+        position += len(section)
+
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'wb') as f:
+        f.write(HEADER.pack(MAGIC, VERSION, k, len(urls), slot_count, *offsets))
+        for section in sections:
+            f.write(section)
+    os.replace(tmp_path, path)
+
+    return {
+        'path': path,
+        'items': len(urls),
+        'categories': len(categories),
+        'terms': len(vocabulary),
+        'neighbors': linked,
+        'bytes': os.path.getsize(path),
+        'elapsed_seconds': round(time.time() - start_time, 2)
+    }
+
+
+class RelatedIndex:
+    """Read-only view of a related-items file; a lookup is one hash probe"""
+
+    def __init__(self, path: str = None):
+        self.path = path or default_related_path()
+        self._file = open(self.path, 'rb')
+        self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+
+        magic, version, self.k, self.count, self.slot_count, *offsets = HEADER.unpack_from(self._map, 0)
+        if magic != MAGIC or version != VERSION:
+            self.close()
+            raise ValueError(f'{self.path} is not a version {VERSION} related-items index')
+        (self._url_offsets, self._url_blob, self._slots,
+         self._neighbor_ids, self._neighbor_scores) = offsets
+
+    def _u32(self, base: int, i: int) -> int:
+        return struct.unpack_from('<I', self._map, base + i * 4)[0]
+
+    def _url(self, i: int) -> bytes:
+        start, end = self._u32(self._url_offsets, i), self._u32(self._url_offsets, i + 1)
+        return self._map[self._url_blob + start:self._url_blob + end]
+
+    def _find(self, url: str) -> int:
+        """Item id of a url, or -1"""
+        key = url.encode('utf-8')
+        slot = url_slot(key, self.slot_count)
+        while True:
+            entry = self._u32(self._slots, slot)
+            if not entry:
+                return -1
+            if self._url(entry - 1) == key:
+                return entry - 1
+            slot = (slot + 1) & (self.slot_count - 1)
+
+    def __contains__(self, url: str) -> bool:
+        return self._find(url) >= 0
+
+    def related(self, url: str, limit: int = 10) -> List[Dict[str, Any]]:
+        """Most similar items of the same category, best first"""
+        i = self._find(url)
+        if i < 0:
+            return []
+        ids = struct.unpack_from(f'<{self.k}I', self._map, self._neighbor_ids + i * self.k * 4)
+        scores = struct.unpack_from(f'<{self.k}f', self._map, self._neighbor_scores + i * self.k * 4)
+        return [{'url': self._url(j).decode('utf-8'), 'score': round(score, 4)}
+                for j, score in zip(ids[:limit], scores) if j != NO_NEIGHBOR]
+
+    def close(self):
+        self._map.close()
+        self._file.close()
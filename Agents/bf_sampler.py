@@ -0,0 +1,245 @@
+#!/usr/bin/env python3
+"""
+bf-db weighted sampling
+Walker/Vose alias tables for O(1) quality-weighted draws per category
+"""
+
+import random
+from array import array
+from collections import defaultdict
+from typing import Any, Callable, Dict, Iterable, List, Optional, Set, Tuple
+
+# Items without a score get the base score of _calculate_quality_score
+DEFAULT_QUALITY = 50
+
+
+def quality_weight(item: Dict[str, Any]) -> float:
+    """Selection weight of an item: its qualityScore, floored at 1"""
+    score = item.get('qualityScore')
+    return max(float(DEFAULT_QUALITY if score is None else score), 1.0)
+
+
+class AliasTable:
+    """Vose's alias method: O(n) build, O(1) draw proportional to weight"""
+
+    __slots__ = ('size', 'total', 'prob', 'alias')
+
+    def __init__(self, weights: Iterable[float]):
+        weights = list(weights)
+        self.size = len(weights)
+        self.total = float(sum(weights))
+        self.prob = array('d', [1.0] * self.size)
+        self.alias = array('I', range(self.size))
+        if not self.size or self.total <= 0:
+            return
+
+        scaled = [w * self.size / self.total for w in weights]
+        small = [i for i, p in enumerate(scaled) if p < 1.0]
+        large = [i for i, p in enumerate(scaled) if p >= 1.0]
+        while small and large:
+            s, g = small.pop(), large.pop()
+            self.prob[s] = scaled[s]
+            self.alias[s] = g
+            scaled[g] -= 1.0 - scaled[s]
+            (small if scaled[g] < 1.0 else large).append(g)
+        # Leftovers are 1.0 up to floating point error
+        for i in small + large:
+            self.prob[i] = 1.0
+
+    def draw(self, rng: random.Random) -> int:
+        column = int(rng.random() * self.size)
+        return column if rng.random() < self.prob[column] else self.alias[column]
+
+
+class WeightedPool:
+    """Alias-sampled positions whose weights can change without a full rebuild
+
+    Draws come from the alias table of the last rebuild, accepted with
+    probability min(old, new) / old, mixed with a small alias table holding
+    the weight that was added since (new items and raised scores). The
+    result is exactly proportional to the current weights; the base table is
+    rebuilt once the changed mass exceeds `rebuild_ratio` of the total.
+    """
+
+    def __init__(self, weights: Iterable[float] = (), rebuild_ratio: float = 0.25):
+        self.rebuild_ratio = rebuild_ratio
+        self.weights = array('d', weights)
+        self._rebuild()
+
+    def _rebuild(self):
+        self._base_weights = array('d', self.weights)
+        self._base = AliasTable(self._base_weights)
+        self._extra: Dict[int, float] = {}
+        self._extra_table: Optional[AliasTable] = None
+        self._extra_positions: List[int] = []
+        self._changed_mass = 0.0
+        self.active = sum(1 for w in self.weights if w > 0)
+
+    def __len__(self) -> int:
+        return len(self.weights)
+
+    @property
+    def total(self) -> float:
+        return self._base.total + sum(self._extra.values())
+
+    def update(self, position: int, weight: float) -> None:
+        """Set the weight of a position; `position == len(pool)` appends"""
+        weight = max(0.0, float(weight))
+        if position == len(self.weights):
+            self.weights.append(0.0)
+        old = self.weights[position]
+        self.weights[position] = weight
+        self.active += (weight > 0) - (old > 0)
+
+        base = self._base_weights[position] if position < len(self._base_weights) else 0.0
+        extra = max(0.0, weight - base)
+        if extra:
+            self._extra[position] = extra
+        else:
+            self._extra.pop(position, None)
+        self._extra_table = None
+        self._changed_mass += abs(weight - old)
+
+        if self._changed_mass > self.rebuild_ratio * max(self._base.total, 1.0):
+            self._rebuild()
+
+    def draw(self, rng: random.Random) -> int:
+        """One position, drawn proportionally to its current weight"""
+        if not self.active:
+            raise ValueError('cannot draw from a pool without positive weights')
+        if self._extra and self._extra_table is None:
+            self._extra_positions = list(self._extra)
+            self._extra_table = AliasTable(self._extra.values())
+
+        extra_total = self._extra_table.total if self._extra else 0.0
+        base_total = self._base.total
+        while True:
+            if extra_total and rng.random() * (base_total + extra_total) >= base_total:
+                return self._extra_positions[self._extra_table.draw(rng)]
+            position = self._base.draw(rng)
+            base = self._base_weights[position]
+            current = self.weights[position]
+            if current >= base or rng.random() * base < current:
+                return position
+
+
+class SessionSampler:
+    """Weighted draws without replacement from a shared pool
+
+    Already-seen positions are rejected; once rejections dominate (the
+    remaining weight is small), a private alias table over the unseen
+    positions takes over, and is rebuilt the same way as it fills up.
+    After every position has been seen the session starts a fresh pass.
+    """
+
+    __slots__ = ('pool', 'seen', '_table', '_positions', 'max_rejections')
+
+    def __init__(self, pool: WeightedPool, max_rejections: int = 16):
+        self.pool = pool
+        self.seen: Set[int] = set()
+        self._table: Optional[AliasTable] = None
+        self._positions: List[int] = []
+        self.max_rejections = max_rejections
+
+    def _restrict(self):
+        weights = self.pool.weights
+        self._positions = [p for p in range(len(weights)) if weights[p] > 0 and p not in self.seen]
+        self._table = AliasTable(weights[p] for p in self._positions)
+
+    def draw(self, rng: random.Random) -> int:
+        while True:
+            for _ in range(self.max_rejections):
+                if self._table is None:
+                    position = self.pool.draw(rng)
+                else:
+                    position = self._positions[self._table.draw(rng)]
+                if position not in self.seen and self.pool.weights[position] > 0:
+                    self.seen.add(position)
+                    return position
+
+            self._restrict()
+            if not self._positions:
+                # Every position has been seen: start a new pass
+                self.seen.clear()
+                self._table = None
+
+    def sample(self, rng: random.Random, count: int) -> List[int]:
+        """Up to `count` distinct positions (fewer only if the pool is smaller)"""
+        count = min(count, self.pool.active)
+        return [self.draw(rng) for _ in range(count)]
+
+
+class CategorySampler:
+    """Weighted pools per (category, subcategory-or-None) over a list of items"""
+
+    def __init__(self, items: List[Dict[str, Any]],
+                 weight: Callable[[Dict[str, Any]], float] = quality_weight):
+        self.items = items
+        self.weight = weight
+        self.url_to_position: Dict[str, int] = {}
+        # pool key -> item positions, and item position -> its (pool key, slot) pairs
+        self.members: Dict[Tuple[str, Optional[str]], List[int]] = defaultdict(list)
+        self._slots: Dict[int, List[Tuple[Tuple[str, Optional[str]], int]]] = defaultdict(list)
+
+        for position, item in enumerate(items):
+            self._index(position, item)
+        self.pools: Dict[Tuple[str, Optional[str]], WeightedPool] = {
+            key: WeightedPool(self.weight(items[p]) for p in positions)
+            for key, positions in self.members.items()
+        }
+
+    @staticmethod
+    def keys_for(item: Dict[str, Any]) -> List[Tuple[str, Optional[str]]]:
+        keys = [(item['bfCategory'], None)]
+        if item.get('bfSubcategory'):
+            keys.append((item['bfCategory'], item['bfSubcategory']))
+        return keys
+
+    def _index(self, position: int, item: Dict[str, Any]):
+        self.url_to_position[item['url']] = position
+        for key in self.keys_for(item):
+            self._slots[position].append((key, len(self.members[key])))
+            self.members[key].append(position)
+
+    def pool(self, category: str, subcategory: str = None) -> Optional[WeightedPool]:
+        return self.pools.get((category, subcategory or None))
+
+    def session(self, category: str, subcategory: str = None) -> Optional[SessionSampler]:
+        """A no-repeat sampler over one category (or subcategory) pool"""
+        pool = self.pool(category, subcategory)
+        return SessionSampler(pool) if pool else None
+
+    def sample(self, rng: random.Random, category: str, subcategory: str = None,
+               count: int = 20) -> List[Dict[str, Any]]:
+        """`count` distinct items drawn by weight (no session state)"""
+        key = (category, subcategory or None)
+        session = self.session(category, subcategory)
+        if session is None:
+            return []
+        return [self.items[self.members[key][slot]] for slot in session.sample(rng, count)]
+
+    def upsert(self, item: Dict[str, Any]) -> None:
+        """Add an item or re-weight it after its score changed"""
+        position = self.url_to_position.get(item['url'])
+        if position is not None and self.keys_for(self.items[position]) != self.keys_for(item):
+            # Moved to another category: retire the old slots
+            self.remove(item['url'])
+            position = None
+        if position is None:
+            position = len(self.items)
+            self.items.append(item)
+            self._index(position, item)
+        else:
+            self.items[position] = item
+
+        for key, slot in self._slots[position]:
+            pool = self.pools.setdefault(key, WeightedPool())
+            pool.update(slot, self.weight(item))
+
+    def remove(self, url: str) -> None:
+        """Stop drawing an item (its slot keeps a zero weight)"""
+        position = self.url_to_position.get(url)
+        if position is None:
+            return
+        for key, slot in self._slots[position]:
+            self.pools[key].update(slot, 0.0)
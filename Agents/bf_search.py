@@ -0,0 +1,351 @@
+#!/usr/bin/env python3
+"""
+bf-db full-text search index
+On-disk inverted index with BM25 ranking over all active items
+"""
+
+import gzip
+import heapq
+import json
+import math
+import mmap
+import os
+import re
+import shutil
+from array import array
+from collections import Counter, defaultdict
+from typing import Any, Dict, Iterable, List, Set, Tuple
+from urllib.parse import urlparse
+
+from bf_cache import atomic_write_json, cache_path
+from bf_dynamo import iter_plain_items
+
+# Indexed fields and their term-frequency weights (BM25F-style)
+FIELD_WEIGHTS = {
+    'title': 3,
+    'tags': 2,
+    'bfTags': 2,
+    'bfCategory': 2,
+    'bfSubcategory': 2,
+    'aiSummary': 1,
+    'description': 1
+}
+
+# Fields stored per document for result rendering
+DOC_FIELDS = ['url', 'title', 'aiSummary', 'bfCategory', 'bfSubcategory', 'domain',
+              'qualityScore', 'tags', 'thumbnailUrl', 'source']
+
+STOPWORDS = {
+    'a', 'an', 'and', 'are', 'as', 'at', 'be', 'by', 'for', 'from', 'has', 'in',
+    'is', 'it', 'its', 'of', 'on', 'or', 'that', 'the', 'this', 'to', 'was',
+    'were', 'will', 'with'
+}
+
+TOKEN_RE = re.compile(r'[^\W_]+', re.UNICODE)
+
+# BM25 parameters
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+
+def default_index_path() -> str:
+    """Default directory of the search index"""
+    return os.path.dirname(cache_path('search_index', 'meta.json'))
+
+
+def tokenize(text: str) -> List[str]:
+    """Lowercased word tokens without stopwords"""
+    return [t for t in TOKEN_RE.findall(text.lower()) if t not in STOPWORDS]
+
+
+def weighted_terms(item: Dict[str, Any]) -> Counter:
+    """Field-weighted term frequencies for one plain item"""
+    terms = Counter()
+    for field, weight in FIELD_WEIGHTS.items():
+        value = item.get(field)
+        if not value:
+            continue
+        text = ' '.join(value) if isinstance(value, list) else str(value).replace('-', ' ')
+        for token in tokenize(text):
+            terms[token] += weight
+    return terms
+
+
+def search_document(item: Dict[str, Any]) -> Dict[str, Any]:
+    """Compact stored copy of an item for rendering results"""
+    doc = {field: item[field] for field in DOC_FIELDS if item.get(field) not in (None, '', [])}
+    if doc.get('aiSummary'):
+        doc['aiSummary'] = doc['aiSummary'][:300]
+    if not doc.get('domain'):
+        doc['domain'] = urlparse(item['url']).netloc.lower()
+    return doc
+
+
+def stream_active_items(client, table_name: str, query: Dict[str, Any] = None) -> Iterable[Dict[str, Any]]:
+    """Plain active items with every indexed/stored field, via status-index by default"""
+    fields = set(FIELD_WEIGHTS) | set(DOC_FIELDS) | {'status'}
+    return iter_plain_items(client, table_name, fields, query=query)
+
+
+class Segment:
+    """One immutable on-disk index segment
+
+    Layout of a segment directory:
+        meta.json      document count and total weighted length
+        docs.json.gz   stored documents, position = doc id
+        doclens.bin    uint32 weighted length per doc
+        lexicon.json   term -> [byte offset, posting count]
+        postings.bin   per term: uint32 doc ids then uint16 weighted tfs
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        with open(os.path.join(path, 'meta.json')) as f:
+            self.meta = json.load(f)
+        with gzip.open(os.path.join(path, 'docs.json.gz'), 'rt', encoding='utf-8') as f:
+            self.docs: List[Dict[str, Any]] = json.load(f)
+        with open(os.path.join(path, 'lexicon.json')) as f:
+            self.lexicon: Dict[str, List[int]] = json.load(f)
+        self.doclens = array('I')
+        with open(os.path.join(path, 'doclens.bin'), 'rb') as f:
+            self.doclens.frombytes(f.read())
+
+        self._postings_file = open(os.path.join(path, 'postings.bin'), 'rb')
+        size = os.fstat(self._postings_file.fileno()).st_size
+        self._postings = mmap.mmap(self._postings_file.fileno(), 0, access=mmap.ACCESS_READ) if size else b''
+        self.url_to_doc = {doc['url']: i for i, doc in enumerate(self.docs)}
+
+    @property
+    def doc_count(self) -> int:
+        return self.meta['docCount']
+
+    @property
+    def total_length(self) -> int:
+        return self.meta['totalLength']
+
+    def df(self, term: str) -> int:
+        entry = self.lexicon.get(term)
+        return entry[1] if entry else 0
+
+    def postings(self, term: str) -> Tuple[array, array]:
+        """Doc ids and weighted term frequencies for a term"""
+        entry = self.lexicon.get(term)
+        doc_ids, tfs = array('I'), array('H')
+        if entry:
+            offset, count = entry
+            doc_ids.frombytes(self._postings[offset:offset + count * 4])
+            tfs.frombytes(self._postings[offset + count * 4:offset + count * 6])
+        return doc_ids, tfs
+
+    def term_vectors(self) -> List[Counter]:
+        """Invert the postings back into per-document term frequencies"""
+        vectors = [Counter() for _ in self.docs]
+        for term in self.lexicon:
+            doc_ids, tfs = self.postings(term)
+            for doc_id, tf in zip(doc_ids, tfs):
+                vectors[doc_id][term] = tf
+        return vectors
+
+    def close(self):
+        if isinstance(self._postings, mmap.mmap):
+            self._postings.close()
+        self._postings_file.close()
+
+    @staticmethod
+    def write(path: str, entries: Iterable[Tuple[Dict[str, Any], Counter]]) -> Dict[str, Any]:
+        """Write `(stored doc, weighted terms)` entries into a new segment directory"""
+        tmp_path = path + '.tmp'
+        shutil.rmtree(tmp_path, ignore_errors=True)
+        os.makedirs(tmp_path)
+
+        docs = []
+        doclens = array('I')
+        postings: Dict[str, List[Tuple[int, int]]] = defaultdict(list)
+
+        for doc, terms in entries:
+            doc_id = len(docs)
+            docs.append(doc)
+            doclens.append(sum(terms.values()))
+            for term, tf in terms.items():
+                postings[term].append((doc_id, min(tf, 65535)))
+
+        lexicon = {}
+        offset = 0
+        with open(os.path.join(tmp_path, 'postings.bin'), 'wb') as f:
+            for term in sorted(postings):
+                term_postings = postings[term]
+                f.write(array('I', (doc_id for doc_id, _ in term_postings)).tobytes())
+                f.write(array('H', (tf for _, tf in term_postings)).tobytes())
+                lexicon[term] = [offset, len(term_postings)]
+                offset += len(term_postings) * 6
+
+        with open(os.path.join(tmp_path, 'doclens.bin'), 'wb') as f:
+            f.write(doclens.tobytes())
+        with open(os.path.join(tmp_path, 'lexicon.json'), 'w') as f:
+            json.dump(lexicon, f, separators=(',', ':'))
+        with gzip.open(os.path.join(tmp_path, 'docs.json.gz'), 'wt', encoding='utf-8') as f:
+            json.dump(docs, f, separators=(',', ':'))
+
+        meta = {'docCount': len(docs), 'totalLength': sum(doclens), 'terms': len(lexicon),
+                'postings': offset // 6}
+        atomic_write_json(os.path.join(tmp_path, 'meta.json'), meta)
+
+        shutil.rmtree(path, ignore_errors=True)
+        os.replace(tmp_path, path)
+        return meta
+
+
+class SearchIndex:
+    """BM25 search over a main segment plus a small incremental delta segment
+
+    Incremental updates re-index only the changed items into the delta
+    segment and tombstone their old main-segment copies; `compact()` folds
+    the delta back into a fresh main segment. BM25 statistics treat
+    tombstoned main documents as still present until compaction, which
+    only nudges idf slightly.
+    """
+
+    def __init__(self, path: str = None):
+        self.path = path or default_index_path()
+        self.main = Segment(os.path.join(self.path, 'main'))
+        delta_path = os.path.join(self.path, 'delta')
+        self.delta = Segment(delta_path) if os.path.exists(os.path.join(delta_path, 'meta.json')) else None
+
+        tombstone_path = os.path.join(self.path, 'tombstones.json')
+        self.tombstones: Set[str] = set()
+        if os.path.exists(tombstone_path):
+            with open(tombstone_path) as f:
+                self.tombstones = set(json.load(f))
+
+    @staticmethod
+    def entries(items: Iterable[Dict[str, Any]]):
+        """Segment entries for plain items"""
+        for item in items:
+            yield search_document(item), weighted_terms(item)
+
+    @classmethod
+    def build(cls, items: Iterable[Dict[str, Any]], path: str = None) -> Dict[str, Any]:
+        """Build a fresh index (main segment only) from plain items"""
+        path = path or default_index_path()
+        os.makedirs(path, exist_ok=True)
+        meta = Segment.write(os.path.join(path, 'main'), cls.entries(items))
+        shutil.rmtree(os.path.join(path, 'delta'), ignore_errors=True)
+        for name in ('tombstones.json', 'delta_items.json.gz'):
+            if os.path.exists(os.path.join(path, name)):
+                os.remove(os.path.join(path, name))
+        return meta
+
+    def segments(self) -> List[Segment]:
+        return [self.main] + ([self.delta] if self.delta else [])
+
+    def stats(self) -> Dict[str, Any]:
+        """Document and term counts across segments"""
+        return {
+            'main_docs': self.main.doc_count,
+            'delta_docs': self.delta.doc_count if self.delta else 0,
+            'tombstones': len(self.tombstones),
+            'terms': self.main.meta['terms'],
+            'postings': self.main.meta['postings']
+        }
+
+    def source_urls(self, source: str) -> Set[str]:
+        """Urls of a source the index currently returns (main documents not tombstoned, plus the delta)"""
+        urls = {doc['url'] for doc in self.main.docs if doc.get('source') == source and doc['url'] not in self.tombstones}
+        if self.delta:
+            urls.update(doc['url'] for doc in self.delta.docs if doc.get('source') == source)
+        return urls
+
+    def search(self, query: str, limit: int = 20, category: str = None) -> List[Dict[str, Any]]:
+        """Top documents for a free-text query, ranked by BM25"""
+        terms = list(dict.fromkeys(tokenize(query)))
+        if not terms:
+            return []
+
+        segments = self.segments()
+        doc_count = sum(s.doc_count for s in segments)
+        avg_length = sum(s.total_length for s in segments) / max(doc_count, 1)
+
+        candidates = []
+        for segment_id, segment in enumerate(segments):
+            scores: Dict[int, float] = defaultdict(float)
+            # Main documents replaced by delta copies are masked out
+            masked = self.tombstones if segment is self.main else ()
+
+            for term in terms:
+                df = sum(s.df(term) for s in segments)
+                if not df:
+                    continue
+                idf = math.log(1 + (doc_count - df + 0.5) / (df + 0.5))
+                doc_ids, tfs = segment.postings(term)
+                doclens = segment.doclens
+                for doc_id, tf in zip(doc_ids, tfs):
+                    norm = BM25_K1 * (1 - BM25_B + BM25_B * doclens[doc_id] / avg_length)
+                    scores[doc_id] += idf * tf * (BM25_K1 + 1) / (tf + norm)
+
+            for doc_id, score in scores.items():
+                doc = segment.docs[doc_id]
+                if masked and doc['url'] in masked:
+                    continue
+                if category and doc.get('bfCategory') != category:
+                    continue
+                # Quality breaks ties between equally relevant documents
+                candidates.append((score + doc.get('qualityScore', 0) * 1e-4, segment_id, doc_id))
+
+        top = heapq.nlargest(limit, candidates)
+        return [{**segments[segment_id].docs[doc_id], 'score': round(score, 4)}
+                for score, segment_id, doc_id in top]
+
+    def update(self, items: Iterable[Dict[str, Any]] = (), removed_urls: Iterable[str] = ()) -> Dict[str, Any]:
+        """Upsert changed items and drop removed urls without rebuilding the main segment"""
+        delta_items_path = os.path.join(self.path, 'delta_items.json.gz')
+        delta_items: Dict[str, Dict[str, Any]] = {}
+        if os.path.exists(delta_items_path):
+            with gzip.open(delta_items_path, 'rt', encoding='utf-8') as f:
+                delta_items = {item['url']: item for item in json.load(f)}
+
+        upserted = removed = 0
+        for item in items:
+            delta_items[item['url']] = item
+            upserted += 1
+            if item['url'] in self.main.url_to_doc:
+                self.tombstones.add(item['url'])
+        for url in removed_urls:
+            if delta_items.pop(url, None) is not None or url in self.main.url_to_doc:
+                removed += 1
+            if url in self.main.url_to_doc:
+                self.tombstones.add(url)
+
+        # Rewrite the (small) delta segment from its source items
+        if self.delta:
+            self.delta.close()
+        Segment.write(os.path.join(self.path, 'delta'), self.entries(delta_items.values()))
+        self.delta = Segment(os.path.join(self.path, 'delta'))
+
+        tmp_path = delta_items_path + '.tmp'
+        with gzip.open(tmp_path, 'wt', encoding='utf-8') as f:
+            json.dump(list(delta_items.values()), f, separators=(',', ':'))
+        os.replace(tmp_path, delta_items_path)
+        atomic_write_json(os.path.join(self.path, 'tombstones.json'), sorted(self.tombstones))
+
+        return {'upserted': upserted, 'removed': removed, **self.stats()}
+
+    def compact(self) -> Dict[str, Any]:
+        """Merge the delta into a new main segment and clear tombstones"""
+        main_vectors = self.main.term_vectors()
+        entries = [(doc, terms) for doc, terms in zip(self.main.docs, main_vectors)
+                   if doc['url'] not in self.tombstones]
+        if self.delta:
+            entries.extend(zip(self.delta.docs, self.delta.term_vectors()))
+
+        self.close()
+        meta = Segment.write(os.path.join(self.path, 'main'), entries)
+        shutil.rmtree(os.path.join(self.path, 'delta'), ignore_errors=True)
+        for name in ('tombstones.json', 'delta_items.json.gz'):
+            if os.path.exists(os.path.join(self.path, name)):
+                os.remove(os.path.join(self.path, name))
+        self.__init__(self.path)
+        return meta
+
+    def close(self):
+        for segment in self.segments():
+            segment.close()
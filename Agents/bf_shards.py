@@ -0,0 +1,207 @@
+#!/usr/bin/env python3
+"""
+bf-db feed shards
+Pre-shuffled, quality-weighted static pages per category plus a manifest
+"""
+
+import hashlib
+import json
+import math
+import os
+import random
+import re
+import shutil
+import time
+from collections import defaultdict
+from datetime import datetime
+from typing import Any, Dict, Iterable, List
+from urllib.parse import urlparse
+
+from bf_cache import atomic_write_json, cache_path
+from bf_dynamo import iter_plain_items
+from bf_diversity import group_by_source, interleave, source_quality
+from bf_feed import SNAPSHOT_FIELDS
+from bf_sampler import SessionSampler, WeightedPool, quality_weight
+
+MANIFEST_VERSION = 1
+
+SAFE_NAME_RE = re.compile(r'[^\w-]+')
+
+
+def default_shard_dir() -> str:
+    """Default output directory for feed shards"""
+    return os.path.dirname(cache_path('feed_shards', 'manifest.json'))
+
+
+def category_fingerprint(items: List[Dict[str, Any]]) -> str:
+    """Content hash of a category's items, independent of query order"""
+    digest = hashlib.sha256()
+    for item in sorted(items, key=lambda i: i['url']):
+        digest.update(json.dumps(item, sort_keys=True, separators=(',', ':')).encode('utf-8'))
+    return digest.hexdigest()
+
+
+def with_domain(item: Dict[str, Any]) -> Dict[str, Any]:
+    """Fill `domain` from the url when the item has none"""
+    if not item.get('domain'):
+        item['domain'] = urlparse(item['url']).netloc.lower()
+    return item
+
+
+def load_manifest(out_dir: str) -> Dict[str, Any]:
+    """Current manifest, or an empty one"""
+    path = os.path.join(out_dir, 'manifest.json')
+    if os.path.exists(path):
+        with open(path) as f:
+            return json.load(f)
+    return {'version': MANIFEST_VERSION, 'categories': {}}
+
+
+def stream_category(client, table_name: str, category: str) -> Iterable[Dict[str, Any]]:
+    """Active items of one category via category-status-index"""
+    items = iter_plain_items(client, table_name, SNAPSHOT_FIELDS, query={
+        'IndexName': 'category-status-index',
+        'KeyConditionExpression': '#category = :category AND #status = :status',
+        'ExpressionAttributeNames': {'#category': 'bfCategory', '#status': 'status'},
+        'ExpressionAttributeValues': {':category': {'S': category}, ':status': {'S': 'active'}}
+    })
+    return (with_domain(item) for item in items)
+
+
+class ShardBuilder:
+    """Write each category's feed as N-item static JSON pages
+
+    Pages are consecutive slices of one diversified ordering per category:
+    each source's items in quality-weighted random order, interleaved so
+    sources alternate and domains are spread apart.
+
+    A category is written to `<dir>/<category>/<generation>/<shard>.json`.
+    Categories whose content fingerprint matches the manifest are skipped,
+    and the manifest only switches to a new generation once all of its pages
+    exist; the previous generation is kept for readers that fetched the old
+    manifest.
+    """
+
+    def __init__(self, out_dir: str = None, page_size: int = 20, max_shards: int = 1000,
+                 seed: int = None, domain_gap: int = 3):
+        self.out_dir = out_dir or default_shard_dir()
+        self.page_size = page_size
+        self.domain_gap = domain_gap
+        self.max_shards = max_shards
+        self.rng = random.Random(seed)
+        self.manifest = load_manifest(self.out_dir)
+
+    def shard_count(self, item_count: int) -> int:
+        """Enough pages for every item to be seen once on average"""
+        return max(1, min(self.max_shards, math.ceil(item_count / self.page_size)))
+
+    def feed_order(self, items: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Quality-weighted shuffle within each source, interleaved across sources"""
+        queues = {}
+        for source, group in group_by_source(items).items():
+            session = SessionSampler(WeightedPool(quality_weight(item) for item in group))
+            queues[source] = [group[p] for p in session.sample(self.rng, len(group))]
+        return list(interleave(queues, source_quality(items), domain_gap=self.domain_gap))
+
+    def build_category(self, category: str, items: List[Dict[str, Any]],
+                       force: bool = False) -> Dict[str, Any]:
+        """Write one category's shards unless its content is unchanged"""
+        fingerprint = category_fingerprint(items)
+        current = self.manifest['categories'].get(category)
+        unchanged = current and current['fingerprint'] == fingerprint and current['pageSize'] == self.page_size
+        if unchanged and not force:
+            return {'category': category, 'status': 'unchanged', 'items': len(items)}
+
+        generation = f"{datetime.now().strftime('%Y%m%d%H%M%S')}-{fingerprint[:8]}"
+        relative_dir = os.path.join(SAFE_NAME_RE.sub('_', category), generation)
+        generation_dir = os.path.join(self.out_dir, relative_dir)
+        shutil.rmtree(generation_dir, ignore_errors=True)
+        os.makedirs(generation_dir)
+
+        ordered = self.feed_order(items)
+        shards = self.shard_count(len(items))
+        for shard in range(shards):
+            page = ordered[shard * self.page_size:(shard + 1) * self.page_size]
+            if len(page) < self.page_size:
+                # Top up the last page from the start; never overlaps when len(items) >= page_size
+                page += ordered[:min(self.page_size, len(ordered)) - len(page)]
+            payload = {'items': page, 'category': category, 'count': len(page), 'shard': shard}
+            with open(os.path.join(generation_dir, f'{shard:04d}.json'), 'w') as f:
+                json.dump(payload, f, separators=(',', ':'))
+
+        previous = current['generation'] if current else None
+        self.manifest['categories'][category] = {
+            'generation': generation,
+            'fingerprint': fingerprint,
+            'path': relative_dir,
+            'shards': shards,
+            'items': len(items),
+            'pageSize': self.page_size,
+            'builtAt': datetime.now().isoformat()
+        }
+        self._prune(category, keep={generation, previous})
+        return {'category': category, 'status': 'built', 'items': len(items), 'shards': shards}
+
+    def remove_category(self, category: str) -> None:
+        """Drop a category that no longer has active items"""
+        self.manifest['categories'].pop(category, None)
+        shutil.rmtree(os.path.join(self.out_dir, SAFE_NAME_RE.sub('_', category)), ignore_errors=True)
+
+    def _prune(self, category: str, keep: set) -> None:
+        category_dir = os.path.join(self.out_dir, SAFE_NAME_RE.sub('_', category))
+        for name in os.listdir(category_dir):
+            if name not in keep:
+                shutil.rmtree(os.path.join(category_dir, name), ignore_errors=True)
+
+    def save_manifest(self) -> str:
+        """Atomically publish the manifest"""
+        self.manifest.update({
+            'version': MANIFEST_VERSION,
+            'builtAt': datetime.now().isoformat(),
+            'pageSize': self.page_size
+        })
+        path = os.path.join(self.out_dir, 'manifest.json')
+        atomic_write_json(path, self.manifest)
+        return path
+
+
+def build_feed_shards(client, table_name: str, out_dir: str = None, categories: List[str] = None,
+                      page_size: int = 20, max_shards: int = 1000, force: bool = False,
+                      seed: int = None) -> Dict[str, Any]:
+    """
+    Build (or incrementally refresh) feed shards
+
+    With `categories`, only those are re-queried via category-status-index;
+    otherwise all active items are streamed once from status-index and every
+    category is refreshed, removing categories that have emptied.
+    """
+    builder = ShardBuilder(out_dir, page_size=page_size, max_shards=max_shards, seed=seed)
+    start_time = time.time()
+
+    if categories:
+        grouped = {category: list(stream_category(client, table_name, category)) for category in categories}
+    else:
+        grouped = defaultdict(list)
+        for item in iter_plain_items(client, table_name, SNAPSHOT_FIELDS):
+            if item.get('bfCategory'):
+                grouped[item['bfCategory']].append(with_domain(item))
+        # Emptied categories fall through to removal below
+        for category in set(builder.manifest['categories']) - set(grouped):
+            grouped[category] = []
+
+    results = []
+    for category in sorted(grouped):
+        if grouped[category]:
+            results.append(builder.build_category(category, grouped[category], force=force))
+        else:
+            builder.remove_category(category)
+            results.append({'category': category, 'status': 'removed', 'items': 0})
+
+    manifest_path = builder.save_manifest()
+    return {
+        'manifest': manifest_path,
+        'categories': results,
+        'built': sum(1 for r in results if r['status'] == 'built'),
+        'unchanged': sum(1 for r in results if r['status'] == 'unchanged'),
+        'elapsed_seconds': round(time.time() - start_time, 2)
+    }
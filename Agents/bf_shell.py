@@ -0,0 +1,395 @@
+#!/usr/bin/env python3
+"""
+bf-db shell
+Long-lived session for interactive curation: warm client, cached reads and loaded indexes, over a prompt or a local socket
+"""
+
+import argparse
+import contextlib
+import json
+import os
+import shlex
+import socket
+import socketserver
+import sys
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, FrozenSet, List, Tuple
+
+from bf_cache import cache_path
+from bf_dynamo import MethodPaginator, item_size
+from bf_progress import note
+
+READ_OPERATIONS = ('get_item', 'batch_get_item', 'scan', 'query')
+WRITE_OPERATIONS = ('put_item', 'update_item', 'delete_item', 'batch_write_item', 'transact_write_items')
+
+# Commands that make no sense inside a session (they block or start their own)
+REFUSED_COMMANDS = {'shell', 'serve-feed'}
+
+# Record separator ending each socket reply, followed by a JSON status line (RFC 7464 style)
+REPLY_SEPARATOR = '\x1e'
+
+DEFAULT_CACHE_MB = 512
+DEFAULT_CACHE_TTL = 600
+
+
+def default_socket_path() -> str:
+    return cache_path('shell.sock')
+
+
+class ReadCache:
+    """
+    Client wrapper serving repeated reads from memory
+
+    Responses of get_item, batch_get_item, scan and query are kept per
+    request (least recently used first out beyond `max_mb`, and for at most
+    `ttl_seconds` so writes by other clients show up). Any write through the
+    wrapper drops the cached reads of its table, so a command always sees
+    its session's own writes. Callers get fresh response dicts and item
+    copies, so mutating them never alters the cache.
+    """
+
+    def __init__(self, client, max_mb: float = DEFAULT_CACHE_MB, ttl_seconds: float = DEFAULT_CACHE_TTL):
+        self.client = client
+        self.max_bytes = int(max_mb * 1024 ** 2)
+        self.ttl_seconds = ttl_seconds
+        # request -> (cached at, tables read, size, response)
+        self._entries: 'OrderedDict[str, Tuple[float, FrozenSet[str], int, Dict[str, Any]]]' = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = self.misses = self.invalidations = 0
+
+    def __getattr__(self, operation: str):
+        attribute = getattr(self.client, operation)
+        if operation in READ_OPERATIONS:
+            return lambda **request: self._read(operation, attribute, request)
+        if operation in WRITE_OPERATIONS:
+            return lambda **request: self._write(attribute, request)
+        return attribute
+
+    def get_paginator(self, operation: str) -> MethodPaginator:
+        return MethodPaginator(getattr(self, operation))
+
+    @staticmethod
+    def _copy(response: Dict[str, Any]) -> Dict[str, Any]:
+        copy = dict(response)
+        if 'Items' in copy:
+            copy['Items'] = [dict(item) for item in copy['Items']]
+        if 'Item' in copy:
+            copy['Item'] = dict(copy['Item'])
+        if 'Responses' in copy:
+            copy['Responses'] = {table: [dict(item) for item in items] for table, items in copy['Responses'].items()}
+        return copy
+
+    def _read(self, operation: str, method, request: Dict[str, Any]) -> Dict[str, Any]:
+        key = operation + json.dumps(request, sort_keys=True, default=str)
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry and now - entry[0] < self.ttl_seconds:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return self._copy(entry[3])
+            if entry:
+                self._drop(key)
+            self.misses += 1
+
+        response = method(**request)
+        if operation == 'batch_get_item':
+            if response.get('UnprocessedKeys'):
+                return response
+            tables = frozenset(request['RequestItems'])
+            found = [item for items in response.get('Responses', {}).values() for item in items]
+        else:
+            tables = frozenset([request['TableName']])
+            found = response.get('Items') or ([response['Item']] if 'Item' in response else [])
+        size = sum(item_size(item) for item in found) + 256
+        if size <= self.max_bytes:
+            with self._lock:
+                if key in self._entries:
+                    self._drop(key)
+                self._entries[key] = (now, tables, size, response)
+                self._bytes += size
+                while self._bytes > self.max_bytes:
+                    self._drop(next(iter(self._entries)))
+        return self._copy(response)
+
+    def _write(self, method, request: Dict[str, Any]) -> Dict[str, Any]:
+        if 'TableName' in request:
+            tables = {request['TableName']}
+        elif 'RequestItems' in request:
+            tables = set(request['RequestItems'])
+        else:
+            tables = {next(iter(entry.values()))['TableName'] for entry in request['TransactItems']}
+        try:
+            return method(**request)
+        finally:
+            self.invalidate(tables)
+
+    def _drop(self, key: str) -> None:
+        _, _, size, _ = self._entries.pop(key)
+        self._bytes -= size
+
+    def invalidate(self, tables: set = None) -> None:
+        """Drop the cached reads of `tables` (default: all)"""
+        with self._lock:
+            for key in [key for key, entry in self._entries.items() if tables is None or entry[1] & tables]:
+                self._drop(key)
+            self.invalidations += 1
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'entries': len(self._entries),
+                'mb': round(self._bytes / 1024 ** 2, 1),
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': round(self.hits / lookups, 3) if lookups else 0.0,
+                'invalidations': self.invalidations
+            }
+
+
+class ShellSession:
+    """
+    Runs CLI command lines one at a time on a long-lived agent
+
+    The agent's client goes behind a ReadCache, its local indexes stay
+    loaded (`agent.indexes`), and each command reports its own DynamoDB
+    usage. Built-ins: `help`, `cache` (statistics), `cache clear`, `exit`.
+    """
+
+    BUILTINS = {
+        'help': 'List commands',
+        'cache': 'Read cache and loaded index statistics ("cache clear" drops both)',
+        'exit': 'Leave the shell (also quit, Ctrl-D); over the socket, ends the connection',
+        'shutdown': 'Stop the daemon (socket only)'
+    }
+
+    def __init__(self, agent, parser: argparse.ArgumentParser, run: Callable[[Any, argparse.Namespace], Any],
+                 max_mb: float = DEFAULT_CACHE_MB, ttl_seconds: float = DEFAULT_CACHE_TTL):
+        self.agent = agent
+        self.parser = parser
+        self.run = run
+        self.cache = ReadCache(agent.dynamodb, max_mb=max_mb, ttl_seconds=ttl_seconds)
+        self.lock = threading.Lock()
+        self.commands = 0
+        self.started = time.time()
+
+    def __enter__(self) -> 'ShellSession':
+        self._client, self.agent.dynamodb = self.agent.dynamodb, self.cache
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.agent.dynamodb = self._client
+        self.agent.indexes.clear()
+
+    def _choices(self) -> List[str]:
+        for action in self.parser._actions:
+            if isinstance(action, argparse._SubParsersAction):
+                return sorted(action.choices)
+        return []
+
+    def execute(self, line: str) -> Dict[str, Any]:
+        """Run one command line; returns its status (ok, seconds, error, cache hits)"""
+        try:
+            tokens = shlex.split(line)
+        except ValueError as e:
+            return {'ok': False, 'error': str(e)}
+        if not tokens:
+            return {'ok': True}
+        name = tokens[0]
+
+        if name == 'help':
+            print("Commands: " + ', '.join(self._choices()))
+            print("Built-ins: " + ', '.join(f'{command} ({text})' for command, text in self.BUILTINS.items()))
+            print("Run '<command> --help' for a command's options")
+            return {'ok': True}
+        if name == 'cache':
+            if tokens[1:2] == ['clear']:
+                self.cache.invalidate()
+                self.agent.indexes.clear()
+                print("🧹 Read cache and loaded indexes cleared")
+            stats = {**self.cache.stats(), 'indexes': len(self.agent.indexes), 'commands': self.commands,
+                     'uptime_seconds': round(time.time() - self.started)}
+            print("🧊 " + ', '.join(f'{key}: {value}' for key, value in stats.items()))
+            return {'ok': True, 'cache': stats}
+        if name in REFUSED_COMMANDS:
+            return {'ok': False, 'error': f'{name} cannot run inside the shell'}
+
+        try:
+            args = self.parser.parse_args(tokens)
+        except SystemExit as e:
+            # argparse already printed the usage or the error
+            return {'ok': not e.code, 'error': None if not e.code else 'bad arguments'}
+        if getattr(args, 'estimate', False):
+            return {'ok': False, 'error': '--estimate is only available from the command line'}
+
+        hits, misses = self.cache.hits, self.cache.misses
+        start = time.perf_counter()
+        error = None
+        metrics = self.agent.metrics
+        try:
+            with metrics.command_scope(args.command) if metrics else contextlib.nullcontext():
+                if not self.run(self.agent, args):
+                    error = f'unknown command {args.command}'
+        except Exception as e:
+            error = f'{type(e).__name__}: {e}'
+            note(f"❌ {args.command} failed: {error}", 'error', error=error)
+        except SystemExit as e:
+            error = None if not e.code else f'exit status {e.code}'
+        finally:
+            self.agent.report_usage(args.command, session=True)
+        self.commands += 1
+        seconds = time.perf_counter() - start
+        print(f"⏱️  {seconds:.2f}s, {self.cache.hits - hits} cached reads, {self.cache.misses - misses} table reads")
+        return {'ok': error is None, 'error': error, 'seconds': round(seconds, 3),
+                'cached_reads': self.cache.hits - hits, 'table_reads': self.cache.misses - misses}
+
+    # ----- front ends -----
+
+    def prompt(self) -> Dict[str, Any]:
+        """Interactive prompt on the terminal (history kept across sessions when readline is available)"""
+        history = cache_path('shell_history')
+        try:
+            import readline
+            readline.set_completer(lambda text, state: ([name for name in self._choices() + list(self.BUILTINS)
+                                                         if name.startswith(text)] + [None])[state])
+            readline.parse_and_bind('tab: complete')
+            if os.path.exists(history):
+                readline.read_history_file(history)
+        except ImportError:
+            readline = None
+
+        print("🐚 bf-db shell - 'help' lists commands, 'exit' leaves")
+        try:
+            while True:
+                try:
+                    line = input('bf-db> ')
+                except EOFError:
+                    print()
+                    break
+                except KeyboardInterrupt:
+                    print()
+                    continue
+                if line.strip() in ('exit', 'quit'):
+                    break
+                status = self.execute(line)
+                if status.get('error'):
+                    print(f"⚠️  {status['error']}")
+        finally:
+            if readline:
+                readline.write_history_file(history)
+        return {'commands': self.commands, 'cache': self.cache.stats()}
+
+    def serve(self, socket_path: str = None) -> Dict[str, Any]:
+        """
+        Accept command lines on a Unix socket until `shutdown`
+
+        Each line is answered with the command's printed output, then the
+        record separator and a JSON status line. Commands from concurrent
+        connections run one at a time.
+        """
+        socket_path = socket_path or default_socket_path()
+        if os.path.exists(socket_path):
+            os.unlink(socket_path)
+        session = self
+
+        class Handler(socketserver.StreamRequestHandler):
+            def handle(self):
+                writer = _LineWriter(self.wfile)
+                for raw in self.rfile:
+                    line = raw.decode('utf-8', 'replace').strip()
+                    if line in ('exit', 'quit'):
+                        return
+                    if line == 'shutdown':
+                        writer.reply({'ok': True, 'shutdown': True})
+                        threading.Thread(target=server.shutdown, daemon=True).start()
+                        return
+                    with session.lock, contextlib.redirect_stdout(writer):
+                        status = session.execute(line)
+                    writer.reply(status)
+
+        server = socketserver.ThreadingUnixStreamServer(socket_path, Handler)
+        server.daemon_threads = True
+        os.chmod(socket_path, 0o600)
+        print(f"🐚 bf-db daemon listening on {socket_path} ('shutdown' stops it)")
+        sys.stdout.flush()
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            server.server_close()
+            if os.path.exists(socket_path):
+                os.unlink(socket_path)
+        return {'commands': self.commands, 'cache': self.cache.stats()}
+
+
+class _LineWriter:
+    """Text stream onto a socket connection (the command output of one reply)"""
+
+    def __init__(self, wfile):
+        self.wfile = wfile
+
+    def write(self, text: str) -> int:
+        try:
+            self.wfile.write(text.encode('utf-8'))
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+        return len(text)
+
+    def flush(self) -> None:
+        with contextlib.suppress(BrokenPipeError, ConnectionResetError):
+            self.wfile.flush()
+
+    def isatty(self) -> bool:
+        return False
+
+    def reply(self, status: Dict[str, Any]) -> None:
+        self.write(REPLY_SEPARATOR + json.dumps(status, default=str) + '\n')
+        self.flush()
+
+
+def send(line: str, socket_path: str = None, output=None) -> Dict[str, Any]:
+    """Send one command line to a running daemon, copying its output to `output`; returns the status"""
+    output = output or sys.stdout
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as connection:
+        connection.connect(socket_path or default_socket_path())
+        connection.sendall((line.strip() + '\n').encode('utf-8'))
+        reader = connection.makefile('r', encoding='utf-8')
+        for text in reader:
+            if text.startswith(REPLY_SEPARATOR):
+                return json.loads(text[1:])
+            output.write(text)
+    return {'ok': False, 'error': 'connection closed'}
+
+
+def connect(socket_path: str = None, lines: List[str] = None) -> Dict[str, Any]:
+    """Prompt (or `lines`) forwarded to a running daemon"""
+    socket_path = socket_path or default_socket_path()
+    sent = 0
+    if lines:
+        for line in lines:
+            send(line, socket_path)
+            sent += 1
+        return {'sent': sent}
+    print(f"🐚 connected to {socket_path} - 'exit' leaves, 'shutdown' stops the daemon")
+    while True:
+        try:
+            line = input('bf-db> ')
+        except (EOFError, KeyboardInterrupt):
+            print()
+            break
+        if line.strip() in ('exit', 'quit'):
+            break
+        if not line.strip():
+            continue
+        status = send(line, socket_path)
+        sent += 1
+        if status.get('error'):
+            print(f"⚠️  {status['error']}")
+        if status.get('shutdown'):
+            break
+    return {'sent': sent}
@@ -0,0 +1,204 @@
+#!/usr/bin/env python3
+"""
+bf-db autocomplete index
+Sorted-array prefix index with precomputed top-k suggestions, served from mmap
+"""
+
+import json
+import mmap
+import os
+import re
+import struct
+import unicodedata
+from array import array
+from collections import defaultdict
+from typing import Any, Dict, Iterable, List
+
+from bf_cache import cache_path
+
+MAGIC = b'BFAC'
+VERSION = 1
+
+# magic, version, k, max prefix length, prefix count, suggestion count, then 5 section offsets
+HEADER = struct.Struct('<4sIIIII5Q')
+
+# Suggestion kinds, in the order they are preferred on equal quality
+KIND_PRIORITY = {'category': 0, 'subcategory': 1, 'tag': 2, 'title': 3}
+
+NON_WORD_RE = re.compile(r'[\W_]+', re.UNICODE)
+
+
+def default_autocomplete_path() -> str:
+    """Default location of the autocomplete index file"""
+    return cache_path('autocomplete.bin')
+
+
+def normalize(text: str) -> str:
+    """Lowercase, strip accents and collapse punctuation to single spaces"""
+    text = unicodedata.normalize('NFKD', text)
+    text = ''.join(c for c in text if not unicodedata.combining(c))
+    return NON_WORD_RE.sub(' ', text.lower()).strip()
+
+
+def index_terms(text: str) -> List[str]:
+    """The whole normalized phrase plus each of its words"""
+    phrase = normalize(text)
+    if not phrase:
+        return []
+    return list(dict.fromkeys([phrase] + phrase.split()))
+
+
+def item_suggestions(item: Dict[str, Any]):
+    """(kind, text, url) suggestions contributed by one plain item"""
+    if item.get('title'):
+        yield 'title', item['title'].strip(), item['url']
+    for field, kind in (('bfCategory', 'category'), ('bfSubcategory', 'subcategory')):
+        if item.get(field):
+            yield kind, item[field], None
+    for field in ('tags', 'bfTags'):
+        for tag in item.get(field) or []:
+            if isinstance(tag, str) and tag.strip():
+                yield 'tag', tag.strip(), None
+
+
+def build_autocomplete(items: Iterable[Dict[str, Any]], path: str = None, k: int = 10,
+                       max_prefix: int = 24) -> Dict[str, Any]:
+    """
+    Build the autocomplete file from plain items
+
+    Titles rank by their item's qualityScore; category, subcategory and tag
+    names rank by the best qualityScore among the items that carry them.
+    Every prefix (up to `max_prefix` characters) of every indexed phrase and
+    word stores its top `k` suggestion ids, so a lookup is one binary search.
+    """
+    path = path or default_autocomplete_path()
+
+    # (kind, text-or-url) -> suggestion record
+    suggestions: Dict[tuple, Dict[str, Any]] = {}
+    for item in items:
+        score = float(item.get('qualityScore') or 0)
+        for kind, text, url in item_suggestions(item):
+            key = (kind, url or text.lower())
+            current = suggestions.get(key)
+            if current is None:
+                suggestions[key] = {'text': text, 'kind': kind, 'url': url, 'score': score}
+            elif score > current['score']:
+                current['score'] = score
+
+    ranked = sorted(suggestions.values(),
+                    key=lambda s: (-s['score'], KIND_PRIORITY[s['kind']], s['text'].lower()))
+
+    # Walking suggestions best-first, each prefix keeps the first k it sees
+    top: Dict[bytes, List[int]] = defaultdict(list)
+    for suggestion_id, suggestion in enumerate(ranked):
+        prefixes = set()
+        for term in index_terms(suggestion['text']):
+            term = term[:max_prefix]
+            for end in range(1, len(term) + 1):
+                prefixes.add(term[:end])
+        for prefix in prefixes:
+            ids = top[prefix.encode('utf-8')]
+            if len(ids) < k:
+                ids.append(suggestion_id)
+
+    # Only suggestions that made some top-k list are stored
+    used = sorted({i for ids in top.values() for i in ids})
+    renumber = {old: new for new, old in enumerate(used)}
+
+    prefix_keys = sorted(top)
+    prefix_offsets, list_offsets, list_ids = array('I', [0]), array('I', [0]), array('I')
+    prefix_blob = bytearray()
+    for key in prefix_keys:
+        prefix_blob += key
+        prefix_offsets.append(len(prefix_blob))
+        list_ids.extend(renumber[i] for i in top[key])
+        list_offsets.append(len(list_ids))
+
+    suggestion_offsets, suggestion_blob = array('I', [0]), bytearray()
+    for i in used:
+        record = {field: value for field, value in ranked[i].items() if value is not None}
+        suggestion_blob += json.dumps(record, separators=(',', ':')).encode('utf-8')
+        suggestion_offsets.append(len(suggestion_blob))
+
+    sections = [prefix_offsets.tobytes(), bytes(prefix_blob), list_offsets.tobytes(),
+                list_ids.tobytes(), suggestion_offsets.tobytes() + bytes(suggestion_blob)]
+    offsets, position = [], HEADER.size
+    for section in sections:
+        offsets.append(position)
+        position += len(section)
+
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'wb') as f:
+        f.write(HEADER.pack(MAGIC, VERSION, k, max_prefix, len(prefix_keys), len(used), *offsets))
+        for section in sections:
+            f.write(section)
+    os.replace(tmp_path, path)
+
+    return {
+        'path': path,
+        'suggestions': len(used),
+        'prefixes': len(prefix_keys),
+        'bytes': os.path.getsize(path)
+    }
+
+
+class AutocompleteIndex:
+    """Read-only view of an autocomplete file; lookups touch only mapped pages"""
+
+    def __init__(self, path: str = None):
+        self.path = path or default_autocomplete_path()
+        self._file = open(self.path, 'rb')
+        self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+
+        magic, version, self.k, self.max_prefix, self.prefix_count, self.suggestion_count, *offsets = \
+            HEADER.unpack_from(self._map, 0)
+        if magic != MAGIC or version != VERSION:
+            self.close()
+            raise ValueError(f'{self.path} is not a version {VERSION} autocomplete index')
+        (self._prefix_offsets, self._prefix_blob, self._list_offsets,
+         self._list_ids, self._suggestion_offsets) = offsets
+        self._suggestion_blob = self._suggestion_offsets + (self.suggestion_count + 1) * 4
+
+    def _u32(self, base: int, i: int) -> int:
+        return struct.unpack_from('<I', self._map, base + i * 4)[0]
+
+    def _prefix(self, i: int) -> bytes:
+        start, end = self._u32(self._prefix_offsets, i), self._u32(self._prefix_offsets, i + 1)
+        return self._map[self._prefix_blob + start:self._prefix_blob + end]
+
+    def _find(self, key: bytes) -> int:
+        """Position of an exact prefix key, or -1"""
+        lo, hi = 0, self.prefix_count
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self._prefix(mid) < key:
+                lo = mid + 1
+            else:
+                hi = mid
+        return lo if lo < self.prefix_count and self._prefix(lo) == key else -1
+
+    def _suggestion(self, i: int) -> Dict[str, Any]:
+        start, end = self._u32(self._suggestion_offsets, i), self._u32(self._suggestion_offsets, i + 1)
+        return json.loads(self._map[self._suggestion_blob + start:self._suggestion_blob + end])
+
+    def suggest(self, prefix: str, limit: int = 10) -> List[Dict[str, Any]]:
+        """Top suggestions whose phrase or any word starts with `prefix`"""
+        key = normalize(prefix)
+        if not key:
+            return []
+        # Keep a trailing space so "machine " only matches the phrase
+        if prefix[-1:].isspace():
+            key += ' '
+        # Longer queries share the suggestions of their indexed prefix
+        key = key[:self.max_prefix]
+        position = self._find(key.encode('utf-8'))
+        if position < 0:
+            return []
+
+        start = self._u32(self._list_offsets, position)
+        end = self._u32(self._list_offsets, position + 1)
+        return [self._suggestion(self._u32(self._list_ids, i)) for i in range(start, min(end, start + limit))]
+
+    def close(self):
+        self._map.close()
+        self._file.close()
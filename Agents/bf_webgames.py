@@ -0,0 +1,315 @@
+#!/usr/bin/env python3
+"""
+bf-db webgames
+One mobile-compatibility scorer and a cached per-status load of the webgames category
+"""
+
+import json
+import re
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, Iterable, List
+from urllib.parse import urlparse
+
+from bf_cache import TTLCache
+from bf_dynamo import iter_items, iter_plain_items
+
+CATEGORY = 'webgames'
+
+# Statuses a webgame moves between (cleanup-webgames activates desktopOnly/inactive games)
+STATUSES = ('active', 'desktopOnly', 'inactive')
+
+GAME_FIELDS = ('url', 'title', 'status', 'source', 'mobileFriendly', 'qualityScore')
+DEFAULT_TTL_MINUTES = 60
+
+# Where games go missing: other category spellings (update-webgames-category writes 'games')
+# and crawled sources whose items never got a bfCategory
+CATEGORY_VARIANTS = ('games', 'Webgames', 'webgames ', 'web-games', 'webgame')
+GAME_SOURCES = ('reddit-webgames',)
+
+# The netloc of a url as urlparse finds it: after an optional scheme and '//', up to the path/query/fragment
+NETLOC_RE = re.compile(r'(?:[A-Za-z][A-Za-z0-9+.-]*:)?//([^/?#]*)')
+
+MOBILE_FRIENDLY_DOMAINS = (
+    'lichess.org', 'chess.com', 'eyezmaze.com',
+    'gamejolt.com', 'koalabeast.com', 'choiceofgames.com',
+    'itch.io', 'poki.com', 'crazygames.com'
+)
+MOBILE_KEYWORDS = (
+    'puzzle', 'chess', 'card', 'simple', 'tap', 'click', 'touch',
+    'casual', 'brain', 'logic', 'match', 'word', 'trivia', 'quiz'
+)
+DESKTOP_KEYWORDS = (
+    'fps', 'mmo', 'keyboard', 'wasd', 'flash', 'unity', 'download',
+    'shooter', 'strategy', 'rts', 'complex', 'hardcore'
+)
+
+
+class MobileScorer:
+    """
+    Mobile compatibility of a webgame (0-100) from its url and title
+
+    Starts at `base`; a touch-friendly domain adds `domain_bonus`, every
+    mobile keyword in the title or url adds `mobile_bonus` and every desktop
+    keyword takes `desktop_penalty`. Titles of at most `short_title_words`
+    words gain `short_title_bonus`, titles over `long_title_chars` lose
+    `long_title_penalty`. Games scoring above `friendly_threshold` count as
+    mobile-friendly.
+    """
+
+    def __init__(self, friendly_domains: Iterable[str] = MOBILE_FRIENDLY_DOMAINS,
+                 mobile_keywords: Iterable[str] = MOBILE_KEYWORDS, desktop_keywords: Iterable[str] = DESKTOP_KEYWORDS,
+                 base: int = 50, domain_bonus: int = 30, mobile_bonus: int = 8, desktop_penalty: int = 15,
+                 short_title_words: int = 3, short_title_bonus: int = 10, long_title_chars: int = 100,
+                 long_title_penalty: int = 10, friendly_threshold: int = 60):
+        self.friendly_domains = tuple(domain.lower() for domain in friendly_domains)
+        self.mobile_keywords = tuple(keyword.lower() for keyword in mobile_keywords)
+        self.desktop_keywords = tuple(keyword.lower() for keyword in desktop_keywords)
+        self.base = base
+        self.domain_bonus = domain_bonus
+        self.mobile_bonus = mobile_bonus
+        self.desktop_penalty = desktop_penalty
+        self.short_title_words = short_title_words
+        self.short_title_bonus = short_title_bonus
+        self.long_title_chars = long_title_chars
+        self.long_title_penalty = long_title_penalty
+        self.friendly_threshold = friendly_threshold
+
+    @classmethod
+    def from_file(cls, path: str) -> 'MobileScorer':
+        """Scorer with the settings of a JSON mapping (any constructor argument; the rest keep their defaults)"""
+        with open(path) as f:
+            settings = json.load(f)
+        try:
+            return cls(**settings)
+        except TypeError as e:
+            raise ValueError(f'{path}: bad scorer setting ({e})')
+
+    def settings(self) -> Dict[str, Any]:
+        return {name: list(value) if isinstance(value, tuple) else value for name, value in vars(self).items()}
+
+    def score(self, url: str, title: str) -> int:
+        score = self.base
+        # Runs for every item in metadata jobs: the host is parsed once and the text lowered once
+        host = NETLOC_RE.match(url)
+        if host and any(map(host.group(1).lower().__contains__, self.friendly_domains)):
+            score += self.domain_bonus
+
+        # A newline can't be part of a keyword, so no match spans title and url
+        text = f'{title}\n{url}'.lower()
+        score += self.mobile_bonus * sum(map(text.__contains__, self.mobile_keywords))
+        score -= self.desktop_penalty * sum(map(text.__contains__, self.desktop_keywords))
+
+        if len(title.split()) <= self.short_title_words:
+            score += self.short_title_bonus
+        if len(title) > self.long_title_chars:
+            score -= self.long_title_penalty
+        return max(0, min(100, score))
+
+    def is_mobile_friendly(self, url: str, title: str) -> bool:
+        return self.score(url, title) > self.friendly_threshold
+
+
+def status_query(category: str, status: str) -> Dict[str, Any]:
+    """category-status-index key condition for one category and status"""
+    return {
+        'IndexName': 'category-status-index',
+        'KeyConditionExpression': '#category = :category AND #status = :status',
+        'ExpressionAttributeNames': {'#category': 'bfCategory', '#status': 'status'},
+        'ExpressionAttributeValues': {':category': {'S': category}, ':status': {'S': status}}
+    }
+
+
+class WebgamesCache:
+    """
+    The webgames category, read once per status and kept on disk
+
+    Each status is one category-status-index query and all of them run in
+    parallel. The games (a few fields each) are cached per status for
+    `ttl_minutes`, so the views re-run without reading the table; a write
+    through the agent `forget`s the statuses it changed.
+    """
+
+    def __init__(self, client, table_name: str, category: str = CATEGORY, statuses: Iterable[str] = STATUSES,
+                 ttl_minutes: float = DEFAULT_TTL_MINUTES, path: str = None):
+        self.client = client
+        self.table_name = table_name
+        self.category = category
+        self.statuses = list(dict.fromkeys(statuses))
+        self.cache = TTLCache('webgames', ttl_seconds=ttl_minutes * 60, path=path)
+        # Statuses the last load read from the table (the rest came from the cache)
+        self.queried: List[str] = []
+
+    def _key(self, status: str) -> str:
+        return f'{self.category}#{status}'
+
+    def _query(self, status: str) -> List[Dict[str, Any]]:
+        return list(iter_plain_items(self.client, self.table_name, GAME_FIELDS,
+                                     query=status_query(self.category, status)))
+
+    def read(self, statuses: Iterable[str] = None) -> Dict[str, List[Dict[str, Any]]]:
+        """Games of each status (default: all), queried in parallel without the cache"""
+        statuses = list(statuses or self.statuses)
+        with ThreadPoolExecutor(max_workers=len(statuses)) as pool:
+            return dict(zip(statuses, pool.map(self._query, statuses)))
+
+    def load(self, refresh: bool = False) -> Dict[str, List[Dict[str, Any]]]:
+        """Games per status; statuses whose cached copy is missing or expired (or all, with `refresh`) are queried"""
+        self.queried = [status for status in self.statuses if refresh or not self.cache.is_fresh(self._key(status))]
+        if self.queried:
+            for status, games in self.read(self.queried).items():
+                self.cache.put(self._key(status), {'items': games}, autosave_every=0)
+            self.cache.save()
+        return {status: self.cache.get(self._key(status))['items'] for status in self.statuses}
+
+    def forget(self, statuses: Iterable[str] = None) -> None:
+        """Drop cached statuses (default: all) so the next load re-reads them"""
+        for status in statuses or self.statuses:
+            self.cache.discard(self._key(status))
+        self.cache.save()
+
+
+def scored(games: Dict[str, List[Dict[str, Any]]], scorer: MobileScorer) -> Dict[str, List[Dict[str, Any]]]:
+    """Games per status with `mobileScore` and `domain`, best score first (ties by title)"""
+    result = {}
+    for status, items in games.items():
+        rows = [{**game, 'domain': urlparse(game['url']).netloc,
+                 'mobileScore': scorer.score(game['url'], game.get('title', ''))} for game in items]
+        rows.sort(key=lambda row: (-row['mobileScore'], row.get('title', '')))
+        result[status] = rows
+    return result
+
+
+def top_by_status(games: Dict[str, List[Dict[str, Any]]], scorer: MobileScorer, limit: int = 3,
+                  offset: int = 0) -> Dict[str, List[Dict[str, Any]]]:
+    """The `limit` most mobile-friendly games of each status after skipping `offset` (for "next N" pages)"""
+    return {status: rows[offset:offset + limit] for status, rows in scored(games, scorer).items()}
+
+
+def _flag_name(game: Dict[str, Any]) -> str:
+    flag = game.get('mobileFriendly')
+    return 'unknown' if flag is None else 'mobile-friendly' if flag else 'desktop-only'
+
+
+def status_distribution(games: Dict[str, List[Dict[str, Any]]], scorer: MobileScorer) -> Dict[str, Any]:
+    """Games per status, per stored mobileFriendly flag, and per status how many the scorer rates mobile-friendly"""
+    flags = Counter(_flag_name(game) for items in games.values() for game in items)
+    return {
+        'total': sum(len(items) for items in games.values()),
+        'statuses': {status: len(items) for status, items in games.items()},
+        'mobile': dict(sorted(flags.items())),
+        'scored_friendly': {status: sum(scorer.is_mobile_friendly(game['url'], game.get('title', ''))
+                                        for game in items) for status, items in games.items()}
+    }
+
+
+def _count(client, **request) -> int:
+    count, start_key = 0, None
+    while True:
+        response = client.query(**request, Select='COUNT', **({'ExclusiveStartKey': start_key} if start_key else {}))
+        count += response.get('Count', 0)
+        start_key = response.get('LastEvaluatedKey')
+        if not start_key:
+            return count
+
+
+def probe(client, table_name: str, category: str = CATEGORY, variants: Iterable[str] = CATEGORY_VARIANTS,
+          sources: Iterable[str] = GAME_SOURCES) -> Dict[str, Any]:
+    """
+    What the per-status load can't see, read in parallel
+
+    Every status value stored in the category (only the status attribute is
+    projected), the item count of each other category spelling, and the
+    game-source items that have no bfCategory at all.
+    """
+    def status_values() -> Dict[str, int]:
+        values = Counter()
+        for item in iter_items(client.query, TableName=table_name, IndexName='category-status-index',
+                               KeyConditionExpression='#category = :category',
+                               ProjectionExpression='#status',
+                               ExpressionAttributeNames={'#category': 'bfCategory', '#status': 'status'},
+                               ExpressionAttributeValues={':category': {'S': category}}):
+            values[item.get('status', {}).get('S', '')] += 1
+        return dict(values)
+
+    def variant_count(variant: str) -> int:
+        return _count(client, TableName=table_name, IndexName='category-status-index',
+                      KeyConditionExpression='#category = :category',
+                      ExpressionAttributeNames={'#category': 'bfCategory'},
+                      ExpressionAttributeValues={':category': {'S': variant}})
+
+    def uncategorized(source: str) -> int:
+        return _count(client, TableName=table_name, IndexName='source-status-index',
+                      KeyConditionExpression='#source = :source',
+                      FilterExpression='attribute_not_exists(#category)',
+                      ExpressionAttributeNames={'#source': 'source', '#category': 'bfCategory'},
+                      ExpressionAttributeValues={':source': {'S': source}})
+
+    variants = [variant for variant in variants if variant != category]
+    sources = list(sources)
+    with ThreadPoolExecutor(max_workers=1 + len(variants) + len(sources)) as pool:
+        values = pool.submit(status_values)
+        variant_counts = {variant: pool.submit(variant_count, variant) for variant in variants}
+        source_counts = {source: pool.submit(uncategorized, source) for source in sources}
+        return {
+            'status_values': values.result(),
+            'variants': {variant: future.result() for variant, future in variant_counts.items()},
+            'uncategorized': {source: future.result() for source, future in source_counts.items()}
+        }
+
+
+def diagnose(games: Dict[str, List[Dict[str, Any]]], scorer: MobileScorer, found: Dict[str, Any],
+             category: str = CATEGORY) -> List[Dict[str, Any]]:
+    """
+    Findings about the category: why games are missing from the feed or mislabelled
+
+    `found` is a `probe` result. Each finding has a severity ('error',
+    'warning' or 'info'), a message and the number of items concerned.
+    """
+    findings = []
+
+    def add(severity: str, count: int, message: str) -> None:
+        if count:
+            findings.append({'severity': severity, 'count': count, 'message': message})
+
+    loaded = {status: len(items) for status, items in games.items()}
+    stored = found['status_values']
+    if not stored:
+        findings.append({'severity': 'error', 'count': 0, 'message': f"no items have bfCategory='{category}'"})
+    for value, count in sorted(stored.items()):
+        if value in loaded:
+            continue
+        close = next((status for status in loaded if status.casefold() == value.strip().casefold()), None)
+        if close:
+            add('error', count, f"status {value!r} looks like '{close}' but doesn't match it "
+                                f"(case/whitespace); these games are never served")
+        else:
+            add('warning', count, f"status {value!r} is not one of {', '.join(loaded)} (add it with --status)")
+    for variant, count in found['variants'].items():
+        add('error', count, f"bfCategory {variant!r} instead of '{category}'"
+                            + (' (update-webgames-category moved them)' if variant == 'games' else ''))
+    for source, count in found['uncategorized'].items():
+        add('warning', count, f"{source} items without a bfCategory (never queried by category)")
+
+    if 'active' in loaded and not loaded['active'] and sum(loaded.values()):
+        findings.append({'severity': 'error', 'count': 0, 'message': f"no active {category}: the feed shows none "
+                                                                     f"(cleanup-webgames activates the best candidates)"})
+
+    everything = [(status, game) for status, items in games.items() for game in items]
+    add('warning', sum(1 for status, game in everything
+                       if status == 'active' and game.get('mobileFriendly') is False),
+        'active games flagged desktop-only')
+    add('warning', sum(1 for status, game in everything
+                       if status == 'desktopOnly' and game.get('mobileFriendly') is True),
+        'desktopOnly games flagged mobile-friendly')
+    add('info', sum(1 for _, game in everything if game.get('mobileFriendly') is None),
+        'games without a mobileFriendly flag (generate-metadata sets it)')
+    add('info', sum(1 for _, game in everything if game.get('mobileFriendly') is not None
+                    and game['mobileFriendly'] != scorer.is_mobile_friendly(game['url'], game.get('title', ''))),
+        "games whose mobileFriendly flag disagrees with the current scorer")
+    add('warning', sum(1 for _, game in everything if not game.get('title')), 'games without a title')
+
+    order = {'error': 0, 'warning': 1, 'info': 2}
+    findings.sort(key=lambda finding: (order[finding['severity']], -finding['count']))
+    return findings
+